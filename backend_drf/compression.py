@@ -0,0 +1,199 @@
+import functools
+import zlib
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+    'CONTENT_TYPES': [
+        'application/json',
+        'application/msgpack',
+        'application/x-ndjson',
+        'text/csv',
+        'text/html',
+        'text/plain',
+    ],
+}
+
+# Preferred first when a client accepts both with the same quality.
+ENCODINGS = ('br', 'gzip')
+
+# Never compressed: event streams must reach the client event by event.
+EXCLUDED_CONTENT_TYPES = {'text/event-stream'}
+
+
+@functools.lru_cache
+def get_compression_config():
+    return {**DEFAULTS, **getattr(settings, 'COMPRESSION', {})}
+
+
+@receiver(setting_changed)
+def reset_compression_config(*, setting, **kwargs):
+    if setting == 'COMPRESSION':
+        get_compression_config.cache_clear()
+
+
+def available_encodings():
+    return ENCODINGS if brotli is not None else ENCODINGS[1:]
+
+
+def choose_encoding(accept_encoding, encodings=None):
+    """
+    Return the content coding of `encodings` (default: the available ones)
+    the `Accept-Encoding` header value prefers, or None for identity.
+    """
+    encodings = available_encodings() if encodings is None else encodings
+    qualities = {}
+    for item in accept_encoding.split(','):
+        name, *params = item.strip().split(';')
+        quality = 1.0
+        for param in params:
+            key, _, value = param.strip().partition('=')
+            if key == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name.strip().lower()] = quality
+
+    wildcard = qualities.get('*', 0.0)
+    best, best_quality = None, 0.0
+    for encoding in encodings:
+        quality = qualities.get(encoding, wildcard)
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def make_compressor(encoding, config=None):
+    """
+    Return an object with `compress(data)` and `flush()` for `encoding`,
+    tuned by the `GZIP_LEVEL`/`BROTLI_QUALITY` of `settings.COMPRESSION`.
+    """
+    config = get_compression_config() if config is None else config
+    if encoding == 'br':
+        return BrotliCompressor(config['BROTLI_QUALITY'])
+    # wbits=31 writes the gzip header and trailer.
+    return zlib.compressobj(config['GZIP_LEVEL'], zlib.DEFLATED, 31)
+
+
+def compress(data, encoding, config=None):
+    compressor = make_compressor(encoding, config)
+    return compressor.compress(data) + compressor.flush()
+
+
+class BrotliCompressor:
+    """
+    `brotli.Compressor` with the interface of `zlib` compression objects.
+    """
+
+    def __init__(self, quality):
+        self._compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self, mode=None):
+        if mode == zlib.Z_SYNC_FLUSH:
+            return self._compressor.flush()
+        return self._compressor.finish()
+
+
+class CompressionMiddleware:
+    """
+    Compress responses with brotli (when installed) or gzip, as negotiated
+    with `Accept-Encoding`, following `settings.COMPRESSION`.
+
+    Only `CONTENT_TYPES` are compressed, and regular responses only from
+    `MIN_SIZE` bytes, below which compression costs more than it saves.
+    Streamed responses (such as the task export) are compressed chunk by
+    chunk, each chunk flushed so that the client receives it at once;
+    `text/event-stream` responses are never compressed. The `ETag` of a
+    compressed response is made weak, as the compressed bytes differ from
+    the identity ones: conditional requests keep working since
+    `If-None-Match` is compared weakly.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.process_response(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.process_response(request, await self.get_response(request))
+
+    def process_response(self, request, response):
+        config = get_compression_config()
+        if not config['ENABLED'] or not self.is_compressible(response, config):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        encoding = choose_encoding(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+
+        if response.streaming:
+            compressor = make_compressor(encoding, config)
+            if response.is_async:
+                response.streaming_content = self.compress_async(response.streaming_content, compressor)
+            else:
+                response.streaming_content = self.compress_chunks(response.streaming_content, compressor)
+            del response['Content-Length']
+        else:
+            if len(response.content) < config['MIN_SIZE']:
+                return response
+            content = compress(response.content, encoding, config)
+            if len(content) >= len(response.content):
+                return response
+            response.content = content
+            response['Content-Length'] = str(len(content))
+
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        response['Content-Encoding'] = encoding
+        return response
+
+    def is_compressible(self, response, config):
+        if response.has_header('Content-Encoding') or 'no-transform' in response.get('Cache-Control', ''):
+            return False
+        content_type = response.get('Content-Type', '').partition(';')[0].strip().lower()
+        return content_type not in EXCLUDED_CONTENT_TYPES and content_type in config['CONTENT_TYPES']
+
+    @staticmethod
+    def compress_chunks(chunks, compressor):
+        for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
+
+    @staticmethod
+    async def compress_async(chunks, compressor):
+        async for chunk in chunks:
+            data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+            if data:
+                yield data
+        yield compressor.flush()
@@ -0,0 +1,56 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
+
+
+def make_etag(*parts):
+    """
+    Build a quoted strong ETag from the string representation of `parts`.
+    """
+    digest = hashlib.md5(':'.join(str(part) for part in parts).encode()).hexdigest()
+    return quote_etag(digest)
+
+
+class ConditionalGetMixin:
+    """
+    Mixin for API views answering `If-None-Match`/`If-Modified-Since`.
+
+    Views compute cheap validators (an ETag and optionally a last modification
+    datetime) before serializing, call `get_not_modified_response` and return
+    its result when it is not None, otherwise attach the validators to the
+    full response with `set_validators`.
+
+    `Last-Modified` has a one second resolution, so clients should prefer
+    `If-None-Match`, which takes precedence when both headers are sent.
+    Formats other than JSON get their own ETag (see `get_format_etag`).
+    """
+
+    def get_not_modified_response(self, request, etag, last_modified=None):
+        if request.method not in ('GET', 'HEAD'):
+            return None
+
+        timestamp = int(last_modified.timestamp()) if last_modified else None
+        response = get_conditional_response(request, etag=self.get_format_etag(etag), last_modified=timestamp)
+        if response is not None:
+            self.set_validators(response, etag, last_modified)
+
+        return response
+
+    def set_validators(self, response, etag, last_modified=None):
+        response['ETag'] = self.get_format_etag(etag)
+        patch_vary_headers(response, ('Accept',))
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+
+        return response
+
+    def get_format_etag(self, etag):
+        """
+        Suffix `etag` with the negotiated response format unless it is JSON,
+        so that a cached JSON body is never revalidated for another format.
+        """
+        renderer = getattr(self.request, 'accepted_renderer', None)
+        if renderer is None or renderer.format == 'json':
+            return etag
+        return f'{etag[:-1]}-{renderer.format}"'
@@ -0,0 +1,124 @@
+import io
+import time
+import urllib.error
+import urllib.request
+from wsgiref.util import setup_testing_defaults
+
+from django.conf import settings
+
+
+# Set for the servers load tests start without rate limits (see settings.THROTTLING).
+THROTTLING_DISABLED_ENV = 'THROTTLING_DISABLED'
+
+
+def throttling(enabled):
+    """
+    Return `settings.THROTTLING` with its rate limits turned on or off.
+
+    Load tests run with them off unless asked otherwise, so that the
+    numbers measure the server rather than the rate limiter.
+    """
+    return {**settings.THROTTLING, 'ENABLED': enabled}
+
+
+def percentile(sorted_values, q):
+    """
+    Return the `q` (0-1) nearest-rank percentile of already sorted values.
+    """
+    if not sorted_values:
+        return None
+    return sorted_values[min(len(sorted_values) - 1, max(0, int(q * len(sorted_values) + 0.5) - 1))]
+
+
+def summarize(latencies, elapsed, errors=0):
+    """
+    Return throughput and latency percentiles (in milliseconds) of a run.
+    """
+    values = sorted(latencies)
+    summary = {
+        'requests': len(values),
+        'errors': errors,
+        'rps': round(len(values) / elapsed, 1) if elapsed else 0.0,
+    }
+    for name, q in (('p50_ms', 0.50), ('p95_ms', 0.95), ('p99_ms', 0.99)):
+        value = percentile(values, q)
+        summary[name] = None if value is None else round(value * 1000, 2)
+    return summary
+
+
+def wsgi_environ(method, path, headers=None, body=b'', content_type=''):
+    """
+    Build a WSGI environ for an in-process request to `path`.
+    """
+    path, _, query = path.partition('?')
+    environ = {
+        'REQUEST_METHOD': method,
+        'PATH_INFO': path,
+        'QUERY_STRING': query,
+        'HTTP_HOST': 'localhost',
+        'CONTENT_TYPE': content_type,
+        'CONTENT_LENGTH': str(len(body)),
+        'wsgi.input': io.BytesIO(body),
+    }
+    for name, value in (headers or {}).items():
+        environ['HTTP_' + name.upper().replace('-', '_')] = value
+    setup_testing_defaults(environ)
+    return environ
+
+
+def call_wsgi(handler, environ):
+    """
+    Run one request through a WSGI `handler`; return `(status, seconds)`.
+    """
+    statuses = []
+    started = time.perf_counter()
+    response = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    try:
+        for _ in response:
+            pass
+    finally:
+        if hasattr(response, 'close'):
+            response.close()
+    return int(statuses[0].split(' ', 1)[0]), time.perf_counter() - started
+
+
+def http_call(method, url, headers=None, body=None, timeout=30):
+    """
+    Send one HTTP request; return `(status, seconds, body)`.
+
+    Error statuses are returned like any other, connection failures as
+    status 0.
+    """
+    request = urllib.request.Request(url, data=body, headers=headers or {}, method=method)
+    started = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            status, content = response.status, response.read()
+    except urllib.error.HTTPError as e:
+        status, content = e.code, e.read()
+    except (urllib.error.URLError, OSError):
+        status, content = 0, b''
+    return status, time.perf_counter() - started, content
+
+
+def compare(baseline, current, tolerance=0.1, metric='p95_ms'):
+    """
+    Compare two `bench_api` result documents.
+
+    Return `(name, old, new)` for every endpoint (and `total`) whose
+    `metric` latency grew by more than `tolerance`, or whose throughput
+    dropped by more than `tolerance`, as `name` or `name rps`.
+    """
+    regressions = []
+    pairs = [('total', baseline.get('total'), current.get('total'))]
+    pairs += [(name, baseline.get('endpoints', {}).get(name), summary)
+              for name, summary in current.get('endpoints', {}).items()]
+
+    for name, old, new in pairs:
+        if not old or not new:
+            continue
+        if old.get(metric) and new.get(metric) and new[metric] > old[metric] * (1 + tolerance):
+            regressions.append((name, old[metric], new[metric]))
+        if old.get('rps') and new.get('rps') is not None and new['rps'] < old['rps'] * (1 - tolerance):
+            regressions.append((f'{name} rps', old['rps'], new['rps']))
+    return regressions
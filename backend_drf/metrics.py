@@ -0,0 +1,398 @@
+import functools
+import logging
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.http import HttpResponse
+from rest_framework import permissions
+from rest_framework.views import APIView
+
+from .query_budget import get_query_budget, get_view_class
+
+
+logger = logging.getLogger('backend_drf.metrics')
+
+DEFAULTS = {
+    'ENABLED': True,
+    'QUERY_BUDGET': 50,
+    'LATENCY_BUDGET': 1.0,
+}
+
+PROMETHEUS_CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+TIME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (100, 1000, 10000, 100000, 1000000, 10000000)
+
+# Recorded per request: Prometheus name, help, scale from the recorded unit
+# (integers: microseconds, queries, bytes) and exported bucket bounds.
+METRICS = {
+    'latency': ('http_request_duration_seconds', 'Request latency.', 1e-6, TIME_BUCKETS),
+    'db_queries': ('http_request_db_queries', 'Database queries per request.', 1, QUERY_BUCKETS),
+    'db_time': ('http_request_db_duration_seconds', 'Time spent in database queries per request.',
+                1e-6, TIME_BUCKETS),
+    'serializer_time': ('http_request_serializer_duration_seconds',
+                        'Time spent serializing per request.', 1e-6, TIME_BUCKETS),
+    'response_size': ('http_response_size_bytes', 'Response body size.', 1, SIZE_BUCKETS),
+}
+
+_sample = ContextVar('request_metrics_sample', default=None)
+
+
+class Histogram:
+    """
+    Log-linear histogram in the style of HdrHistogram.
+
+    Non-negative integers are counted in buckets 1/32 as wide as their power
+    of two (values below 64 exactly), so quantiles are within about 3% of
+    the recorded values whatever their range, and memory only grows with
+    the number of distinct buckets used.
+    """
+
+    SUB_BUCKET_BITS = 5
+    SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    @classmethod
+    def index(cls, value):
+        shift = value.bit_length() - cls.SUB_BUCKET_BITS - 1
+        if shift <= 0:
+            return value
+        return (shift + 1) * cls.SUB_BUCKETS + (value >> shift) - cls.SUB_BUCKETS
+
+    @classmethod
+    def bounds(cls, index):
+        """
+        Return the lowest and highest value counted in bucket `index`.
+        """
+        if index < 2 * cls.SUB_BUCKETS:
+            return index, index
+        shift = index // cls.SUB_BUCKETS - 1
+        mantissa = index % cls.SUB_BUCKETS + cls.SUB_BUCKETS
+        return mantissa << shift, ((mantissa + 1) << shift) - 1
+
+    def record(self, value):
+        value = max(0, int(value))
+        index = self.index(value)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def percentile(self, q):
+        """
+        Return the highest value of the bucket holding the `q` (0-1) quantile.
+        """
+        if not self.count:
+            return None
+
+        rank = max(1, round(q * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(self.bounds(index)[1], self.max)
+        return self.max
+
+    def cumulative_counts(self, bounds):
+        """
+        Return, for each of the ascending `bounds`, the number of values in
+        buckets starting at or below it.
+        """
+        counts = []
+        indexes = sorted(self.counts)
+        seen = position = 0
+        for bound in bounds:
+            while position < len(indexes) and self.bounds(indexes[position])[0] <= bound:
+                seen += self.counts[indexes[position]]
+                position += 1
+            counts.append(seen)
+        return counts
+
+
+class MetricsRegistry:
+    """
+    Per-process histograms of the `METRICS`, per view, action and method,
+    and request counts by status code.
+
+    Every worker process keeps its own registry; with several processes each
+    scrape sees the worker that served it.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._requests = {}
+
+    def record(self, labels, status, values):
+        with self._lock:
+            histograms = self._histograms.setdefault(labels, {name: Histogram() for name in METRICS})
+            for name, value in values.items():
+                if value is not None:
+                    histograms[name].record(value)
+            key = (*labels, status)
+            self._requests[key] = self._requests.get(key, 0) + 1
+
+    def get_histogram(self, labels, name):
+        with self._lock:
+            return self._histograms.get(labels, {}).get(name)
+
+    def clear(self):
+        with self._lock:
+            self._histograms.clear()
+            self._requests.clear()
+
+    def render_prometheus(self):
+        """
+        Return the metrics in the Prometheus text exposition format.
+        """
+        lines = [
+            '# HELP http_requests_total Requests by view, action, method and status.',
+            '# TYPE http_requests_total counter',
+        ]
+        with self._lock:
+            for (view, action, method, status), count in sorted(self._requests.items()):
+                labels = _format_labels(view=view, action=action, method=method, status=status)
+                lines.append(f'http_requests_total{{{labels}}} {count}')
+
+            for name, (metric, help_text, scale, buckets) in METRICS.items():
+                lines.append(f'# HELP {metric} {help_text}')
+                lines.append(f'# TYPE {metric} histogram')
+                for (view, action, method), histograms in sorted(self._histograms.items()):
+                    histogram = histograms[name]
+                    if not histogram.count:
+                        continue
+
+                    labels = _format_labels(view=view, action=action, method=method)
+                    counts = histogram.cumulative_counts([bound / scale for bound in buckets])
+                    for bound, count in zip(buckets, counts):
+                        lines.append(f'{metric}_bucket{{{labels},le="{bound:g}"}} {count}')
+                    lines.append(f'{metric}_bucket{{{labels},le="+Inf"}} {histogram.count}')
+                    lines.append(f'{metric}_sum{{{labels}}} {histogram.sum * scale:g}')
+                    lines.append(f'{metric}_count{{{labels}}} {histogram.count}')
+
+        return '\n'.join(lines) + '\n'
+
+
+def _format_labels(**labels):
+    def escape(value):
+        return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+    return ','.join(f'{name}="{escape(value)}"' for name, value in labels.items())
+
+
+registry = MetricsRegistry()
+
+
+@functools.lru_cache
+def get_metrics_config():
+    return {**DEFAULTS, **getattr(settings, 'REQUEST_METRICS', {})}
+
+
+@receiver(setting_changed)
+def reset_metrics_config(*, setting, **kwargs):
+    if setting == 'REQUEST_METRICS':
+        get_metrics_config.cache_clear()
+
+
+class RequestSample:
+    """
+    Measurements of the request being served.
+    """
+
+    def __init__(self):
+        self.response = None
+        self.db_queries = 0
+        self.db_time = 0.0
+        self.timers = {}
+        self._depth = {}
+
+    def execute(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - started
+            self.db_queries += 1
+
+
+def record_query(execute, sql, params, many, context):
+    """
+    Execute wrapper adding the query to the sample of the current request.
+    """
+    sample = _sample.get()
+    if sample is None:
+        return execute(sql, params, many, context)
+    return sample.execute(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_query_recorder(*, connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@contextmanager
+def measure(name):
+    """
+    Add the time spent in the block to the `name` timer of the current
+    request. Nested blocks of the same name are counted once; outside of a
+    request this does nothing.
+    """
+    sample = _sample.get()
+    if sample is None or sample._depth.get(name):
+        yield
+        return
+
+    sample._depth[name] = 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        sample.timers[name] = sample.timers.get(name, 0.0) + time.perf_counter() - started
+        sample._depth[name] = 0
+
+
+class MeasuredSerializerMixin:
+    """
+    Serializer mixin recording `to_representation` in the request's
+    `serializer_time`.
+    """
+
+    def to_representation(self, instance):
+        with measure('serializer_time'):
+            return super().to_representation(instance)
+
+
+def get_view_labels(request, view_func):
+    """
+    Return the `(view, action)` labels of a resolved request: the URL name
+    and the viewset action (the handler method for other views).
+    """
+    match = request.resolver_match
+    view = match.view_name or match.route
+    actions = getattr(view_func, 'actions', None)
+    if actions:
+        action = actions.get(request.method.lower(), '')
+    else:
+        action = request.method.lower()
+    return view, action
+
+
+class RequestMetricsMiddleware:
+    """
+    Records the latency, database queries and time, serializer time and
+    response size of every request in `registry`, and logs requests over
+    the `QUERY_BUDGET`/`LATENCY_BUDGET` of `settings.REQUEST_METRICS`.
+    Views declaring a `query_budget` are held to theirs instead.
+
+    Queries are counted by an execute wrapper installed on every database
+    connection as it is created (`record_query`), which adds them to the
+    sample of the current context: the ORM calls of async views, run in
+    `sync_to_async` threads with their own connections, count too.
+    Streaming responses are measured up to the first byte, their size only
+    when they set `Content-Length`. Runs natively under WSGI and ASGI, so it
+    adds no thread hop in front of the async views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+
+        if not get_metrics_config()['ENABLED']:
+            return self.get_response(request)
+
+        with self.measure_request(request) as sample:
+            sample.response = self.get_response(request)
+        return sample.response
+
+    async def __acall__(self, request):
+        if not get_metrics_config()['ENABLED']:
+            return await self.get_response(request)
+
+        with self.measure_request(request) as sample:
+            sample.response = await self.get_response(request)
+        return sample.response
+
+    @contextmanager
+    def measure_request(self, request):
+        sample = RequestSample()
+        token = _sample.set(sample)
+        started = time.perf_counter()
+        try:
+            # Connections opened before this module was loaded.
+            for connection in connections.all(initialized_only=True):
+                install_query_recorder(connection=connection)
+            yield sample
+        finally:
+            _sample.reset(token)
+        self.record(request, sample, time.perf_counter() - started)
+
+    def record(self, request, sample, latency):
+        response = sample.response
+        view, action = getattr(request, '_metrics_labels', ('unresolved', ''))
+        if response.streaming:
+            size = response.get('Content-Length')
+        else:
+            size = len(response.content)
+
+        registry.record((view, action, request.method), response.status_code, {
+            'latency': latency * 1e6,
+            'db_queries': sample.db_queries,
+            'db_time': sample.db_time * 1e6,
+            'serializer_time': sample.timers.get('serializer_time', 0.0) * 1e6,
+            'response_size': None if size is None else int(size),
+        })
+        self.check_budgets(get_metrics_config(), request, view, action, sample, latency)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view, action = request._metrics_labels = get_view_labels(request, view_func)
+        request._metrics_query_budget = get_query_budget(get_view_class(view_func), action)
+
+    def check_budgets(self, config, request, view, action, sample, latency):
+        query_budget = getattr(request, '_metrics_query_budget', None)
+        if query_budget is None:
+            query_budget = config['QUERY_BUDGET']
+        latency_budget = config['LATENCY_BUDGET']
+        if ((query_budget is not None and sample.db_queries > query_budget)
+                or (latency_budget is not None and latency > latency_budget)):
+            logger.warning(
+                'Request over budget: %s %s (%s %s) took %.1f ms with %d queries (%.1f ms).',
+                request.method, request.path, view, action, latency * 1000,
+                sample.db_queries, sample.db_time * 1000,
+                extra={'view': view, 'action': action, 'latency': latency,
+                       'db_queries': sample.db_queries, 'db_time': sample.db_time},
+            )
+
+
+class MetricsView(APIView):
+    """
+    Serve the request metrics of this process in the Prometheus text format.
+    """
+
+    permission_classes = [permissions.IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return HttpResponse(registry.render_prometheus(), content_type=PROMETHEUS_CONTENT_TYPE)
@@ -0,0 +1,133 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils.translation import gettext_lazy as _
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, _positive_int
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Keyset (seek) pagination over a unique, ascending ordering.
+
+    The cursor holds the ordering values of the last row of the page, and the
+    next page is selected with a `WHERE (a, b) > (x, y)` style filter, so every
+    page costs the same regardless of how deep the client has paged.
+
+    Attributes:
+        ordering (tuple): Field names the queryset is ordered by. The last one
+            must be unique (usually the primary key).
+        page_size (int): Default number of results per page.
+        max_page_size (int): Upper bound for the `limit` query parameter.
+    """
+
+    ordering = ('id',)
+    page_size = api_settings.PAGE_SIZE
+    max_page_size = 1000
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    invalid_cursor_message = _('Invalid cursor')
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.limit = self.get_page_size(request)
+
+        position = self.decode_cursor(request, queryset.model)
+        queryset = queryset.order_by(*self.ordering)
+        if position is not None:
+            queryset = queryset.filter(self.get_seek_filter(position))
+
+        results = list(queryset[:self.limit + 1])
+        self.has_next = len(results) > self.limit
+        self.page = results[:self.limit]
+
+        return self.page
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {
+                    'type': 'string',
+                    'nullable': True,
+                    'format': 'uri',
+                },
+                'results': schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        try:
+            return _positive_int(
+                request.query_params[self.page_size_query_param],
+                strict=True,
+                cutoff=self.max_page_size
+            )
+        except (KeyError, ValueError):
+            return self.page_size
+
+    def get_seek_filter(self, position):
+        """
+        Build the filter selecting rows strictly after `position`.
+
+        For `(a, b) > (x, y)` this yields `a >= x AND (a > x OR b > y)`, which
+        keeps a plain range condition on the leading column for the index.
+        """
+        *prefix, (last_field, last_value) = zip(self.ordering, position)
+        seek = Q(**{f'{last_field}__gt': last_value})
+        for field, value in reversed(prefix):
+            seek = Q(**{f'{field}__gt': value}) | (Q(**{field: value}) & seek)
+
+        first_field, first_value = self.ordering[0], position[0]
+        if len(self.ordering) > 1:
+            seek = Q(**{f'{first_field}__gte': first_value}) & seek
+
+        return seek
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+
+        last = self.page[-1]
+        position = [self.get_position_value(last, field) for field in self.ordering]
+        url = replace_query_param(self.base_url, self.page_size_query_param, self.limit)
+
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(position))
+
+    def get_position_value(self, instance, field):
+        if isinstance(instance, dict):
+            return instance[field]
+        return getattr(instance, field)
+
+    def encode_cursor(self, position):
+        payload = json.dumps([str(value) for value in position])
+        return urlsafe_b64encode(payload.encode()).decode('ascii').rstrip('=')
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None
+
+        try:
+            padded = encoded + '=' * (-len(encoded) % 4)
+            values = json.loads(urlsafe_b64decode(padded.encode('ascii')))
+            if not isinstance(values, list) or len(values) != len(self.ordering):
+                raise ValueError(encoded)
+
+            return [model._meta.get_field(field).to_python(value)
+                    for field, value in zip(self.ordering, values)]
+        except (TypeError, ValueError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
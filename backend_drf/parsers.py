@@ -0,0 +1,21 @@
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class MessagePackParser(BaseParser):
+    """
+    Parses MessagePack request bodies (requires the `msgpack` package).
+    """
+
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as e:
+            raise ParseError(f'MessagePack parse error - {e}')
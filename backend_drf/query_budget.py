@@ -0,0 +1,106 @@
+from contextlib import contextmanager
+
+from django.db import connections
+
+
+def query_budget(max_queries):
+    """
+    Declare the most database queries a view action (or handler method)
+    may make per request, authentication included.
+
+        @query_budget(4)
+        def list(self, request, *args, **kwargs):
+            ...
+
+    The budget is enforced in tests by `QueryBudgetTestMixin` and checked
+    on every request by `backend_drf.metrics.RequestMetricsMiddleware`,
+    which logs the requests going over it.
+    """
+    def decorator(func):
+        func.query_budget = max_queries
+        return func
+    return decorator
+
+
+def get_query_budget(view_class, action):
+    """
+    Return the budget declared for `action` of `view_class`, or None.
+    """
+    return getattr(getattr(view_class, action, None), 'query_budget', None)
+
+
+def get_view_class(view_func):
+    """
+    Return the class of a view function made by `View.as_view` (including
+    viewsets), or None.
+    """
+    return getattr(view_func, 'cls', None) or getattr(view_func, 'view_class', None)
+
+
+class QueryLog:
+    """
+    Execute wrapper collecting the SQL of the queries it sees.
+    """
+
+    def __init__(self):
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        self.queries.append(sql)
+        return execute(sql, params, many, context)
+
+    def __len__(self):
+        return len(self.queries)
+
+
+@contextmanager
+def log_queries(using='default'):
+    """
+    Collect the queries run on `using` in the block.
+
+    Unlike `CaptureQueriesContext`, the log is not emptied by the
+    `request_started` signal of test client requests.
+    """
+    log = QueryLog()
+    with connections[using].execute_wrapper(log):
+        yield log
+
+
+class QueryBudgetTestMixin:
+    """
+    Test case mixin checking declared query budgets and catching N+1 queries.
+
+    `assertQueryBudget` grows the data set through `query_budget_sizes`
+    and fails when a request makes more queries than its view declares or
+    when the number of queries changes with the size of the data.
+    """
+
+    query_budget_sizes = (1, 10, 1000)
+
+    def assertQueryBudget(self, view_class, action, request, seed, sizes=None, using='default'):
+        """
+        For each size `n`, call `seed(n)` to bring the data to `n` rows,
+        then `request()`; streaming responses are consumed.
+        """
+        budget = get_query_budget(view_class, action)
+        if budget is None:
+            self.fail(f'{view_class.__name__}.{action} declares no query budget.')
+
+        counts = {}
+        for size in sizes or self.query_budget_sizes:
+            seed(size)
+            with log_queries(using) as log:
+                response = request()
+                if response.streaming:
+                    b''.join(response.streaming_content)
+
+            self.assertLess(response.status_code, 400, f'{view_class.__name__}.{action} failed with n={size}.')
+            self.assertLessEqual(
+                len(log), budget,
+                f'{view_class.__name__}.{action} made {len(log)} queries with n={size}, '
+                f'its budget is {budget}:\n' + '\n'.join(log.queries),
+            )
+            counts[size] = len(log)
+
+        self.assertEqual(len(set(counts.values())), 1,
+                         f'{view_class.__name__}.{action} query count grows with the data: {counts}')
@@ -0,0 +1,29 @@
+from rest_framework.renderers import BaseRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    Renders response data as MessagePack (requires the `msgpack` package).
+
+    Values outside the MessagePack types (dates, decimals, UUIDs, lazy
+    strings...) are converted like `JSONRenderer` does, so both formats
+    carry the same data.
+    """
+
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    encoder = JSONEncoder()
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=self.encoder.default, use_bin_type=True)
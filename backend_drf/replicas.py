@@ -0,0 +1,198 @@
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DatabaseError, connections
+
+
+_read_alias = ContextVar('read_alias', default=None)
+
+_health = {}
+_health_lock = threading.Lock()
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+
+class ReplicaRouter:
+    """
+    Database router sending reads to the alias selected for the current
+    request (see `ReplicaReadMixin`) and everything else to `default`.
+
+    Outside of replica-enabled requests, reads go to `default` as well, so
+    writes and the reads that validate them (unique checks, `select_for_update`)
+    never see a lagging replica.
+    """
+
+    def db_for_read(self, model, **hints):
+        return _read_alias.get()
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # The replica holds the same data as `default`.
+        return True
+
+
+def current_read_alias():
+    """
+    Return the alias reads are routed to, None for `default`.
+    """
+    return _read_alias.get()
+
+
+def get_replica_alias():
+    alias = getattr(settings, 'REPLICA_DATABASE', 'replica')
+    return alias if alias in settings.DATABASES else None
+
+
+@contextmanager
+def read_from(alias):
+    """
+    Route the reads of the block to `alias`.
+    """
+    token = _read_alias.set(alias)
+    try:
+        yield
+    finally:
+        _read_alias.reset(token)
+
+
+def _is_missing_sqlite_file(connection):
+    """
+    Return whether `connection` is a SQLite database whose file does not
+    exist; connecting would create it empty.
+    """
+    if connection.vendor != 'sqlite' or connection.is_in_memory_db():
+        return False
+
+    name = str(connection.settings_dict['NAME'])
+    if name.startswith('file:'):
+        name = urlsplit(name).path
+    return not Path(name).exists()
+
+
+def replica_is_healthy(alias):
+    """
+    Return whether `alias` answers a trivial query, caching the answer for
+    `REPLICA_HEALTH_CHECK_INTERVAL` seconds per process.
+    """
+    now = time.monotonic()
+    entry = _health.get(alias)
+    if entry is not None and entry[0] > now:
+        return entry[1]
+
+    connection = connections[alias]
+    try:
+        if _is_missing_sqlite_file(connection):
+            raise DatabaseError(f'{connection.settings_dict["NAME"]} does not exist.')
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT 1')
+        healthy = True
+    except DatabaseError:
+        healthy = False
+        connection.close()
+
+    _set_health(alias, healthy, now)
+    return healthy
+
+
+def mark_replica_unhealthy(alias):
+    """
+    Skip `alias` until its next health check, after one of its queries failed.
+    """
+    connections[alias].close()
+    _set_health(alias, False, time.monotonic())
+
+
+def _set_health(alias, healthy, now):
+    with _health_lock:
+        _health[alias] = (now + getattr(settings, 'REPLICA_HEALTH_CHECK_INTERVAL', 10), healthy)
+
+
+def reset_replica_health():
+    with _health_lock:
+        _health.clear()
+
+
+def _pin_key(user_pk):
+    return f'replicas:pinned:{user_pk}'
+
+
+def pin_to_primary(user_pk):
+    """
+    Send the reads of `user_pk` to `default` for `REPLICA_STICKY_SECONDS`, so
+    users read their own writes while the replica catches up.
+
+    The pin is kept in the default cache; use a shared cache when running
+    several processes.
+    """
+    timeout = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+    if user_pk is not None and timeout:
+        cache.set(_pin_key(user_pk), True, timeout)
+
+
+def is_pinned_to_primary(user_pk):
+    return user_pk is not None and cache.get(_pin_key(user_pk), False)
+
+
+class ReplicaReadMixin:
+    """
+    API view mixin reading from the replica for `replica_actions`.
+
+    Safe requests of those actions are served from `REPLICA_DATABASE` unless
+    no replica is configured, it fails its health check, or the user wrote
+    something within `REPLICA_STICKY_SECONDS`. A request whose replica query
+    fails is run again on `default`, and the replica is skipped until its
+    next health check. Successful unsafe requests of the view pin their user
+    to `default`.
+    """
+
+    replica_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+
+        alias = self.get_read_alias(request)
+        if alias is not None:
+            self._read_alias_token = _read_alias.set(alias)
+
+    def get_read_alias(self, request):
+        alias = get_replica_alias()
+        if (alias is None
+                or request.method not in SAFE_METHODS
+                or getattr(self, 'action', None) not in self.replica_actions
+                or is_pinned_to_primary(request.user.pk)):
+            return None
+
+        return alias if replica_is_healthy(alias) else None
+
+    def handle_exception(self, exc):
+        token = getattr(self, '_read_alias_token', None)
+        if token is None or not isinstance(exc, DatabaseError):
+            return super().handle_exception(exc)
+
+        mark_replica_unhealthy(_read_alias.get())
+        _read_alias.reset(token)
+        self._read_alias_token = None
+        try:
+            handler = getattr(self, self.request.method.lower(), self.http_method_not_allowed)
+            return handler(self.request, *self.args, **self.kwargs)
+        except Exception as retry_exc:
+            return super().handle_exception(retry_exc)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        token = getattr(self, '_read_alias_token', None)
+        if token is not None:
+            _read_alias.reset(token)
+            self._read_alias_token = None
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(getattr(request.user, 'pk', None))
+
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,5 +1,8 @@
+import os
+
 from dotenv import dotenv_values
 from datetime import timedelta
+from importlib.util import find_spec
 from pathlib import Path
 
 
@@ -34,9 +37,13 @@ INSTALLED_APPS = [
     # created apps
     'users',
     'tasks',
+    'jobs',
 ]
 
 MIDDLEWARE = [
+    'backend_drf.metrics.RequestMetricsMiddleware',
+    'backend_drf.throttling.RateLimitHeadersMiddleware',
+    'backend_drf.compression.CompressionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -70,13 +77,76 @@ WSGI_APPLICATION = 'backend_drf.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
+# DB_PROFILE (from .env) selects how connections are made:
+# - development: a new connection per request, stock SQLite settings.
+# - production: persistent connections checked before reuse, and the tuned
+#   SQLite backend (WAL, synchronous=NORMAL, busy timeout, mmap, writers
+#   taking the lock with BEGIN IMMEDIATE; see backend_drf.db.sqlite3).
+# Compare them with `manage.py bench_db`.
+
+DATABASE_PROFILES = {
+    'development': {
+        'ENGINE': 'django.db.backends.sqlite3',
+    },
+    'production': {
+        'ENGINE': 'backend_drf.db.sqlite3',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': 'IMMEDIATE',
+            'pragmas': {
+                'journal_mode': 'WAL',
+                'synchronous': 'NORMAL',
+                'busy_timeout': 5000,
+                'mmap_size': 256 * 1024 * 1024,
+            },
+        },
+    },
+}
+
+DB_PROFILE = ENV_DATA.get('DB_PROFILE', 'development')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        **DATABASE_PROFILES[DB_PROFILE],
         'NAME': BASE_DIR / 'db.sqlite3',
     }
 }
 
+# Optional read replica, used for task/user list and retrieve requests
+# (backend_drf.replicas). Locally it can be a second SQLite file kept in sync
+# by copying db.sqlite3, or a Postgres streaming replica
+# (REPLICA_DB_ENGINE=django.db.backends.postgresql plus host, port, ...).
+# SQLite replicas are opened read-only, so a missing file is reported
+# instead of being created empty.
+
+if ENV_DATA.get('REPLICA_DB_NAME'):
+    REPLICA_DB_ENGINE = ENV_DATA.get('REPLICA_DB_ENGINE', 'django.db.backends.sqlite3')
+    DATABASES['replica'] = {
+        'ENGINE': REPLICA_DB_ENGINE,
+        'NAME': (f'file:{ENV_DATA["REPLICA_DB_NAME"]}?mode=ro' if REPLICA_DB_ENGINE.endswith('sqlite3')
+                 else ENV_DATA['REPLICA_DB_NAME']),
+        'HOST': ENV_DATA.get('REPLICA_DB_HOST', ''),
+        'PORT': ENV_DATA.get('REPLICA_DB_PORT', ''),
+        'USER': ENV_DATA.get('REPLICA_DB_USER', ''),
+        'PASSWORD': ENV_DATA.get('REPLICA_DB_PASSWORD', ''),
+        'CONN_MAX_AGE': DATABASES['default'].get('CONN_MAX_AGE', 0),
+        'CONN_HEALTH_CHECKS': DATABASES['default'].get('CONN_HEALTH_CHECKS', False),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['backend_drf.replicas.ReplicaRouter']
+
+REPLICA_DATABASE = 'replica'
+
+# Seconds a user's reads stay on the primary after a write (read-your-writes).
+
+REPLICA_STICKY_SECONDS = 5
+
+# Seconds an unreachable replica is skipped before it is checked again.
+
+REPLICA_HEALTH_CHECK_INTERVAL = 10
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -97,6 +167,39 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+AUTHENTICATION_BACKENDS = [
+    'users.backends.PooledModelBackend',
+]
+
+# Password hasher profiles (users.hashers). PASSWORD_HASHER_PROFILE picks the
+# one new hashes are made with; the others stay listed so existing hashes
+# still verify and are upgraded on the next successful login, as are hashes
+# made with older OPTIONS. Compare profiles with `manage.py bench_hashers`.
+# 'argon2' requires the argon2-cffi package.
+
+PASSWORD_HASHER_PROFILES = {
+    'pbkdf2_sha256': {
+        'HASHER': 'users.hashers.PBKDF2PasswordHasher',
+        'OPTIONS': {'iterations': 600000},
+    },
+    'scrypt': {
+        'HASHER': 'users.hashers.ScryptPasswordHasher',
+        'OPTIONS': {'work_factor': 2 ** 14, 'block_size': 8, 'parallelism': 1},
+    },
+    'argon2': {
+        'HASHER': 'users.hashers.Argon2PasswordHasher',
+        'OPTIONS': {'time_cost': 2, 'memory_cost': 19456, 'parallelism': 1},
+    },
+}
+
+PASSWORD_HASHER_PROFILE = ENV_DATA.get('PASSWORD_HASHER_PROFILE', 'pbkdf2_sha256')
+
+PASSWORD_HASHERS = [PASSWORD_HASHER_PROFILES[PASSWORD_HASHER_PROFILE]['HASHER']] + [
+    profile['HASHER'] for name, profile in PASSWORD_HASHER_PROFILES.items()
+    if name != PASSWORD_HASHER_PROFILE
+]
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/4.2/topics/i18n/
 
@@ -148,17 +251,163 @@ SIMPLE_JWT = {
     "TOKEN_USER_CLASS": "rest_framework_simplejwt.models.TokenUser",
 
     "JTI_CLAIM": "jti",
+
+    "TOKEN_OBTAIN_SERIALIZER": "users.tokens.ClaimsTokenObtainPairSerializer",
+}
+
+# Seconds a user's active/staff/superuser flags are trusted by
+# StatelessJWTAuthentication before they are re-read from the database.
+
+JWT_USER_STATUS_CACHE_TIMEOUT = 30
+
+# Users whose flags are kept per process; the least recently used are
+# dropped beyond it.
+
+JWT_USER_STATUS_CACHE_MAX_ENTRIES = 100000
+
+# Worker processes that hash and verify passwords (users.hashing).
+# At most WORKERS + QUEUE_LIMIT jobs are accepted per web process; further
+# signups and password changes get 503 with Retry-After: RETRY_AFTER.
+# WORKERS = 0 hashes on the request thread.
+
+PASSWORD_HASHING = {
+    'WORKERS': 2,
+    'QUEUE_LIMIT': 32,
+    'TIMEOUT': 30,
+    'RETRY_AFTER': 1,
 }
 
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'users.authentication.StatelessJWTAuthentication',
     ),
     
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
     
+    'DEFAULT_THROTTLE_CLASSES': [
+        'backend_drf.throttling.TokenBucketThrottle',
+    ],
+    
+    'DEFAULT_RENDERER_CLASSES': [
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    
+    'DEFAULT_PARSER_CLASSES': [
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
+    
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 20,
-}
\ No newline at end of file
+}
+
+# `Accept: application/msgpack` responses and request bodies when the
+# optional msgpack package is installed.
+
+if find_spec('msgpack') is not None:
+    REST_FRAMEWORK['DEFAULT_RENDERER_CLASSES'].append('backend_drf.renderers.MessagePackRenderer')
+    REST_FRAMEWORK['DEFAULT_PARSER_CLASSES'].append('backend_drf.parsers.MessagePackParser')
+
+# Response compression (backend_drf.compression): brotli when the optional
+# brotli package is installed and accepted, else gzip. Responses under
+# MIN_SIZE bytes are sent as is; `manage.py bench_encoding` compares the
+# sizes and encode times of the formats and levels.
+
+COMPRESSION = {
+    'ENABLED': True,
+    'MIN_SIZE': 1024,
+    'GZIP_LEVEL': 6,
+    'BROTLI_QUALITY': 4,
+}
+
+# Token bucket rate limits (backend_drf.throttling): RATE refills the bucket,
+# BURST is its size. Reads use the `list` scope and other methods `write`,
+# per user (per IP address when anonymous); `login` is per IP address and
+# `login_account` per submitted email, charged by failed logins only. The
+# local store limits each process separately; use
+# 'backend_drf.throttling.RedisBucketStore' with {'alias': ...} (a RedisCache
+# in CACHES) to share the buckets.
+
+THROTTLING = {
+    'ENABLED': True,
+    'STORE': {
+        'BACKEND': 'backend_drf.throttling.LocalBucketStore',
+        'OPTIONS': {
+            'max_keys': 100000,
+        },
+    },
+    'SCOPES': {
+        'list': {'RATE': '20/s', 'BURST': 100},
+        'write': {'RATE': '10/s', 'BURST': 50},
+        'login': {'RATE': '30/m', 'BURST': 30},
+        'login_account': {'RATE': '10/m', 'BURST': 10},
+        'password': {'RATE': '10/m', 'BURST': 10},
+    },
+}
+
+# Benchmarks starting a server without rate limits (`manage.py bench_api`)
+# set THROTTLING_DISABLED in its environment.
+
+if os.environ.get('THROTTLING_DISABLED'):
+    THROTTLING['ENABLED'] = False
+
+# Per-view request metrics (backend_drf.metrics), served to admins at
+# /api/_metrics. Requests over QUERY_BUDGET queries or LATENCY_BUDGET
+# seconds are logged as warnings; None disables a budget.
+
+REQUEST_METRICS = {
+    'ENABLED': True,
+    'QUERY_BUDGET': 50,
+    'LATENCY_BUDGET': 1.0,
+}
+
+# Task list response cache.
+# Use 'tasks.cache.DjangoCacheBackend' with {'alias': ...} to store the
+# entries and version counters in one of CACHES shared by all workers.
+
+TASK_LIST_CACHE = {
+    'BACKEND': 'tasks.cache.LRUCacheBackend',
+    'OPTIONS': {
+        'max_entries': 10000,
+        'timeout': 60,
+    },
+}
+
+# Background jobs (jobs app), run by `manage.py run_jobs`. CHUNK_SIZE is the
+# number of rows deleted per transaction by the user deletion job; LEASE is
+# how long (seconds) a job stays with a worker that stopped reporting.
+
+JOBS = {
+    'CHUNK_SIZE': 1000,
+    'LEASE': 60,
+    'MAX_ATTEMPTS': 3,
+    'POLL_INTERVAL': 1.0,
+}
+
+# Task change events pushed on /api/tasks/stream/ (tasks.events). The
+# in-process broker only reaches the streams served by the same process;
+# with several server processes plug in a broker shared by all of them.
+
+TASK_EVENTS = {
+    'BACKEND': 'tasks.events.InProcessBroker',
+    'OPTIONS': {
+        'buffer_size': 10000,
+        'max_pending': 1000,
+    },
+    'KEEPALIVE': 15,
+    'MAX_DURATION': 300,
+}
+
+# Encode plain JSON task lists straight from database rows (tasks.fast)
+# instead of running TaskSerializer and JSONRenderer.
+
+TASK_LIST_FAST_SERIALIZER = True
+
+# How long deleted tasks are remembered for delta sync (/api/tasks/changes/).
+# Older sync tokens are rejected and clients fall back to a full sync.
+
+TASK_TOMBSTONE_RETENTION = timedelta(days=30)
\ No newline at end of file
@@ -0,0 +1,337 @@
+import functools
+import math
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework.exceptions import APIException
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework.throttling import BaseThrottle
+
+
+DEFAULTS = {
+    'ENABLED': True,
+    'STORE': {
+        'BACKEND': 'backend_drf.throttling.LocalBucketStore',
+        'OPTIONS': {},
+    },
+    'SCOPES': {},
+}
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+BucketState = namedtuple('BucketState', 'allowed remaining retry_after reset')
+
+
+class BaseBucketStore:
+    """
+    Base class for token bucket stores.
+
+    `consume` atomically refills the bucket of `key` at `rate` tokens per
+    second up to `capacity`, then takes `cost` tokens from it if it holds
+    enough. It returns a `BucketState` with the tokens left and the seconds
+    until `cost` tokens (`retry_after`) and a full bucket (`reset`) are
+    available.
+    """
+
+    def consume(self, key, rate, capacity, cost=1):
+        raise NotImplementedError
+
+    def clear(self):
+        pass
+
+    def peek(self, key, rate, capacity, cost=1):
+        """
+        Return the state `consume` would return, without taking tokens.
+        """
+        state = self.consume(key, rate, capacity, cost=0)
+        tokens = round(capacity - state.reset * rate, 9)
+        return self.make_state(tokens >= cost, tokens, rate, capacity, cost)
+
+    @staticmethod
+    def make_state(allowed, tokens, rate, capacity, cost):
+        return BucketState(
+            allowed,
+            int(tokens),
+            0.0 if allowed else (cost - tokens) / rate,
+            (capacity - tokens) / rate,
+        )
+
+
+class LocalBucketStore(BaseBucketStore):
+    """
+    Buckets kept in the memory of the current process.
+
+    Each worker process limits on its own: with N processes a client gets
+    up to N times the configured rate. The least recently used buckets are
+    dropped beyond `max_keys` (a dropped bucket starts full again).
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        self._buckets = OrderedDict()
+
+    def consume(self, key, rate, capacity, cost=1):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                tokens = capacity
+                if len(self._buckets) >= self.max_keys:
+                    self._buckets.popitem(last=False)
+            else:
+                tokens = min(capacity, bucket[0] + (now - bucket[1]) * rate)
+                self._buckets.move_to_end(key)
+
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            self._buckets[key] = (tokens, now)
+
+        return self.make_state(allowed, tokens, rate, capacity, cost)
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+class RedisBucketStore(BaseBucketStore):
+    """
+    Buckets shared by every process, kept in the Redis server of one of
+    `CACHES` (which must use `django.core.cache.backends.redis.RedisCache`).
+
+    The refill and the take run as one Lua script on the server, with the
+    server clock, so concurrent requests from any worker never overdraw a
+    bucket. Idle buckets expire once they would be full again.
+    """
+
+    SCRIPT = """
+        local rate = tonumber(ARGV[1])
+        local capacity = tonumber(ARGV[2])
+        local cost = tonumber(ARGV[3])
+        local time = redis.call('TIME')
+        local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+
+        local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+        local tokens = tonumber(bucket[1]) or capacity
+        local ts = tonumber(bucket[2]) or now
+        tokens = math.min(capacity, tokens + math.max(0, now - ts) * rate)
+
+        local allowed = 0
+        if tokens >= cost then
+            tokens = tokens - cost
+            allowed = 1
+        end
+        redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'ts', tostring(now))
+        redis.call('PEXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate * 1000) + 1000)
+        return {allowed, tostring(tokens)}
+    """
+
+    def __init__(self, alias='default', key_prefix='throttle'):
+        self.alias = alias
+        self.key_prefix = key_prefix
+        self._script = None
+
+    def consume(self, key, rate, capacity, cost=1):
+        cache = caches[self.alias]
+        key = cache.make_and_validate_key(f'{self.key_prefix}:{key}')
+        client = cache._cache.get_client(key, write=True)
+        if self._script is None:
+            self._script = client.register_script(self.SCRIPT)
+
+        allowed, tokens = self._script(keys=[key], args=[rate, capacity, cost], client=client)
+        return self.make_state(bool(allowed), float(tokens), rate, capacity, cost)
+
+
+@functools.lru_cache
+def get_throttling_config():
+    return {**DEFAULTS, **getattr(settings, 'THROTTLING', {})}
+
+
+@functools.lru_cache
+def get_bucket_store():
+    """
+    Return the bucket store configured by `settings.THROTTLING['STORE']`.
+    """
+    config = get_throttling_config()['STORE']
+    return import_string(config['BACKEND'])(**config.get('OPTIONS', {}))
+
+
+@functools.lru_cache(maxsize=None)
+def get_scope_limits(scope):
+    """
+    Return the `(rate per second, capacity)` of `scope`, or None when the
+    scope is not limited.
+
+    Scopes are configured as `{'RATE': '<n>/<s|m|h|d>', 'BURST': <tokens>}`;
+    the burst defaults to `n`.
+    """
+    config = get_throttling_config()['SCOPES'].get(scope)
+    if not config or not config.get('RATE'):
+        return None
+
+    requests, period = config['RATE'].split('/')
+    requests = int(requests)
+    return requests / PERIODS[period[0]], config.get('BURST', requests)
+
+
+@receiver(setting_changed)
+def reset_throttling(*, setting, **kwargs):
+    if setting == 'THROTTLING':
+        get_throttling_config.cache_clear()
+        get_bucket_store.cache_clear()
+        get_scope_limits.cache_clear()
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """
+    Token bucket throttle with per-scope limits from `settings.THROTTLING`.
+
+    The scope is the view's `throttle_scope`, else `list` for safe methods
+    and `write` for the others. Authenticated requests draw from the bucket
+    of their user, anonymous ones from the bucket of their IP address
+    (`get_ident`, honouring `NUM_PROXIES`). A throttled request gets
+    `429` with `Retry-After`; `RateLimitHeadersMiddleware` adds the
+    `RateLimit-*` headers of the bucket to every response.
+    """
+
+    def allow_request(self, request, view):
+        self.retry_after = None
+        if not get_throttling_config()['ENABLED']:
+            return True
+
+        store = get_bucket_store()
+        for scope, key in self.get_buckets(request, view):
+            limits = get_scope_limits(scope)
+            if limits is None:
+                continue
+
+            rate, capacity = limits
+            state = store.consume(key, rate, capacity)
+            self.record(request, capacity, state)
+            if not state.allowed:
+                self.retry_after = state.retry_after
+                return False
+
+        return True
+
+    def get_scope(self, request, view):
+        scope = getattr(view, 'throttle_scope', None)
+        if scope is not None:
+            return scope
+        return 'list' if request.method in SAFE_METHODS else 'write'
+
+    def get_buckets(self, request, view):
+        """
+        Return the `(scope, key)` of the buckets the request draws from.
+        """
+        scope = self.get_scope(request, view)
+        user = getattr(request, 'user', None)
+        if user is not None and user.is_authenticated:
+            return [(scope, f'{scope}:user:{user.pk}')]
+        return [(scope, f'{scope}:ip:{self.get_ident(request)}')]
+
+    def record(self, request, capacity, state):
+        # Keep the bucket closest to empty for the response headers.
+        request = getattr(request, '_request', request)
+        current = getattr(request, 'ratelimit', None)
+        if current is None or state.remaining < current[1]:
+            request.ratelimit = (capacity, state.remaining, state.reset)
+
+    def wait(self):
+        if self.retry_after is None:
+            return None
+        return math.ceil(self.retry_after)
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """
+    Throttle of the token endpoint: per IP address in the `login` scope and
+    per submitted account in the `login_account` scope, so that both one
+    client trying many accounts and many clients trying one account are
+    slowed down.
+
+    Every attempt draws from the IP bucket. The account bucket is only
+    checked here and drawn from by `record_failure` once the credentials
+    were rejected, so that nobody can lock an account out without failing
+    its logins, and its owner's successful logins are never limited by it.
+    """
+
+    def allow_request(self, request, view):
+        if not super().allow_request(request, view):
+            return False
+
+        account = self.get_account_bucket(request)
+        limits = get_scope_limits('login_account')
+        if account is None or limits is None or not get_throttling_config()['ENABLED']:
+            return True
+
+        rate, capacity = limits
+        state = get_bucket_store().peek(account, rate, capacity)
+        self.record(request, capacity, state)
+        if not state.allowed:
+            self.retry_after = state.retry_after
+            return False
+        return True
+
+    def record_failure(self, request):
+        """
+        Draw from the account bucket of a rejected login.
+        """
+        account = self.get_account_bucket(request)
+        limits = get_scope_limits('login_account')
+        if account is not None and limits is not None and get_throttling_config()['ENABLED']:
+            get_bucket_store().consume(account, *limits)
+
+    def get_buckets(self, request, view):
+        return [('login', f'login:ip:{self.get_ident(request)}')]
+
+    def get_account_bucket(self, request):
+        try:
+            data = request.data
+        except APIException:
+            data = None
+        account = data.get('email') if hasattr(data, 'get') else None
+        if isinstance(account, str) and account:
+            return f'login:account:{account.strip().lower()}'
+        return None
+
+
+class RateLimitHeadersMiddleware:
+    """
+    Adds `RateLimit-Limit`, `RateLimit-Remaining` and `RateLimit-Reset`
+    (seconds until the bucket is full) to the responses of throttled views.
+    """
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        return self.add_headers(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.add_headers(request, await self.get_response(request))
+
+    def add_headers(self, request, response):
+        ratelimit = getattr(request, 'ratelimit', None)
+        if ratelimit is not None:
+            limit, remaining, reset = ratelimit
+            response['RateLimit-Limit'] = str(limit)
+            response['RateLimit-Remaining'] = str(max(0, remaining))
+            response['RateLimit-Reset'] = str(math.ceil(reset))
+        return response
@@ -0,0 +1,10 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress_done', 'progress_total', 'attempts', 'created', 'finished')
+    list_filter = ('kind', 'status')
+    readonly_fields = ('worker', 'lease_expires', 'started', 'finished')
@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from jobs.queue import get_jobs_config, get_worker_name, run_pending
+
+
+class Command(BaseCommand):
+    """
+    Run background jobs as they are queued.
+
+    Several workers may run at once, on one or more hosts: each job is
+    leased to a single worker. With `--once` the command exits when no job
+    is left, which suits cron or tests.
+    """
+
+    help = 'Run queued background jobs.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true',
+                            help='Exit when no job is left instead of waiting for more.')
+        parser.add_argument('--max-jobs', type=int,
+                            help='Exit after running this many jobs.')
+        parser.add_argument('--poll-interval', type=float,
+                            help='Seconds between checks for new jobs (default JOBS["POLL_INTERVAL"]).')
+
+    def handle(self, *args, **options):
+        worker = get_worker_name()
+        poll_interval = options['poll_interval'] or get_jobs_config()['POLL_INTERVAL']
+        remaining = options['max_jobs']
+        ran = 0
+
+        try:
+            while remaining is None or remaining > 0:
+                jobs = run_pending(worker, max_jobs=remaining)
+                for job in jobs:
+                    self.stdout.write(f'Job {job.pk} ({job.kind}): {job.status}')
+                ran += len(jobs)
+                if remaining is not None:
+                    remaining -= len(jobs)
+
+                if options['once']:
+                    break
+                if not jobs:
+                    time.sleep(poll_interval)
+        except KeyboardInterrupt:
+            pass
+
+        if options['verbosity'] > 0:
+            self.stdout.write(self.style.SUCCESS(f'{ran} jobs run by {worker}.'))
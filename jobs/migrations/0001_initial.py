@@ -0,0 +1,40 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(max_length=100, verbose_name='Kind')),
+                ('params', models.JSONField(default=dict, verbose_name='Parameters')),
+                ('key', models.CharField(blank=True, default='', max_length=200, verbose_name='Key')),
+                ('owner_id', models.BigIntegerField(blank=True, null=True, verbose_name='Owner')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10, verbose_name='Status')),
+                ('progress_done', models.PositiveBigIntegerField(default=0, verbose_name='Done')),
+                ('progress_total', models.PositiveBigIntegerField(blank=True, null=True, verbose_name='Total')),
+                ('result', models.JSONField(blank=True, null=True, verbose_name='Result')),
+                ('error', models.TextField(blank=True, default='', verbose_name='Error')),
+                ('attempts', models.PositiveIntegerField(default=0, verbose_name='Attempts')),
+                ('worker', models.CharField(blank=True, default='', max_length=100, verbose_name='Worker')),
+                ('lease_expires', models.DateTimeField(blank=True, null=True, verbose_name='Lease expires')),
+                ('created', models.DateTimeField(auto_now_add=True, verbose_name='Created')),
+                ('started', models.DateTimeField(blank=True, null=True, verbose_name='Started')),
+                ('finished', models.DateTimeField(blank=True, null=True, verbose_name='Finished')),
+            ],
+            options={
+                'verbose_name': 'Job',
+                'verbose_name_plural': 'Jobs',
+                'indexes': [models.Index(fields=['status', 'id'], name='jobs_status_id_idx'), models.Index(fields=['key', 'status'], name='jobs_key_status_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,58 @@
+from django.db import models
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """
+    A unit of background work, run by the `run_jobs` worker.
+
+    `kind` selects the handler registered with `jobs.queue.register` and
+    `params` are its arguments. A running job holds a lease
+    (`lease_expires`) that the worker extends while reporting progress; a
+    job whose lease ran out (its worker died) is picked up again, up to
+    `JOBS['MAX_ATTEMPTS']` attempts, so handlers must be safe to re-run.
+
+    `owner_id` is the user who requested the job, stored as a plain id so
+    that jobs deleting that very user keep their record.
+    """
+    
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    
+    STATUS_CHOICES = [
+        (QUEUED, _('Queued')),
+        (RUNNING, _('Running')),
+        (SUCCEEDED, _('Succeeded')),
+        (FAILED, _('Failed')),
+    ]
+    
+    ACTIVE_STATUSES = (QUEUED, RUNNING)
+    
+    kind = models.CharField(_("Kind"), max_length=100)
+    params = models.JSONField(_("Parameters"), default=dict)
+    key = models.CharField(_("Key"), max_length=200, blank=True, default='')
+    owner_id = models.BigIntegerField(_("Owner"), null=True, blank=True)
+    status = models.CharField(_("Status"), max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress_done = models.PositiveBigIntegerField(_("Done"), default=0)
+    progress_total = models.PositiveBigIntegerField(_("Total"), null=True, blank=True)
+    result = models.JSONField(_("Result"), null=True, blank=True)
+    error = models.TextField(_("Error"), blank=True, default='')
+    attempts = models.PositiveIntegerField(_("Attempts"), default=0)
+    worker = models.CharField(_("Worker"), max_length=100, blank=True, default='')
+    lease_expires = models.DateTimeField(_("Lease expires"), null=True, blank=True)
+    created = models.DateTimeField(_("Created"), auto_now_add=True)
+    started = models.DateTimeField(_("Started"), null=True, blank=True)
+    finished = models.DateTimeField(_("Finished"), null=True, blank=True)
+    
+    class Meta:
+        verbose_name = _('Job')
+        verbose_name_plural = _('Jobs')
+        indexes = [
+            models.Index(fields=['status', 'id'], name='jobs_status_id_idx'),
+            models.Index(fields=['key', 'status'], name='jobs_key_status_idx'),
+        ]
+        
+    def __repr__(self):
+        return f'<{self.__class__}: {self.kind} #{self.pk} {self.status}>'
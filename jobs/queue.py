@@ -0,0 +1,174 @@
+import functools
+import logging
+import os
+import socket
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.db import transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import Job
+
+
+logger = logging.getLogger('jobs')
+
+DEFAULTS = {
+    'CHUNK_SIZE': 1000,
+    'LEASE': 60,
+    'MAX_ATTEMPTS': 3,
+    'POLL_INTERVAL': 1.0,
+}
+
+_handlers = {}
+
+
+class LeaseLost(Exception):
+    """
+    Raised by `report_progress` when the job was taken over by another
+    worker after its lease expired.
+    """
+
+
+@functools.lru_cache
+def get_jobs_config():
+    return {**DEFAULTS, **getattr(settings, 'JOBS', {})}
+
+
+@receiver(setting_changed)
+def reset_jobs_config(*, setting, **kwargs):
+    if setting == 'JOBS':
+        get_jobs_config.cache_clear()
+
+
+def register(kind):
+    """
+    Register the decorated function as the handler of `kind` jobs.
+
+    The handler is called with the `Job` and returns a JSON serializable
+    result. It should call `report_progress` regularly, which also keeps
+    the job leased to the worker.
+    """
+    def decorator(func):
+        _handlers[kind] = func
+        return func
+    return decorator
+
+
+def get_worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def enqueue(kind, params=None, key='', owner_id=None):
+    """
+    Queue a `kind` job and return it.
+
+    With a `key`, the queued or running job of the same key is returned
+    instead of queuing the same work twice.
+    """
+    with transaction.atomic():
+        if key:
+            existing = Job.objects.filter(key=key, status__in=Job.ACTIVE_STATUSES).first()
+            if existing is not None:
+                return existing
+
+        return Job.objects.create(kind=kind, params=params or {}, key=key, owner_id=owner_id)
+
+
+def claim(worker):
+    """
+    Lease the oldest runnable job to `worker` and return it, or None.
+
+    Runnable jobs are the queued ones and the running ones whose lease
+    expired. Each is claimed with a conditional UPDATE, so concurrent
+    workers never run the same job, on any database.
+    """
+    config = get_jobs_config()
+    now = timezone.now()
+    candidates = (Job.objects
+                  .filter(Q(status=Job.QUEUED) | Q(status=Job.RUNNING, lease_expires__lt=now))
+                  .order_by('id')
+                  .values_list('pk', 'status', 'lease_expires', 'attempts')[:10])
+
+    for pk, status, lease_expires, attempts in candidates:
+        current = Job.objects.filter(pk=pk, status=status, lease_expires=lease_expires)
+        if attempts >= config['MAX_ATTEMPTS']:
+            current.update(status=Job.FAILED, error='The worker running the job was lost.',
+                           lease_expires=None, finished=now)
+            continue
+
+        claimed = current.update(
+            status=Job.RUNNING,
+            worker=worker,
+            lease_expires=now + timedelta(seconds=config['LEASE']),
+            attempts=F('attempts') + 1,
+            started=Coalesce(F('started'), Value(now)),
+        )
+        if claimed:
+            return Job.objects.get(pk=pk)
+
+    return None
+
+
+def report_progress(job, done, total=None):
+    """
+    Store the progress of `job` and extend its lease.
+
+    Raises `LeaseLost` when the job no longer belongs to its worker.
+    """
+    job.progress_done = done
+    if total is not None:
+        job.progress_total = total
+    job.lease_expires = timezone.now() + timedelta(seconds=get_jobs_config()['LEASE'])
+
+    updated = Job.objects.filter(pk=job.pk, status=Job.RUNNING, worker=job.worker).update(
+        progress_done=job.progress_done, progress_total=job.progress_total,
+        lease_expires=job.lease_expires)
+    if not updated:
+        raise LeaseLost(job.pk)
+
+
+def run(job):
+    """
+    Run a claimed `job` with its handler and record the outcome.
+
+    A failed job is queued again until it used `JOBS['MAX_ATTEMPTS']`.
+    """
+    handler = _handlers.get(job.kind)
+    owned = Job.objects.filter(pk=job.pk, worker=job.worker, status=Job.RUNNING)
+    try:
+        if handler is None:
+            raise LookupError(f'No handler is registered for "{job.kind}" jobs.')
+        result = handler(job)
+    except LeaseLost:
+        logger.warning('Job %s (%s) was taken over by another worker.', job.pk, job.kind)
+        return job
+    except Exception as e:
+        logger.exception('Job %s (%s) failed.', job.pk, job.kind)
+        retry = handler is not None and job.attempts < get_jobs_config()['MAX_ATTEMPTS']
+        owned.update(status=Job.QUEUED if retry else Job.FAILED, error=f'{type(e).__name__}: {e}',
+                     lease_expires=None, finished=None if retry else timezone.now())
+    else:
+        owned.update(status=Job.SUCCEEDED, result=result, error='', lease_expires=None,
+                     finished=timezone.now())
+
+    job.refresh_from_db()
+    return job
+
+
+def run_pending(worker=None, max_jobs=None):
+    """
+    Run runnable jobs until none is left (or `max_jobs` ran); return them.
+    """
+    worker = worker or get_worker_name()
+    done = []
+    while max_jobs is None or len(done) < max_jobs:
+        job = claim(worker)
+        if job is None:
+            break
+        done.append(run(job))
+    return done
@@ -0,0 +1,15 @@
+from rest_framework import serializers
+
+from .models import Job
+
+
+class JobSerializer(serializers.ModelSerializer):
+    """
+    Serializer for the status of a Job.
+    """
+    
+    class Meta:
+        model = Job
+        fields = ('id', 'kind', 'params', 'status', 'progress_done', 'progress_total',
+                  'result', 'error', 'attempts', 'created', 'started', 'finished')
+        read_only_fields = fields
@@ -0,0 +1,159 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.test import APITestCase
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Job
+from .queue import LeaseLost, claim, enqueue, register, report_progress, run, run_pending
+from tasks.models import Task, TaskCounter, TaskTombstone
+from tasks.search import search_tasks
+from users.jobs import DELETE_USER
+
+
+User = get_user_model()
+
+calls = []
+
+
+@register('tests.flaky')
+def flaky(job):
+    calls.append(job.attempts)
+    if job.params.get('fail'):
+        raise ValueError('boom')
+    return {'attempt': job.attempts}
+
+
+@override_settings(PASSWORD_HASHING={'WORKERS': 0}, JOBS={'CHUNK_SIZE': 10, 'MAX_ATTEMPTS': 2})
+class UserDeletionJobTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('F_name', 'L_name', 'user@example.com', 'testpassword')
+        self.admin = User.objects.create_superuser('F_name', 'L_name', 'admin@example.com', 'testpassword')
+        with self.captureOnCommitCallbacks(execute=True):
+            for i in range(25):
+                Task.objects.create(owner=self.user, title=f'searchable task {i}')
+
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+
+    def test_delete_returns_job_and_reports_progress(self):
+        self.authenticate(self.admin)
+        response = self.client.delete(f'/api/users/{self.user.pk}/')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(User.objects.filter(pk=self.user.pk, is_active=False).exists())
+
+        again = self.client.delete(f'/api/users/{self.user.pk}/')
+        self.assertEqual(again.data['id'], response.data['id'])
+
+        url = response['Location']
+        self.assertEqual(self.client.get(url).data['status'], Job.QUEUED)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            job, = run_pending()
+
+        data = self.client.get(url).data
+        self.assertEqual(data['status'], Job.SUCCEEDED)
+        self.assertEqual((data['progress_done'], data['progress_total']), (25, 25))
+        self.assertEqual(data['result'], {'tasks_deleted': 25, 'user_deleted': True})
+
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+        self.assertFalse(Task.objects.exists())
+        self.assertFalse(TaskCounter.objects.filter(owner_id=self.user.pk).exists())
+        self.assertEqual(TaskTombstone.objects.filter(owner_id=self.user.pk).count(), 25)
+        self.assertEqual(len(search_tasks(Task.objects.all(), 'searchable')), 0)
+
+    def test_deleted_user_cannot_authenticate(self):
+        self.authenticate(self.user)
+        response = self.client.delete(f'/api/users/{self.user.pk}/')
+
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(self.client.get(f'/api/users/{self.user.pk}/').status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+
+    def test_job_status_permissions(self):
+        job = enqueue(DELETE_USER, {'user_id': self.user.pk}, owner_id=self.admin.pk)
+        other = User.objects.create_user('F_name', 'L_name', 'other@example.com', 'testpassword')
+
+        self.authenticate(other)
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').status_code, status.HTTP_403_FORBIDDEN)
+
+        self.client.credentials()
+        self.assertEqual(self.client.get(f'/api/jobs/{job.pk}/').status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deletion_resumes_after_lost_worker(self):
+        job = enqueue(DELETE_USER, {'user_id': self.user.pk})
+        job = claim('worker-1')
+        report_progress(job, 0, 25)
+        Task.objects.filter(pk__in=Task.objects.order_by('id').values('pk')[:10]).delete()
+        report_progress(job, 10)
+        Job.objects.filter(pk=job.pk).update(lease_expires=timezone.now() - timedelta(seconds=1))
+
+        job, = run_pending('worker-2')
+
+        self.assertEqual(job.status, Job.SUCCEEDED)
+        self.assertEqual(job.attempts, 2)
+        self.assertEqual((job.progress_done, job.progress_total), (25, 25))
+        self.assertFalse(User.objects.filter(pk=self.user.pk).exists())
+
+
+@override_settings(JOBS={'MAX_ATTEMPTS': 2})
+class JobQueueTests(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    def test_failed_job_is_retried_then_failed(self):
+        job = enqueue('tests.flaky', {'fail': True})
+
+        with self.assertLogs('jobs', 'ERROR'):
+            jobs = run_pending()
+
+        self.assertEqual(calls, [1, 2])
+        self.assertEqual([job.status for job in jobs], [Job.QUEUED, Job.FAILED])
+        job.refresh_from_db()
+        self.assertEqual(job.error, 'ValueError: boom')
+        self.assertIsNotNone(job.finished)
+
+    def test_unknown_kind_fails_at_once(self):
+        enqueue('tests.unknown')
+        with self.assertLogs('jobs', 'ERROR'):
+            job, = run_pending()
+
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('tests.unknown', job.error)
+
+    def test_claim_is_exclusive(self):
+        enqueue('tests.flaky')
+
+        job = claim('worker-1')
+        self.assertIsNone(claim('worker-2'))
+
+        Job.objects.filter(pk=job.pk).update(lease_expires=timezone.now() - timedelta(seconds=1))
+        taken = claim('worker-2')
+
+        self.assertEqual(taken.pk, job.pk)
+        with self.assertRaises(LeaseLost):
+            report_progress(job, 1)
+        self.assertEqual(run(taken).result, {'attempt': 2})
+
+    def test_lost_worker_fails_after_max_attempts(self):
+        job = enqueue('tests.flaky')
+        Job.objects.filter(pk=job.pk).update(status=Job.RUNNING, attempts=2,
+                                             lease_expires=timezone.now() - timedelta(seconds=1))
+
+        self.assertIsNone(claim('worker-1'))
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    def test_run_jobs_command(self):
+        enqueue('tests.flaky')
+        out = StringIO()
+        call_command('run_jobs', '--once', stdout=out)
+
+        self.assertIn(': succeeded', out.getvalue())
+        self.assertIn('1 jobs run', out.getvalue())
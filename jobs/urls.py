@@ -0,0 +1,8 @@
+from django.urls import path
+
+from .views import JobApiView
+
+
+urlpatterns = [
+    path('jobs/<int:pk>/', JobApiView.as_view(), name='job-detail'),
+]
@@ -0,0 +1,23 @@
+from rest_framework import permissions
+from rest_framework.generics import RetrieveAPIView
+
+from .models import Job
+from .serializers import JobSerializer
+from users.permissions import IsOwnerOrAdmin
+from backend_drf.query_budget import query_budget
+
+
+class JobApiView(RetrieveAPIView):
+    """
+    Report the status and progress of a background job.
+
+    Available to the user who requested the job and to admin users.
+    """
+    
+    queryset = Job.objects.all()
+    serializer_class = JobSerializer
+    permission_classes = [permissions.IsAuthenticated, IsOwnerOrAdmin]
+    
+    @query_budget(2)
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
@@ -0,0 +1,249 @@
+import json
+
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.translation import gettext_lazy as _
+from django.views import View
+from rest_framework import exceptions, status
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from . import fast
+from .events import EventStream, get_task_event_broker
+from .models import Task
+from .pagination import TaskPagination
+from .serializers import TaskSerializer
+from .views import filter_task_list
+from backend_drf.replicas import SAFE_METHODS, pin_to_primary
+from backend_drf.throttling import TokenBucketThrottle
+from users.authentication import StatelessJWTAuthentication, StreamTicketAuthentication
+from users.permissions import IsOwner, IsOwnerOrAdmin
+from users.tokens import StreamTicket
+
+
+class AsyncTaskView(View):
+    """
+    Base class of the async task views served under `/api/async/tasks/`.
+
+    DRF views are synchronous, so under ASGI every request to them runs in a
+    thread. These views are plain async Django views: the JWT is checked
+    with `StatelessJWTAuthentication.aauthenticate`, permissions with the
+    async checks of `users.permissions` and the database is accessed through
+    the async ORM. Request and response bodies match `TaskModelViewSet`
+    (JSON only), and so do the rate limits.
+    """
+
+    authentication_class = StatelessJWTAuthentication
+    permission_class = IsOwner
+    throttle_class = TokenBucketThrottle
+
+    @classmethod
+    def as_view(cls, **initkwargs):
+        view = super().as_view(**initkwargs)
+        # Authentication is done with the Authorization header, not cookies.
+        view.csrf_exempt = True
+        return view
+
+    async def dispatch(self, request, *args, **kwargs):
+        try:
+            await self.initial(request)
+            response = await super().dispatch(request, *args, **kwargs)
+        except exceptions.APIException as exc:
+            return self.handle_exception(exc)
+
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            pin_to_primary(request.user.pk)
+        return response
+
+    async def initial(self, request):
+        authenticator = self.authentication_class()
+        result = await authenticator.aauthenticate(request)
+        if result is None:
+            raise exceptions.NotAuthenticated()
+
+        request.user, request.auth = result
+
+        throttle = self.throttle_class()
+        if not throttle.allow_request(request, self):
+            raise exceptions.Throttled(throttle.wait())
+
+    def handle_exception(self, exc):
+        data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+        response = self.json_response(data, status=exc.status_code)
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            response['WWW-Authenticate'] = self.authentication_class().authenticate_header(self.request)
+        elif isinstance(exc, exceptions.Throttled) and exc.wait is not None:
+            response['Retry-After'] = str(exc.wait)
+
+        return response
+
+    async def check_object_permissions(self, request, obj):
+        permission = self.permission_class()
+        if not await permission.ahas_object_permission(request, self, obj):
+            raise exceptions.PermissionDenied(permission.message)
+
+    def parse_body(self, request):
+        if not request.body:
+            return {}
+
+        if request.content_type != 'application/json':
+            raise exceptions.UnsupportedMediaType(request.content_type)
+
+        try:
+            data = json.loads(request.body)
+        except ValueError as exc:
+            raise exceptions.ParseError(_('JSON parse error - %s') % exc)
+
+        if not isinstance(data, dict):
+            raise exceptions.ParseError(_('Expected a JSON object.'))
+
+        return data
+
+    def validate(self, instance=None, data=None, partial=False):
+        serializer = TaskSerializer(instance, data=data, partial=partial)
+        serializer.is_valid(raise_exception=True)
+        return serializer.validated_data
+
+    def json_response(self, data, status=status.HTTP_200_OK):
+        return HttpResponse(fast.dumps(data), status=status, content_type='application/json')
+
+
+class AsyncTaskListView(AsyncTaskView):
+    """
+    `GET` lists tasks with the `done`/`owner` filters and `limit`/`offset`
+    pagination of the task list, `POST` creates a task.
+    """
+
+    permission_class = IsOwnerOrAdmin
+
+    async def get(self, request, *args, **kwargs):
+        queryset = filter_task_list(Task.objects.all(), request.user, request.GET)
+        limit = self.get_int_param('limit', api_settings.PAGE_SIZE, maximum=TaskPagination.max_limit)
+        offset = self.get_int_param('offset', 0)
+
+        count = await queryset.acount()
+        rows = [row async for row in fast.task_rows(queryset)[offset:offset + limit]]
+
+        envelope = {
+            'count': count,
+            'next': self.get_page_link(offset + limit, limit) if offset + limit < count else None,
+            'previous': self.get_page_link(offset - limit, limit) if offset > 0 else None,
+            'results': None,
+        }
+        return HttpResponse(fast.encode_page(envelope, rows), content_type='application/json')
+
+    async def post(self, request, *args, **kwargs):
+        data = self.validate(data=self.parse_body(request))
+        task = await Task.objects.acreate(owner_id=request.user.pk, **data)
+
+        return self.json_response(TaskSerializer(task).data, status=status.HTTP_201_CREATED)
+
+    def get_int_param(self, name, default, maximum=None):
+        try:
+            value = int(self.request.GET[name])
+        except (KeyError, ValueError):
+            return default
+
+        if value < 0 or (value == 0 and name == 'limit'):
+            return default
+        return min(value, maximum) if maximum is not None else value
+
+    def get_page_link(self, offset, limit):
+        url = replace_query_param(self.request.build_absolute_uri(), 'limit', limit)
+        if offset <= 0:
+            return remove_query_param(url, 'offset')
+        return replace_query_param(url, 'offset', offset)
+
+
+class AsyncTaskDetailView(AsyncTaskView):
+    """
+    Retrieve (`GET`), update (`PUT`/`PATCH`) or delete (`DELETE`) a task of
+    the requesting user.
+    """
+
+    async def get_object(self, pk):
+        try:
+            task = await Task.objects.aget(pk=pk)
+        except Task.DoesNotExist:
+            raise exceptions.NotFound()
+
+        await self.check_object_permissions(self.request, task)
+        return task
+
+    async def get(self, request, pk, *args, **kwargs):
+        task = await self.get_object(pk)
+        return self.json_response(TaskSerializer(task).data)
+
+    async def put(self, request, pk, *args, **kwargs):
+        return await self.update(request, pk, partial=False)
+
+    async def patch(self, request, pk, *args, **kwargs):
+        return await self.update(request, pk, partial=True)
+
+    async def update(self, request, pk, partial):
+        task = await self.get_object(pk)
+        data = self.validate(task, data=self.parse_body(request), partial=partial)
+        for attr, value in data.items():
+            setattr(task, attr, value)
+        await task.asave()
+
+        return self.json_response(TaskSerializer(task).data)
+
+    async def delete(self, request, pk, *args, **kwargs):
+        task = await self.get_object(pk)
+        await task.adelete()
+
+        return HttpResponse(status=status.HTTP_204_NO_CONTENT)
+
+
+class TaskEventStreamView(AsyncTaskView):
+    """
+    Push the task changes of the requesting user as server-sent events.
+
+    Every committed create, update and delete of one of the user's tasks is
+    sent as a `created`, `updated` or `deleted` event whose data is the
+    task (only its `id` for deletes). A reconnecting client sends the id
+    of the last event it received in `Last-Event-ID` (or `last_event_id`)
+    and gets the events it missed first, or a `reset` event when they are
+    no longer known. A comment is sent every `TASK_EVENTS['KEEPALIVE']`
+    seconds while idle, and the stream is ended after
+    `TASK_EVENTS['MAX_DURATION']` seconds (see `EventStream`).
+
+    The stream holds one idle connection per client, which only an ASGI
+    server can afford: under WSGI the view answers `501 Not Implemented`.
+
+    Besides the Authorization header, the stream accepts a `ticket` query
+    parameter from `/api/tasks/stream/ticket/`, since the browser
+    `EventSource` cannot send headers. Tickets expire after a minute, so an
+    `EventSource` that fails to reconnect needs a new ticket.
+    """
+
+    authentication_class = StreamTicketAuthentication
+
+    async def get(self, request, *args, **kwargs):
+        if not isinstance(request, ASGIRequest):
+            return self.json_response({'detail': str(_('The task event stream requires an ASGI server.'))},
+                                      status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        last_event_id = request.headers.get('Last-Event-ID') or request.GET.get('last_event_id')
+        subscription = get_task_event_broker().subscribe(request.user.pk, last_event_id)
+        config = getattr(settings, 'TASK_EVENTS', {})
+        stream = EventStream(subscription, config.get('KEEPALIVE', 15), config.get('MAX_DURATION'))
+
+        response = StreamingHttpResponse(stream, content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class TaskEventTicketView(AsyncTaskView):
+    """
+    Issue a `StreamTicket` opening the task event stream of the user.
+    """
+
+    async def post(self, request, *args, **kwargs):
+        return self.json_response({
+            'ticket': str(StreamTicket.for_user(request.user)),
+            'expires_in': int(StreamTicket.lifetime.total_seconds()),
+        })
@@ -0,0 +1,198 @@
+import functools
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+ALL_OWNERS = 'all'
+
+
+class BaseTaskListCache:
+    """
+    Base class for task list response caches.
+
+    Entries are addressed by a key that embeds a version counter. Bumping the
+    counter of an owner (and of the `all` scope used by admin listings) makes
+    every entry built from the previous state unreachable, so no explicit
+    invalidation of individual keys is needed.
+
+    Subclasses implement `_get`, `_set`, `_clear`, `get_version` and
+    `incr_version`.
+    """
+
+    def __init__(self, timeout=60):
+        self.timeout = timeout
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self._get(key)
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    def set(self, key, value):
+        self._set(key, value)
+
+    def clear(self):
+        self.hits = 0
+        self.misses = 0
+        self._clear()
+
+    def bump(self, owner_id):
+        """
+        Invalidate the cached lists of `owner_id` and the admin listings.
+        """
+        self.incr_version(owner_id)
+        self.incr_version(ALL_OWNERS)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses}
+
+    def _get(self, key):
+        raise NotImplementedError
+
+    def _set(self, key, value):
+        raise NotImplementedError
+
+    def _clear(self):
+        raise NotImplementedError
+
+    def get_version(self, scope):
+        raise NotImplementedError
+
+    def incr_version(self, scope):
+        raise NotImplementedError
+
+
+class LRUCacheBackend(BaseTaskListCache):
+    """
+    In-process LRU cache with a per-entry TTL.
+
+    Versions are kept in the process as well, so writes handled by another
+    process are only picked up once the entry expires; use
+    `DjangoCacheBackend` with a shared cache when running several workers.
+    """
+
+    def __init__(self, max_entries=10000, timeout=60):
+        super().__init__(timeout=timeout)
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+
+            expires, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return None
+
+            self._entries.move_to_end(key)
+            return value
+
+    def _set(self, key, value):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.timeout, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+    def get_version(self, scope):
+        return self._versions.get(str(scope), 0)
+
+    def incr_version(self, scope):
+        with self._lock:
+            scope = str(scope)
+            self._versions[scope] = self._versions.get(scope, 0) + 1
+
+    def stats(self):
+        return {**super().stats(), 'size': len(self._entries)}
+
+
+class DjangoCacheBackend(BaseTaskListCache):
+    """
+    Task list cache stored in one of Django's `CACHES`.
+
+    With the default local-memory cache it behaves like an in-process cache;
+    pointing `alias` at a shared cache (Redis, Memcached) shares both the
+    entries and the version counters between workers.
+    """
+
+    def __init__(self, alias='default', timeout=60, key_prefix='tasks'):
+        super().__init__(timeout=timeout)
+        self.alias = alias
+        self.key_prefix = key_prefix
+
+    @property
+    def cache(self):
+        return caches[self.alias]
+
+    def _get(self, key):
+        return self.cache.get(f'{self.key_prefix}:{key}')
+
+    def _set(self, key, value):
+        self.cache.set(f'{self.key_prefix}:{key}', value, self.timeout)
+
+    def _clear(self):
+        self.cache.clear()
+
+    def _version_key(self, scope):
+        return f'{self.key_prefix}:version:{scope}'
+
+    def get_version(self, scope):
+        return self.cache.get(self._version_key(scope), 0)
+
+    def incr_version(self, scope):
+        key = self._version_key(scope)
+        if not self.cache.add(key, 1, timeout=None):
+            try:
+                self.cache.incr(key)
+            except ValueError:
+                self.cache.set(key, 1, timeout=None)
+
+
+@functools.lru_cache
+def get_task_list_cache():
+    """
+    Return the task list cache configured by `settings.TASK_LIST_CACHE`.
+    """
+    config = getattr(settings, 'TASK_LIST_CACHE', {})
+    backend = import_string(config.get('BACKEND', 'tasks.cache.LRUCacheBackend'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reset_task_list_cache(*, setting, **kwargs):
+    if setting == 'TASK_LIST_CACHE':
+        get_task_list_cache.cache_clear()
+
+
+def make_list_cache_key(request, scope, version, variant=''):
+    """
+    Build the cache key of a task list response.
+
+    The full request URL is part of the key because the paginated body
+    contains absolute `next`/`previous` links. `variant` separates entries
+    holding differently shaped content (rendered bytes or response data).
+    """
+    url = hashlib.md5(request.build_absolute_uri().encode()).hexdigest()
+    return f'list:{request.user.pk}:{int(request.user.is_superuser)}:{scope}:{version}:{variant}:{url}'
@@ -0,0 +1,152 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Task, TaskCounter
+
+
+_deferred = ContextVar('task_counter_deltas', default=None)
+
+
+def count_tasks(queryset):
+    """
+    Return `{owner_id: (total, done)}` computed from the tasks of `queryset`.
+    """
+    rows = (queryset.order_by().values('owner_id')
+            .annotate(total=Count('id'), done=Count('id', filter=Q(done=True))))
+    return {row['owner_id']: (row['total'], row['done']) for row in rows}
+
+
+def recount(owner_ids, using=None):
+    """
+    Recompute the counters of `owner_ids` from their tasks.
+    """
+    counts = count_tasks(Task.objects.using(using).filter(owner_id__in=owner_ids))
+    for owner_id in owner_ids:
+        total, done = counts.get(owner_id, (0, 0))
+        TaskCounter.objects.using(using).update_or_create(
+            owner_id=owner_id, defaults={'total': total, 'done': done})
+
+
+def add(owner_id, total, done, using=None):
+    """
+    Add `total`/`done` to the counters of `owner_id` with a single UPDATE.
+
+    Owners without a counter row yet get one computed from their tasks,
+    which already include the current write.
+    """
+    if not total and not done:
+        return
+
+    deltas = _deferred.get()
+    if deltas is not None:
+        deltas[owner_id, using][0] += total
+        deltas[owner_id, using][1] += done
+        return
+
+    updated = TaskCounter.objects.using(using).filter(owner_id=owner_id).update(
+        total=F('total') + total, done=F('done') + done)
+    if not updated:
+        recount([owner_id], using)
+
+
+@contextmanager
+def deferred():
+    """
+    Collect the counter changes of the block and apply them once per owner
+    when it exits, for writes touching many tasks. Nothing is applied if
+    the block raises.
+    """
+    deltas = defaultdict(lambda: [0, 0])
+    token = _deferred.set(deltas)
+    try:
+        yield
+    finally:
+        _deferred.reset(token)
+
+    for (owner_id, using), (total, done) in deltas.items():
+        add(owner_id, total, done, using)
+
+
+def task_saved(task, created, using=None):
+    """
+    Move `task` into the counters of its current owner and state.
+    """
+    if created:
+        add(task.owner_id, 1, int(task.done), using)
+    else:
+        previous = getattr(task, '_counted_state', (None, None))
+        if None in previous:
+            # Unknown previous state (deferred fields or a task built by
+            # hand): recount the owner instead of guessing.
+            recount([task.owner_id], using)
+        elif previous != (task.owner_id, task.done):
+            owner_id, done = previous
+            add(owner_id, -1, -int(done), using)
+            add(task.owner_id, 1, int(task.done), using)
+
+    task.remember_counted_state()
+
+
+def task_deleted(task, using=None):
+    add(task.owner_id, -1, -int(task.done), using)
+
+
+def get_summaries(owner_ids):
+    """
+    Return the counters of `owner_ids`, with zeros for owners without tasks.
+    """
+    counters = TaskCounter.objects.in_bulk(owner_ids)
+    return [counters.get(owner_id) or TaskCounter(owner_id=owner_id) for owner_id in owner_ids]
+
+
+def annotate_users(queryset):
+    """
+    Annotate a user queryset with the `tasks_total` and `tasks_open` counts
+    of each user, read from the counters in the same query.
+    """
+    counter = TaskCounter.objects.filter(owner_id=OuterRef('pk'))
+    return queryset.annotate(
+        tasks_total=Coalesce(Subquery(counter.values('total')), 0),
+        tasks_open=Coalesce(Subquery(counter.values(open_count=F('total') - F('done'))), 0),
+    )
+
+
+def repair(owner_ids=None, dry_run=False):
+    """
+    Recompute the counters (of `owner_ids`, default all) from the tasks and
+    fix the ones that drifted. Return the drifted counters as
+    `(owner_id, stored, actual)` with `(total, done)` pairs.
+
+    The counter rows are locked before the tasks are counted, so a write
+    committed meanwhile waits and then applies its change on top of the
+    repaired value (on databases with row locks).
+    """
+    with transaction.atomic():
+        counters = TaskCounter.objects.select_for_update()
+        tasks = Task.objects.all()
+        if owner_ids is not None:
+            counters = counters.filter(owner_id__in=owner_ids)
+            tasks = tasks.filter(owner_id__in=owner_ids)
+
+        stored = {counter.owner_id: counter for counter in counters}
+        actual = count_tasks(tasks)
+
+        drifted = []
+        for owner_id in sorted(stored.keys() | actual.keys()):
+            counter = stored.get(owner_id)
+            old = (counter.total, counter.done) if counter is not None else (0, 0)
+            new = actual.get(owner_id, (0, 0))
+            if old != new:
+                drifted.append((owner_id, old, new))
+
+        if not dry_run:
+            for owner_id, _, (total, done) in drifted:
+                TaskCounter.objects.update_or_create(
+                    owner_id=owner_id, defaults={'total': total, 'done': done})
+
+    return drifted
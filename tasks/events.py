@@ -0,0 +1,264 @@
+import asyncio
+import functools
+import json
+import threading
+import uuid
+from collections import deque
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+
+CREATED = 'created'
+UPDATED = 'updated'
+DELETED = 'deleted'
+# Sent instead of the missed events when a stream cannot be resumed: the
+# client should reload its tasks (or catch up with `/api/tasks/changes/`).
+RESET = 'reset'
+
+
+class Event:
+    """
+    A task change of one owner, as sent on the event stream.
+    """
+
+    __slots__ = ('id', 'owner_id', 'type', '_data')
+
+    def __init__(self, id, owner_id, type, data):
+        self.id = id
+        self.owner_id = owner_id
+        self.type = type
+        self._data = data
+
+    @property
+    def data(self):
+        """
+        The data of the event; data published as a callable is computed on
+        first access, when the event is sent to a stream.
+        """
+        if callable(self._data):
+            self._data = self._data()
+        return self._data
+
+    def encode(self):
+        """
+        Return the event in the `text/event-stream` format.
+        """
+        lines = [f'event: {self.type}', f'data: {json.dumps(self.data, separators=(",", ":"))}']
+        if self.id is not None:
+            lines.insert(0, f'id: {self.id}')
+        return ('\n'.join(lines) + '\n\n').encode()
+
+
+class Subscription:
+    """
+    The events of one owner delivered to one stream, on the event loop the
+    stream runs on.
+
+    `missed` holds the events published after the `last_event_id` the
+    subscription was made with, or a single `reset` event when they are no
+    longer known. A subscriber falling more than `max_pending` events behind
+    is closed; the client reconnects and resumes from its last event.
+    """
+
+    def __init__(self, broker, owner_id, loop, missed, max_pending):
+        self.broker = broker
+        self.owner_id = owner_id
+        self.loop = loop
+        self.missed = missed
+        self.max_pending = max_pending
+        self.closed = False
+        self._queue = asyncio.Queue()
+
+    def deliver(self, event):
+        """
+        Queue `event` for the subscriber; safe to call from any thread.
+        """
+        try:
+            self.loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            # The event loop of the subscriber is gone.
+            self.close()
+
+    def _put(self, event):
+        if self.closed:
+            return
+        if self._queue.qsize() >= self.max_pending:
+            self.close()
+            self._queue.put_nowait(None)
+            return
+        self._queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """
+        Return the next event, or None when `timeout` expired or the
+        subscription was closed (check `closed`).
+        """
+        if self.closed and self._queue.empty():
+            return None
+        try:
+            return await asyncio.wait_for(self._queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        if not self.closed:
+            self.closed = True
+            self.broker.unsubscribe(self)
+
+
+class EventStream:
+    """
+    Async iterator over the `text/event-stream` body of a subscription:
+    the missed events, then the live ones, with a comment every
+    `keepalive` seconds while idle.
+
+    The stream ends after `max_duration` seconds (the client reconnects and
+    resumes from its last event), bounding how long the streams of clients
+    that went away without the server noticing keep running. Closing the
+    response (`close`) ends the subscription.
+    """
+
+    def __init__(self, subscription, keepalive=15, max_duration=None):
+        self.subscription = subscription
+        self.keepalive = keepalive
+        self.max_duration = max_duration
+
+    def __aiter__(self):
+        return self.events()
+
+    async def events(self):
+        loop = asyncio.get_running_loop()
+        deadline = None if self.max_duration is None else loop.time() + self.max_duration
+        try:
+            yield b': connected\n\n'
+            for event in self.subscription.missed:
+                yield event.encode()
+
+            while deadline is None or loop.time() < deadline:
+                timeout = self.keepalive
+                if deadline is not None:
+                    timeout = min(timeout, max(0, deadline - loop.time()))
+                event = await self.subscription.get(timeout=timeout)
+                if event is not None:
+                    yield event.encode()
+                elif self.subscription.closed:
+                    break
+                elif deadline is None or loop.time() < deadline:
+                    yield b': keepalive\n\n'
+        finally:
+            self.close()
+
+    def close(self):
+        self.subscription.close()
+
+
+class BaseTaskEventBroker:
+    """
+    Base class for the pub/sub of task events.
+
+    `publish` is called from the thread that committed the change and must
+    not block; `data` may be a callable returning the data, called only
+    when the event is sent to a stream (brokers sending events to other
+    processes call it before). `subscribe` is called on the event loop
+    serving a stream.
+    Subclasses fanning out through an external broker (so that every
+    server process sees every change) implement both.
+    """
+
+    def publish(self, owner_id, type, data):
+        raise NotImplementedError
+
+    def subscribe(self, owner_id, last_event_id=None):
+        raise NotImplementedError
+
+    def unsubscribe(self, subscription):
+        pass
+
+
+class InProcessBroker(BaseTaskEventBroker):
+    """
+    Task event broker delivering to the streams of the current process.
+
+    The last `buffer_size` events (of all owners) are kept to resume
+    streams. Event ids are `<broker>-<sequence>`, so the id of an event
+    published by another process or before a restart is recognised as
+    unknown and answered with a `reset` event.
+
+    Lazy `data` is kept as given and computed when the event is first sent,
+    so the events of owners without an open stream cost no serialization
+    unless a stream resumes across them.
+    """
+
+    def __init__(self, buffer_size=10000, max_pending=1000):
+        self.max_pending = max_pending
+        self.prefix = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._sequence = 0
+        self._evicted = 0
+        self._buffer = deque(maxlen=buffer_size)
+        self._subscribers = {}
+
+    def publish(self, owner_id, type, data):
+        with self._lock:
+            self._sequence += 1
+            event = Event(f'{self.prefix}-{self._sequence}', owner_id, type, data)
+            if len(self._buffer) == self._buffer.maxlen:
+                self._evicted = self._sequence - len(self._buffer)
+            self._buffer.append(event)
+            subscribers = list(self._subscribers.get(owner_id, ()))
+
+        for subscription in subscribers:
+            subscription.deliver(event)
+        return event
+
+    def subscribe(self, owner_id, last_event_id=None):
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            missed = [] if last_event_id is None else self.get_missed(owner_id, last_event_id)
+            subscription = Subscription(self, owner_id, loop, missed, self.max_pending)
+            self._subscribers.setdefault(owner_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.owner_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.owner_id]
+
+    def get_missed(self, owner_id, last_event_id):
+        prefix, _, sequence = last_event_id.rpartition('-')
+        try:
+            sequence = int(sequence)
+        except ValueError:
+            sequence = None
+
+        if prefix != self.prefix or sequence is None or sequence > self._sequence or sequence < self._evicted:
+            return [Event(None, owner_id, RESET, {})]
+
+        start = sequence - self._evicted
+        return [event for event in list(self._buffer)[start:] if event.owner_id == owner_id]
+
+    def subscriber_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+
+@functools.lru_cache
+def get_task_event_broker():
+    """
+    Return the task event broker configured by `settings.TASK_EVENTS`.
+    """
+    config = getattr(settings, 'TASK_EVENTS', {})
+    backend = import_string(config.get('BACKEND', 'tasks.events.InProcessBroker'))
+    return backend(**config.get('OPTIONS', {}))
+
+
+@receiver(setting_changed)
+def reset_task_event_broker(*, setting, **kwargs):
+    if setting == 'TASK_EVENTS':
+        get_task_event_broker.cache_clear()
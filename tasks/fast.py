@@ -0,0 +1,129 @@
+import json
+from collections import namedtuple
+
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.settings import ISO_8601, api_settings
+
+from backend_drf.renderers import MessagePackRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# `TaskSerializer` output keys and the columns they are read from.
+TASK_FIELDS = ('id', 'owner', 'title', 'description', 'done', 'created')
+TASK_COLUMNS = ('id', 'owner_id', 'title', 'description', 'done', 'created')
+
+TaskRow = namedtuple('TaskRow', TASK_COLUMNS)
+
+
+def task_rows(queryset):
+    """
+    Return `queryset` as named rows carrying exactly the serialized columns.
+    """
+    return queryset.values_list(*TASK_COLUMNS, named=True)
+
+
+def task_row(task):
+    """
+    Return the serialized columns of the `task` instance as a row like those
+    of `task_rows`.
+    """
+    return TaskRow(*(getattr(task, column) for column in TASK_COLUMNS))
+
+
+def format_datetimes(values):
+    """
+    Format aware datetimes like `serializers.DateTimeField` with the ISO 8601
+    output format, in the current time zone.
+    """
+    tz = timezone.get_current_timezone()
+    formatted = []
+    for value in values:
+        if value is None:
+            formatted.append(None)
+            continue
+
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        formatted.append(value)
+
+    return formatted
+
+
+def dumps(data):
+    """
+    Encode `data` to the same bytes `JSONRenderer` produces by default.
+    """
+    if orjson is not None:
+        encoded = orjson.dumps(data)
+    else:
+        encoded = json.dumps(data, ensure_ascii=False, allow_nan=False,
+                             separators=(',', ':')).encode()
+
+    # JSONRenderer escapes these to keep the output a JavaScript subset.
+    return encoded.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def task_dicts(rows):
+    """
+    Return rows from `task_rows` as the dicts `TaskSerializer` would produce.
+    """
+    created = format_datetimes([row.created for row in rows])
+    return [
+        dict(zip(TASK_FIELDS, (row.id, row.owner_id, row.title, row.description, row.done, when)))
+        for row, when in zip(rows, created)
+    ]
+
+
+def encode_tasks(rows):
+    """
+    Encode rows from `task_rows` to a JSON array of serialized tasks.
+    """
+    return dumps(task_dicts(rows))
+
+
+def encode_page(envelope, rows):
+    """
+    Encode a paginated response body whose `results` are `rows`.
+
+    `envelope` is the paginator's response data; `results` must be its last
+    key, which holds for every paginator used with tasks.
+    """
+    keys = list(envelope)
+    assert keys[-1] == 'results', 'results must be the last key of the envelope'
+
+    head = dumps({key: envelope[key] for key in keys[:-1]})
+    separator = b',' if len(head) > 2 else b''
+
+    return head[:-1] + separator + b'"results":' + encode_tasks(rows) + b'}'
+
+
+def pack_page(envelope, rows):
+    """
+    Encode a paginated response body whose `results` are `rows` to the same
+    MessagePack bytes `MessagePackRenderer` produces.
+    """
+    return MessagePackRenderer().render({**envelope, 'results': task_dicts(rows)})
+
+
+def can_encode(request):
+    """
+    Return True when the negotiated response format is the default compact
+    JSON or MessagePack, which the fast path reproduces.
+    """
+    renderer = getattr(request, 'accepted_renderer', None)
+    media_type = getattr(request, 'accepted_media_type', '') or ''
+    if type(renderer) is MessagePackRenderer:
+        return api_settings.DATETIME_FORMAT == ISO_8601
+    return (
+        type(renderer) is JSONRenderer
+        and 'indent' not in media_type
+        and api_settings.COMPACT_JSON
+        and api_settings.UNICODE_JSON
+        and api_settings.DATETIME_FORMAT == ISO_8601
+    )
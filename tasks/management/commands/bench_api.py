@@ -0,0 +1,341 @@
+import base64
+import json
+import os
+import platform
+import random
+import shlex
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from pathlib import Path
+
+import django
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from backend_drf.loadtest import THROTTLING_DISABLED_ENV, compare, http_call, summarize, throttling
+
+from .seed_bench import DEFAULT_PASSWORD, bench_email
+
+
+DEFAULT_MIX = 'list=40,create=15,patch=15,delete=10,user=10,token=5,password=5'
+
+
+class BenchUser:
+    """
+    A benchmark user with its access token and the ids of some of its tasks.
+    """
+
+    def __init__(self, email, pk, access, task_ids):
+        self.email = email
+        self.pk = pk
+        self.access = access
+        self.task_ids = task_ids
+        self.created_ids = []
+        self.lock = threading.Lock()
+
+
+class Command(BaseCommand):
+    """
+    Drive the REST API over HTTP with a weighted mix of requests and report
+    latency percentiles and throughput per endpoint.
+
+    Unless `--url` points to a running server, `manage.py runserver` (or
+    `--server-command`, e.g. gunicorn) is started on a free local port for
+    the run. The users are those of `seed_bench`; each one logs in once
+    before the measured run. The mix covers `/api/token/`, listing,
+    creating, updating and deleting tasks, `/api/users/<pk>/` and the
+    password change; deletes only remove tasks created during the run.
+
+    The server started for the run has its rate limits turned off, unless
+    `--throttle` is given, so the logins of many users from one address
+    and the request rate measure the server, not the limiter. A server
+    given with `--url` has to be started with `THROTTLING_DISABLED=1`.
+
+    Results are printed and, with `--output`, written as JSON together with
+    the git revision and run parameters. `--baseline` compares the run with
+    an earlier result file and fails when the p95 latency or throughput of
+    an endpoint regressed by more than `--max-regression`.
+    """
+
+    help = 'Benchmark the REST API endpoints against a local server.'
+
+    scenarios = ('list', 'create', 'patch', 'delete', 'user', 'token', 'password')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--url', help='Base URL of a running server (default: start one).')
+        parser.add_argument('--server-command',
+                            help='Command starting the server, with {addr} for host:port '
+                                 '(default: manage.py runserver --noreload {addr}).')
+        parser.add_argument('--requests', type=int, default=5000,
+                            help='Measured requests (default 5000).')
+        parser.add_argument('--warmup', type=int, default=200,
+                            help='Unmeasured requests before the run (default 200).')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Requests in flight (default 16).')
+        parser.add_argument('--users', type=int, default=100,
+                            help='Benchmark users taking part (default 100).')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD,
+                            help='Password of the benchmark users.')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Request weights (default {DEFAULT_MIX}).')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed of the request plan (default 0).')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Keep the THROTTLING rate limits of the started server on (default: off).')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+        parser.add_argument('--baseline', help='Compare with the results in this JSON file.')
+        parser.add_argument('--max-regression', type=float, default=0.1,
+                            help='Tolerated p95/throughput regression against --baseline (default 0.1).')
+
+    def handle(self, *args, **options):
+        mix = self.parse_mix(options['mix'])
+        server = None
+        url = options['url']
+        if url is None:
+            server, url = self.start_server(options['server_command'], options['throttle'])
+
+        try:
+            # Reaches the server when it runs in this process (tests).
+            with override_settings(THROTTLING=throttling(options['throttle'])):
+                self.base_url = url.rstrip('/')
+                users = self.log_in(options['users'], options['password'], options['concurrency'])
+                rng = random.Random(options['seed'])
+                names, weights = zip(*mix.items())
+
+                self.run(users, rng.choices(names, weights, k=options['warmup']), rng,
+                         options['concurrency'], options['password'])
+                plan = rng.choices(names, weights, k=options['requests'])
+                results = self.run(users, plan, rng, options['concurrency'], options['password'])
+        finally:
+            if server is not None:
+                self.stop_server(server)
+
+        document = {'meta': self.get_meta(url, mix, options), **results}
+        self.report(document)
+
+        if options['output']:
+            Path(options['output']).write_text(json.dumps(document, indent=2) + '\n')
+            self.stdout.write(f'Results written to {options["output"]}.')
+
+        if options['baseline']:
+            self.check_baseline(document, options['baseline'], options['max_regression'])
+
+    def parse_mix(self, value):
+        mix = {}
+        for item in value.split(','):
+            name, _, weight = item.partition('=')
+            name = name.strip()
+            if name not in self.scenarios:
+                raise CommandError(f'Unknown request type "{name}", use {", ".join(self.scenarios)}.')
+            try:
+                mix[name] = float(weight)
+            except ValueError:
+                raise CommandError(f'Invalid weight for "{name}".')
+        if not any(mix.values()):
+            raise CommandError('The request mix is empty.')
+        return {name: weight for name, weight in mix.items() if weight > 0}
+
+    def start_server(self, command, throttle):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        addr = f'127.0.0.1:{port}'
+
+        if command:
+            args = [arg.replace('{addr}', addr) for arg in shlex.split(command)]
+        else:
+            args = [sys.executable, str(Path(settings.BASE_DIR) / 'manage.py'), 'runserver',
+                    '--noreload', addr]
+        env = os.environ.copy()
+        if not throttle:
+            env[THROTTLING_DISABLED_ENV] = '1'
+        server = subprocess.Popen(args, cwd=settings.BASE_DIR, env=env, stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError(f'The server exited with status {server.returncode}.')
+            try:
+                socket.create_connection(('127.0.0.1', port), timeout=1).close()
+                return server, f'http://{addr}'
+            except OSError:
+                time.sleep(0.2)
+
+        self.stop_server(server)
+        raise CommandError('The server did not start within 30 seconds.')
+
+    def stop_server(self, server):
+        server.terminate()
+        try:
+            server.wait(10)
+        except subprocess.TimeoutExpired:
+            server.kill()
+
+    def request(self, method, path, user=None, data=None):
+        headers = {}
+        body = None
+        if user is not None:
+            headers['Authorization'] = f'Bearer {user.access}'
+        if data is not None:
+            headers['Content-Type'] = 'application/json'
+            body = json.dumps(data).encode()
+        return http_call(method, self.base_url + path, headers, body)
+
+    def log_in(self, count, password, concurrency):
+        def log_in_user(index):
+            email = bench_email(index)
+            status, _, content = self.request('POST', '/api/token/', data={'email': email, 'password': password})
+            if status == 429:
+                raise CommandError(f'Could not log in {email}: the server rate-limits logins; '
+                                   f'start it with {THROTTLING_DISABLED_ENV}=1.')
+            if status != 200:
+                raise CommandError(f'Could not log in {email} (status {status}); run seed_bench first.')
+            access = json.loads(content)['access']
+            user = BenchUser(email, self.token_user_id(access), access, [])
+
+            status, _, content = self.request('GET', '/api/tasks/?limit=100', user)
+            if status == 200:
+                user.task_ids = [task['id'] for task in json.loads(content)['results']]
+            return user
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            return list(executor.map(log_in_user, range(count)))
+
+    def token_user_id(self, access):
+        payload = access.split('.')[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + '=' * (-len(payload) % 4)))
+        return claims[settings.SIMPLE_JWT.get('USER_ID_CLAIM', 'user_id')]
+
+    def run(self, users, plan, rng, concurrency, password):
+        """
+        Send the requests of `plan` spread over `users`; return the latency
+        summaries per request type and overall.
+        """
+        jobs = [(name, users[i % len(users)], rng.random()) for i, name in enumerate(plan)]
+
+        def send(job):
+            name, user, choice = job
+            return getattr(self, f'send_{name}')(user, choice, password)
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            responses = list(executor.map(send, jobs))
+        elapsed = time.perf_counter() - started
+
+        latencies = defaultdict(list)
+        errors = defaultdict(int)
+        for name, status, latency in responses:
+            if 200 <= status < 400:
+                latencies[name].append(latency)
+            else:
+                errors[name] += 1
+
+        return {
+            'total': summarize([value for values in latencies.values() for value in values],
+                               elapsed, sum(errors.values())),
+            'endpoints': {
+                name: summarize(latencies[name], elapsed, errors[name])
+                for name in sorted(latencies.keys() | errors.keys())
+            },
+        }
+
+    def send_list(self, user, choice, password):
+        offset = int(choice * 5) * 20
+        status, latency, _ = self.request('GET', f'/api/tasks/?limit=20&offset={offset}', user)
+        return 'list', status, latency
+
+    def send_create(self, user, choice, password):
+        status, latency, content = self.request('POST', '/api/tasks/', user,
+                                                {'title': 'bench task', 'description': 'created by bench_api'})
+        if status == 201:
+            with user.lock:
+                user.created_ids.append(json.loads(content)['id'])
+        return 'create', status, latency
+
+    def send_patch(self, user, choice, password):
+        with user.lock:
+            ids = user.task_ids or user.created_ids
+            pk = ids[int(choice * len(ids))] if ids else None
+        if pk is None:
+            return self.send_create(user, choice, password)
+        status, latency, _ = self.request('PATCH', f'/api/tasks/{pk}/', user, {'done': choice < 0.5})
+        return 'patch', status, latency
+
+    def send_delete(self, user, choice, password):
+        with user.lock:
+            pk = user.created_ids.pop() if user.created_ids else None
+        if pk is None:
+            return self.send_create(user, choice, password)
+        status, latency, _ = self.request('DELETE', f'/api/tasks/{pk}/', user)
+        return 'delete', status, latency
+
+    def send_user(self, user, choice, password):
+        status, latency, _ = self.request('GET', f'/api/users/{user.pk}/', user)
+        return 'user', status, latency
+
+    def send_token(self, user, choice, password):
+        status, latency, _ = self.request('POST', '/api/token/', data={'email': user.email, 'password': password})
+        return 'token', status, latency
+
+    def send_password(self, user, choice, password):
+        # The password is "changed" to itself so the users stay usable.
+        status, latency, _ = self.request('PATCH', f'/api/users/{user.pk}/change-password/', user, {
+            'current_password': password, 'new_password': password, 're_new_password': password})
+        return 'password', status, latency
+
+    def get_meta(self, url, mix, options):
+        def git(*args):
+            try:
+                return subprocess.run(['git', *args], cwd=settings.BASE_DIR, capture_output=True,
+                                      text=True, check=True).stdout.strip()
+            except (OSError, subprocess.CalledProcessError):
+                return None
+
+        return {
+            'commit': git('rev-parse', 'HEAD'),
+            'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+            'date': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+            'url': url,
+            'server_command': options['server_command'],
+            'requests': options['requests'],
+            'concurrency': options['concurrency'],
+            'users': options['users'],
+            'throttle': options['throttle'],
+            'mix': mix,
+            'python': platform.python_version(),
+            'django': django.get_version(),
+        }
+
+    def report(self, document):
+        self.stdout.write(f'{"endpoint":<10} {"requests":>9} {"errors":>7} {"req/s":>8} '
+                          f'{"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8}')
+        rows = [*document['endpoints'].items(), ('total', document['total'])]
+        for name, summary in rows:
+            self.stdout.write(
+                f'{name:<10} {summary["requests"]:>9} {summary["errors"]:>7} {summary["rps"]:>8.1f} '
+                f'{summary["p50_ms"] or 0:>8.2f} {summary["p95_ms"] or 0:>8.2f} {summary["p99_ms"] or 0:>8.2f}'
+            )
+
+    def check_baseline(self, document, path, tolerance):
+        try:
+            baseline = json.loads(Path(path).read_text())
+        except (OSError, ValueError) as e:
+            raise CommandError(f'Cannot read the baseline {path}: {e}')
+
+        regressions = compare(baseline, document, tolerance)
+        commit = (baseline.get('meta') or {}).get('commit') or path
+        if not regressions:
+            self.stdout.write(self.style.SUCCESS(f'No regression against {commit}.'))
+            return
+
+        for name, old, new in regressions:
+            self.stdout.write(self.style.ERROR(f'{name}: {old} -> {new}'))
+        raise CommandError(f'{len(regressions)} regressions against {commit}.')
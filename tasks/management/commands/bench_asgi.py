@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.test.utils import override_settings
+
+from backend_drf.loadtest import call_wsgi, summarize, throttling, wsgi_environ
+from tasks.models import Task
+from users.tokens import ClaimsRefreshToken
+
+
+User = get_user_model()
+
+ENDPOINTS = {
+    'sync': '/api/tasks/',
+    'async': '/api/async/tasks/',
+}
+
+
+class Command(BaseCommand):
+    """
+    Compare the throughput of the task list under WSGI and ASGI.
+
+    Requests are fed straight into Django's `WSGIHandler` from a thread pool
+    and into `ASGIHandler` from an event loop, with `--concurrency` requests
+    in flight, so the numbers measure the request handling stack (sync hops,
+    thread switches, the async ORM) without any network or server overhead.
+    The data lives in a throwaway test database and the task list cache is
+    disabled, so every request reaches the database. Rate limits are off
+    unless `--throttle` is given.
+    """
+
+    help = 'Benchmark the sync and async task list views under WSGI and ASGI.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per run (default 2000).')
+        parser.add_argument('--concurrency', type=int, default=64,
+                            help='Requests in flight (default 64).')
+        parser.add_argument('--tasks', type=int, default=100,
+                            help='Tasks of the benchmark user (default 100).')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Keep the THROTTLING rate limits on (default: off).')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            with override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost'],
+                                   TASK_LIST_CACHE={'OPTIONS': {'max_entries': 0}},
+                                   THROTTLING=throttling(options['throttle'])):
+                authorization = self.seed(options['tasks'])
+                results = [
+                    self.run(interface, endpoint, authorization, options)
+                    for interface, endpoint in (('wsgi', 'sync'), ('asgi', 'sync'), ('asgi', 'async'))
+                ]
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f'{"server":<6} {"view":<6} {"req/s":>9} {"p50 ms":>8} {"p99 ms":>8} {"errors":>7}')
+        for result in results:
+            self.stdout.write(
+                f'{result["interface"]:<6} {result["view"]:<6} {result["rps"]:>9.1f} '
+                f'{result["p50_ms"]:>8.2f} {result["p99_ms"]:>8.2f} {result["errors"]:>7}'
+            )
+
+    def seed(self, count):
+        user = User.objects.create_user(email='bench@example.com', first_name='Bench',
+                                        last_name='User', password=None)
+        Task.objects.bulk_create(Task(owner=user, title=f'task {i}') for i in range(count))
+        return f'Bearer {ClaimsRefreshToken.for_user(user).access_token}'
+
+    def run(self, interface, view, authorization, options):
+        path = ENDPOINTS[view]
+        runner = self.run_wsgi if interface == 'wsgi' else self.run_asgi
+
+        # Warm up connections, caches and imports before measuring.
+        runner(path, authorization, options['concurrency'], options['concurrency'])
+        started = time.perf_counter()
+        latencies, errors = runner(path, authorization, options['requests'], options['concurrency'])
+        elapsed = time.perf_counter() - started
+
+        return {
+            'interface': interface,
+            'view': view,
+            'concurrency': options['concurrency'],
+            **summarize(latencies, elapsed, errors),
+        }
+
+    def run_wsgi(self, path, authorization, total, concurrency):
+        handler = WSGIHandler()
+
+        def request(_):
+            environ = wsgi_environ('GET', path, {'Authorization': authorization})
+            return call_wsgi(handler, environ)
+
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(request, range(total)))
+
+        return [elapsed for _, elapsed in results], sum(status != 200 for status, _ in results)
+
+    def run_asgi(self, path, authorization, total, concurrency):
+        handler = ASGIHandler()
+        errors = []
+
+        async def request(semaphore):
+            scope = {
+                'type': 'http',
+                'asgi': {'version': '3.0'},
+                'http_version': '1.1',
+                'method': 'GET',
+                'scheme': 'http',
+                'path': path,
+                'raw_path': path.encode(),
+                'query_string': b'',
+                'headers': [(b'host', b'localhost'), (b'authorization', authorization.encode())],
+                'server': ('localhost', 80),
+                'client': ('127.0.0.1', 0),
+            }
+            messages = []
+
+            async def receive():
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+            async def send(message):
+                messages.append(message)
+
+            async with semaphore:
+                started = time.perf_counter()
+                await handler(scope, receive, send)
+                elapsed = time.perf_counter() - started
+
+            if messages[0]['status'] != 200:
+                errors.append(messages[0]['status'])
+            return elapsed
+
+        async def main():
+            semaphore = asyncio.Semaphore(concurrency)
+            return await asyncio.gather(*(request(semaphore) for _ in range(total)))
+
+        return asyncio.run(main()), len(errors)
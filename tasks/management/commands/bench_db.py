@@ -0,0 +1,145 @@
+import json
+import logging
+import random
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test.utils import override_settings
+
+from backend_drf.loadtest import call_wsgi, summarize, throttling, wsgi_environ
+from tasks.models import Task
+from users.tokens import ClaimsRefreshToken
+
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """
+    Compare the `DATABASE_PROFILES` under a mixed read/write load.
+
+    For every profile a fresh SQLite file is migrated and seeded in a
+    temporary directory. `--concurrency` threads then send `--requests`
+    requests through `WSGIHandler`: a `--write-ratio` share creates a task
+    (`POST /api/tasks/`), the rest list tasks (`GET /api/tasks/`). Requests
+    run in-process like in `bench_asgi`, with the connection handling of a
+    threaded server: `CONN_MAX_AGE` decides whether connections survive
+    between requests. The task list cache is disabled, and so are the rate
+    limits unless `--throttle` is given.
+    """
+
+    help = 'Benchmark the database profiles with concurrent task reads and writes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles',
+                            help='Profile to measure (repeatable, default all).')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per profile (default 2000).')
+        parser.add_argument('--concurrency', type=int, default=16,
+                            help='Requests in flight (default 16).')
+        parser.add_argument('--write-ratio', type=float, default=0.2,
+                            help='Share of requests that create a task (default 0.2).')
+        parser.add_argument('--users', type=int, default=8,
+                            help='Users sending requests (default 8).')
+        parser.add_argument('--tasks', type=int, default=100,
+                            help='Tasks per user before the run (default 100).')
+        parser.add_argument('--throttle', action='store_true',
+                            help='Keep the THROTTLING rate limits on (default: off).')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        profiles = settings.DATABASE_PROFILES
+        names = options['profiles'] or list(profiles)
+        unknown = set(names) - set(profiles)
+        if unknown:
+            raise CommandError(f'Unknown profiles: {", ".join(sorted(unknown))}.')
+
+        original = connections.settings['default']
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        # "database is locked" failures are counted, not logged one by one.
+        request_logger.setLevel(logging.CRITICAL)
+        results = []
+        try:
+            with tempfile.TemporaryDirectory() as directory, \
+                    override_settings(DEBUG=False, ALLOWED_HOSTS=['localhost'],
+                                      TASK_LIST_CACHE={'OPTIONS': {'max_entries': 0}},
+                                      THROTTLING=throttling(options['throttle'])):
+                for name in names:
+                    self.use_database({**profiles[name], 'NAME': Path(directory) / f'{name}.sqlite3'})
+                    call_command('migrate', verbosity=0, interactive=False)
+                    tokens = self.seed(options['users'], options['tasks'])
+                    results.append({'profile': name, **self.run(tokens, options)})
+        finally:
+            request_logger.setLevel(level)
+            self.use_database(original)
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f'{"profile":<12} {"req/s":>8} {"read p50":>9} {"read p99":>9} '
+                          f'{"write p50":>10} {"write p99":>10} {"errors":>7}')
+        for result in results:
+            self.stdout.write(
+                f'{result["profile"]:<12} {result["rps"]:>8.1f} '
+                f'{result["reads"]["p50_ms"] or 0:>9.2f} {result["reads"]["p99_ms"] or 0:>9.2f} '
+                f'{result["writes"]["p50_ms"] or 0:>10.2f} {result["writes"]["p99_ms"] or 0:>10.2f} '
+                f'{result["errors"]:>7}'
+            )
+
+    def use_database(self, settings_dict):
+        connections.close_all()
+        connections.settings['default'] = connections.configure_settings({'default': settings_dict})['default']
+        del connections['default']
+
+    def seed(self, users, tasks):
+        tokens = []
+        for i in range(users):
+            user = User.objects.create_user(email=f'bench-{i}@example.com', first_name='Bench',
+                                            last_name='User', password=None)
+            Task.objects.bulk_create(Task(owner=user, title=f'task {n}') for n in range(tasks))
+            tokens.append(f'Bearer {ClaimsRefreshToken.for_user(user).access_token}')
+        return tokens
+
+    def run(self, tokens, options):
+        handler = WSGIHandler()
+        rng = random.Random(0)
+        plan = [
+            (rng.random() < options['write_ratio'], tokens[i % len(tokens)])
+            for i in range(options['requests'])
+        ]
+
+        def request(item):
+            write, authorization = item
+            headers = {'Authorization': authorization}
+            if write:
+                body = json.dumps({'title': 'bench'}).encode()
+                environ = wsgi_environ('POST', '/api/tasks/', headers, body, 'application/json')
+            else:
+                environ = wsgi_environ('GET', '/api/tasks/', headers)
+            status, elapsed = call_wsgi(handler, environ)
+            return write, status, elapsed
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+            responses = list(executor.map(request, plan))
+        elapsed = time.perf_counter() - started
+
+        errors = sum(status >= 400 for _, status, _ in responses)
+        reads = [latency for write, status, latency in responses if not write and status < 400]
+        writes = [latency for write, status, latency in responses if write and status < 400]
+        return {
+            **summarize(reads + writes, elapsed, errors),
+            'reads': summarize(reads, elapsed),
+            'writes': summarize(writes, elapsed),
+        }
@@ -0,0 +1,120 @@
+import json
+import random
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend_drf import compression
+from backend_drf.renderers import MessagePackRenderer, msgpack
+from tasks import fast
+
+
+Row = namedtuple('Row', fast.TASK_COLUMNS)
+
+WORDS = ('buy', 'call', 'write', 'review', 'plan', 'fix', 'send', 'book', 'clean', 'read',
+         'report', 'groceries', 'meeting', 'invoice', 'garden', 'tickets', 'draft', 'notes')
+
+
+class Command(BaseCommand):
+    """
+    Compare the bytes on the wire and the encode time of task lists in
+    every response format and content coding.
+
+    For each `--sizes` count, synthetic tasks (seeded, with titles and
+    descriptions of realistic lengths) are encoded the way the task list
+    fast path does: JSON, and MessagePack when `msgpack` is installed.
+    Each body is then compressed with gzip at every `--gzip-level` and,
+    when `brotli` is installed, with brotli at every `--brotli-quality`.
+    Times are the best of `--repeat` runs, in milliseconds.
+    """
+
+    help = 'Benchmark task list response sizes and encode times per format and compression.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[100, 10000, 100000],
+                            help='Task counts to encode (default 100 10000 100000).')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Runs per measurement, the fastest is kept (default 5).')
+        parser.add_argument('--gzip-level', type=int, action='append', dest='gzip_levels',
+                            help='gzip level to measure (repeatable, default 1, 6 and 9).')
+        parser.add_argument('--brotli-quality', type=int, action='append', dest='brotli_qualities',
+                            help='brotli quality to measure (repeatable, default 1, 4 and 9).')
+        parser.add_argument('--seed', type=int, default=0, help='Random seed (default 0).')
+        parser.add_argument('--output', help='Write the results to this JSON file.')
+
+    def handle(self, *args, **options):
+        if options['repeat'] < 1:
+            raise CommandError('--repeat must be at least 1.')
+
+        codings = [('identity', None)]
+        codings += [(f'gzip-{level}', ('gzip', {'GZIP_LEVEL': level}))
+                    for level in options['gzip_levels'] or (1, 6, 9)]
+        if compression.brotli is not None:
+            codings += [(f'br-{quality}', ('br', {'BROTLI_QUALITY': quality}))
+                        for quality in options['brotli_qualities'] or (1, 4, 9)]
+
+        formats = {'json': lambda rows: fast.dumps(fast.task_dicts(rows))}
+        if msgpack is not None:
+            renderer = MessagePackRenderer()
+            formats['msgpack'] = lambda rows: renderer.render(fast.task_dicts(rows))
+
+        results = []
+        for size in options['sizes']:
+            rows = self.make_rows(size, random.Random(options['seed']))
+            for name, encode in formats.items():
+                encode_ms, body = self.measure(lambda: encode(rows), options['repeat'])
+                for coding, params in codings:
+                    compress_ms, data = 0.0, body
+                    if params is not None:
+                        encoding, config = params
+                        config = {**compression.get_compression_config(), **config}
+                        compress_ms, data = self.measure(
+                            lambda: compression.compress(body, encoding, config), options['repeat'])
+                    results.append({
+                        'tasks': size,
+                        'format': name,
+                        'coding': coding,
+                        'bytes': len(data),
+                        'bytes_per_task': round(len(data) / size, 1) if size else 0.0,
+                        'encode_ms': round(encode_ms, 3),
+                        'compress_ms': round(compress_ms, 3),
+                        'total_ms': round(encode_ms + compress_ms, 3),
+                    })
+
+        self.report(results)
+        if options['output']:
+            Path(options['output']).write_text(json.dumps({'results': results}, indent=2) + '\n')
+            self.stdout.write(f'Results written to {options["output"]}.')
+
+    def make_rows(self, count, rng):
+        created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+        return [
+            Row(i + 1, rng.randint(1, 1000),
+                ' '.join(rng.choices(WORDS, k=rng.randint(2, 6))).capitalize(),
+                ' '.join(rng.choices(WORDS, k=rng.randint(0, 30))),
+                rng.random() < 0.3,
+                created + timedelta(seconds=rng.randint(0, 10 ** 8), microseconds=rng.randint(0, 999999)))
+            for i in range(count)
+        ]
+
+    def measure(self, func, repeat):
+        best, result = None, None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            result = func()
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1000, result
+
+    def report(self, results):
+        self.stdout.write(f'{"tasks":>7} {"format":<8} {"coding":<9} {"bytes":>11} {"B/task":>7} '
+                          f'{"encode ms":>10} {"compress ms":>12} {"total ms":>9}')
+        for result in results:
+            self.stdout.write(
+                f'{result["tasks"]:>7} {result["format"]:<8} {result["coding"]:<9} {result["bytes"]:>11} '
+                f'{result["bytes_per_task"]:>7.1f} {result["encode_ms"]:>10.3f} '
+                f'{result["compress_ms"]:>12.3f} {result["total_ms"]:>9.3f}'
+            )
@@ -0,0 +1,136 @@
+import re
+import uuid
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from tasks.models import Task
+from tasks.pagination import TaskKeysetPagination
+from tasks.views import TaskModelViewSet
+
+
+User = get_user_model()
+
+FULL_SCAN_PATTERNS = {
+    'sqlite': re.compile(r'\bSCAN (?P<table>\w+)\b(?! USING)'),
+    'postgresql': re.compile(r'\bSeq Scan on (?P<table>\w+)'),
+}
+
+
+class Command(BaseCommand):
+    """
+    Run EXPLAIN on the queries issued by `TaskModelViewSet.list` and fail if
+    any of them scans the whole task table.
+
+    The list view is executed for the usual owner/admin filter combinations,
+    every SELECT it sends to the database is captured and its plan is checked.
+    A throwaway owner, admin and task are created so that every query is
+    actually issued; they live in a transaction that is always rolled back.
+    Only SQLite and PostgreSQL plans are understood.
+    """
+
+    help = 'Check that the task list queries are served by indexes.'
+
+    def handle(self, *args, **options):
+        vendor = connection.vendor
+        if vendor not in FULL_SCAN_PATTERNS:
+            raise CommandError(f'EXPLAIN parsing is not supported for "{vendor}".')
+
+        failures = []
+        with transaction.atomic():
+            for name, user, params in self.get_scenarios():
+                for sql, sql_params in self.capture_queries(user, params):
+                    plan = self.explain(sql, sql_params)
+                    scanned = self.find_full_scans(vendor, plan)
+                    status = 'FULL SCAN' if scanned else 'ok'
+                    self.stdout.write(f'{name}: {status}')
+                    if options['verbosity'] > 1:
+                        self.stdout.write(f'  {sql}\n  ' + '\n  '.join(plan))
+                    if scanned:
+                        failures.append(f'{name}: full scan of {", ".join(scanned)}\n  {sql}')
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError('Queries without a usable index:\n' + '\n'.join(failures))
+
+        self.stdout.write(self.style.SUCCESS('All task list queries use an index.'))
+
+    def get_scenarios(self):
+        marker = uuid.uuid4().hex
+        owner = User.objects.create(email=f'owner-{marker}@explain.invalid',
+                                    first_name='Explain', last_name='Owner')
+        admin = User.objects.create(email=f'admin-{marker}@explain.invalid',
+                                    first_name='Explain', last_name='Admin',
+                                    is_staff=True, is_superuser=True)
+        task = Task.objects.create(owner=owner, title='explain')
+        cursor = TaskKeysetPagination().encode_cursor([task.created, task.id])
+
+        return [
+            ('owner list', owner, {}),
+            ('owner list done', owner, {'done': 'false'}),
+            ('owner list cursor', owner, {'cursor': cursor}),
+            ('owner list done cursor', owner, {'done': 'true', 'cursor': cursor}),
+            ('admin list', admin, {}),
+            ('admin list cursor', admin, {'cursor': cursor}),
+            ('admin list by owner', admin, {'owner': owner.pk}),
+            ('admin list by owner done', admin, {'owner': owner.pk, 'done': 'false'}),
+        ]
+
+    def capture_queries(self, user, params):
+        queries = []
+
+        def wrapper(execute, sql, sql_params, many, context):
+            if sql.lstrip().upper().startswith('SELECT') and Task._meta.db_table in sql:
+                queries.append((sql, sql_params))
+            return execute(sql, sql_params, many, context)
+
+        request = APIRequestFactory().get('/api/tasks/', params, HTTP_HOST=self.get_host())
+        force_authenticate(request, user=user)
+        view = TaskModelViewSet.as_view({'get': 'list'})
+
+        with connection.execute_wrapper(wrapper):
+            response = view(request)
+        if response.status_code != 200:
+            raise CommandError(f'Task list returned {response.status_code} for {params}.')
+
+        return queries
+
+    def get_host(self):
+        for host in settings.ALLOWED_HOSTS:
+            if host != '*':
+                return host.lstrip('.')
+        return 'localhost'
+
+    def explain(self, sql, params):
+        prefix = connection.ops.explain_query_prefix()
+        with self.planner_settings(), connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            rows = cursor.fetchall()
+
+        return [' '.join(str(column) for column in row) for row in rows]
+
+    @contextmanager
+    def planner_settings(self):
+        if connection.vendor != 'postgresql':
+            yield
+            return
+
+        # Small or freshly created tables make the planner prefer sequential
+        # scans even when an index would serve the query, so rule them out.
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                cursor.execute('SET LOCAL enable_seqscan = off')
+            yield
+            transaction.set_rollback(True)
+
+    def find_full_scans(self, vendor, plan):
+        pattern = FULL_SCAN_PATTERNS[vendor]
+        return sorted({
+            match.group('table')
+            for line in plan
+            for match in pattern.finditer(line)
+        })
@@ -0,0 +1,18 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from tasks.models import TaskTombstone
+
+
+class Command(BaseCommand):
+    """
+    Delete task tombstones older than `TASK_TOMBSTONE_RETENTION`.
+    """
+
+    help = 'Delete task tombstones that are past the sync retention window.'
+
+    def handle(self, *args, **options):
+        horizon = timezone.now() - settings.TASK_TOMBSTONE_RETENTION
+        deleted, _ = TaskTombstone.objects.filter(deleted__lt=horizon).delete()
+        self.stdout.write(self.style.SUCCESS(f'Deleted {deleted} tombstones.'))
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from tasks import counters
+
+
+class Command(BaseCommand):
+    """
+    Recompute the `TaskCounter` rows from the tasks and fix the ones that
+    drifted (e.g. after raw SQL writes or restoring a backup).
+    """
+
+    help = 'Recompute the per-owner task counters and fix drifted ones.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--owner', type=int, action='append', dest='owners',
+                            help='Owner to repair (repeatable, default all).')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Report drifted counters without fixing them.')
+
+    def handle(self, *args, **options):
+        drifted = counters.repair(options['owners'], dry_run=options['dry_run'])
+        for owner_id, (total, done), (actual_total, actual_done) in drifted:
+            self.stdout.write(f'Owner {owner_id}: total {total} -> {actual_total}, '
+                              f'done {done} -> {actual_done}')
+
+        verb = 'Found' if options['dry_run'] else 'Repaired'
+        self.stdout.write(self.style.SUCCESS(f'{verb} {len(drifted)} drifted counters.'))
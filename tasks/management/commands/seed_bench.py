@@ -0,0 +1,132 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from tasks import counters
+from tasks.models import Task, TaskCounter
+from users.hashing import make_password
+
+
+User = get_user_model()
+
+EMAIL_TEMPLATE = 'bench-{}@example.com'
+DEFAULT_PASSWORD = 'bench-password-0'
+
+WORDS = ('buy', 'call', 'email', 'fix', 'write', 'read', 'plan', 'review', 'clean', 'book',
+         'milk', 'report', 'meeting', 'invoice', 'garden', 'car', 'doctor', 'tickets', 'slides',
+         'budget', 'draft', 'release', 'backup', 'groceries', 'birthday', 'dentist', 'taxes')
+
+
+def bench_email(index):
+    return EMAIL_TEMPLATE.format(index)
+
+
+class Command(BaseCommand):
+    """
+    Create the data set used by `bench_api`.
+
+    Users are `bench-<n>@example.com` sharing one password (hashed once),
+    tasks are spread evenly over them with random titles, descriptions and
+    states. Both are inserted with `bulk_create` in batches, one transaction
+    per batch, and the task counters are recomputed at the end. Running the
+    command again tops the data set up to the requested sizes.
+    """
+
+    help = 'Seed benchmark users and tasks at a configurable scale.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10000,
+                            help='Benchmark users (default 10000).')
+        parser.add_argument('--tasks', type=int, default=10000000,
+                            help='Tasks over all benchmark users (default 10000000).')
+        parser.add_argument('--password', default=DEFAULT_PASSWORD,
+                            help='Password of the benchmark users.')
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Rows per INSERT transaction (default 5000).')
+        parser.add_argument('--seed', type=int, default=0,
+                            help='Random seed of the generated tasks (default 0).')
+        parser.add_argument('--reset', action='store_true',
+                            help='Delete the benchmark users and their tasks first.')
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users must be at least 1.')
+
+        self.verbosity = options['verbosity']
+        started = time.perf_counter()
+        if options['reset']:
+            self.reset()
+
+        owner_ids = self.seed_users(options['users'], options['password'], options['batch_size'])
+        created = self.seed_tasks(owner_ids, options['tasks'], options['batch_size'],
+                                  random.Random(options['seed']))
+        # `bulk_create` does not send the signals maintaining the counters.
+        counters.repair()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(owner_ids)} benchmark users, {created} tasks created '
+            f'in {time.perf_counter() - started:.1f}s.'
+        ))
+
+    def get_bench_users(self):
+        return User.objects.filter(email__startswith='bench-', email__endswith='@example.com')
+
+    def reset(self):
+        users = self.get_bench_users()
+        # One DELETE instead of loading every task for the per-task signals:
+        # benchmark tasks need no tombstones and the counters go with the users.
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {Task._meta.db_table} WHERE owner_id IN '
+                f'(SELECT id FROM {User._meta.db_table} WHERE email LIKE %s)',
+                [EMAIL_TEMPLATE.format('%')],
+            )
+        TaskCounter.objects.filter(owner_id__in=users.values('pk')).delete()
+        users.delete()
+
+    def seed_users(self, count, password, batch_size):
+        emails = [bench_email(i) for i in range(count)]
+        existing = dict(self.get_bench_users().values_list('email', 'pk'))
+        missing = [email for email in emails if email not in existing]
+
+        encoded = make_password(password)
+        for start in range(0, len(missing), batch_size):
+            with transaction.atomic():
+                User.objects.bulk_create(
+                    User(email=email, first_name='Bench', last_name='User', password=encoded)
+                    for email in missing[start:start + batch_size]
+                )
+            self.progress(f'{min(start + batch_size, len(missing))}/{len(missing)} users')
+
+        users = dict(self.get_bench_users().values_list('email', 'pk'))
+        return [users[email] for email in emails]
+
+    def seed_tasks(self, owner_ids, total, batch_size, rng):
+        existing = Task.objects.filter(owner__in=self.get_bench_users()).count()
+        missing = max(0, total - existing)
+
+        created = 0
+        while created < missing:
+            size = min(batch_size, missing - created)
+            tasks = []
+            for i in range(existing + created, existing + created + size):
+                title = ' '.join(rng.choices(WORDS, k=3))
+                tasks.append(Task(
+                    owner_id=owner_ids[i % len(owner_ids)],
+                    title=f'{title} {i}'[:50],
+                    description=' '.join(rng.choices(WORDS, k=rng.randint(0, 12))) or None,
+                    done=rng.random() < 0.3,
+                ))
+            with transaction.atomic():
+                Task.objects.bulk_create(tasks)
+            created += size
+            self.progress(f'{created}/{missing} tasks')
+
+        return created
+
+    def progress(self, message):
+        if self.verbosity > 1:
+            self.stdout.write(message)
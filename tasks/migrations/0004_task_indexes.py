@@ -0,0 +1,25 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:04
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0003_alter_task_created'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'done', 'created'], name='tasks_owner_done_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['owner', 'created'], name='tasks_owner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='task',
+            index=models.Index(fields=['created', 'id'], name='tasks_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:11
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0005_task_updated'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskTombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('task_id', models.BigIntegerField(verbose_name='Task')),
+                ('owner_id', models.BigIntegerField(verbose_name='Owner')),
+                ('deleted', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Deleted')),
+            ],
+            options={
+                'verbose_name': 'Task tombstone',
+                'verbose_name_plural': 'Task tombstones',
+                'indexes': [models.Index(fields=['owner_id', 'deleted', 'id'], name='tasks_tomb_owner_deleted_idx'), models.Index(fields=['deleted'], name='tasks_tomb_deleted_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+
+def install(apps, schema_editor):
+    from tasks.search import install_search_index
+    install_search_index(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    from tasks.search import uninstall_search_index
+    uninstall_search_index(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0006_task_tombstone'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall, elidable=False),
+    ]
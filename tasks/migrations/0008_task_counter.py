@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:54
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+
+def count_tasks(apps, schema_editor):
+    Task = apps.get_model('tasks', 'Task')
+    TaskCounter = apps.get_model('tasks', 'TaskCounter')
+    db = schema_editor.connection.alias
+    rows = (Task.objects.using(db).order_by().values('owner_id')
+            .annotate(total=Count('id'), done=Count('id', filter=Q(done=True))))
+    TaskCounter.objects.using(db).bulk_create(
+        TaskCounter(owner_id=row['owner_id'], total=row['total'], done=row['done']) for row in rows
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tasks', '0007_task_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaskCounter',
+            fields=[
+                ('owner_id', models.BigIntegerField(primary_key=True, serialize=False, verbose_name='Owner')),
+                ('total', models.IntegerField(default=0, verbose_name='Total')),
+                ('done', models.IntegerField(default=0, verbose_name='Done')),
+            ],
+            options={
+                'verbose_name': 'Task counter',
+                'verbose_name_plural': 'Task counters',
+            },
+        ),
+        migrations.RunPython(count_tasks, migrations.RunPython.noop),
+    ]
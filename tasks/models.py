@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, router, transaction
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth import get_user_model
 
@@ -17,13 +18,90 @@ class Task(models.Model):
     description = models.TextField(_("Description"), blank=True, null=True)
     done = models.BooleanField(_("Done"), default=False)
     created = models.DateTimeField(_("Created"), auto_now_add=True)
+    updated = models.DateTimeField(_("Updated"), auto_now=True)
     
     class Meta:
         verbose_name = _('Task')
         verbose_name_plural = _('Tasks')
+        indexes = [
+            models.Index(fields=['owner', 'done', 'created'], name='tasks_owner_done_created_idx'),
+            models.Index(fields=['owner', 'created'], name='tasks_owner_created_idx'),
+            models.Index(fields=['created', 'id'], name='tasks_created_id_idx'),
+            models.Index(fields=['owner', 'updated'], name='tasks_owner_updated_idx'),
+        ]
         
     def __str__(self):
         return self.title
         
     def __repr__(self):
         return f'<{self.__class__}: {self.title}>'
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.remember_counted_state()
+        return instance
+    
+    def remember_counted_state(self):
+        """
+        Remember the `owner_id`/`done` values the task counters include, so
+        an update can move the task between counters without a query.
+        """
+        self._counted_state = (self.__dict__.get('owner_id'), self.__dict__.get('done'))
+    
+    def save(self, *args, **kwargs):
+        # The `post_save` receivers update `TaskCounter`; keep both writes
+        # in one transaction.
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using, savepoint=False):
+            super().save(*args, **kwargs)
+
+
+class TaskTombstone(models.Model):
+    """
+    Record of a deleted Task, used by the delta sync endpoint.
+
+    The owner is stored as a plain id so that tombstones written while the
+    owner itself is being deleted (CASCADE) do not reference a missing row.
+    """
+    
+    task_id = models.BigIntegerField(_("Task"))
+    owner_id = models.BigIntegerField(_("Owner"))
+    deleted = models.DateTimeField(_("Deleted"), default=timezone.now)
+    
+    class Meta:
+        verbose_name = _('Task tombstone')
+        verbose_name_plural = _('Task tombstones')
+        indexes = [
+            models.Index(fields=['owner_id', 'deleted', 'id'], name='tasks_tomb_owner_deleted_idx'),
+            models.Index(fields=['deleted'], name='tasks_tomb_deleted_idx'),
+        ]
+        
+    def __repr__(self):
+        return f'<{self.__class__}: {self.task_id}>'
+
+
+class TaskCounter(models.Model):
+    """
+    Materialized task counts of an owner, kept up to date by the `Task`
+    signal receivers so summaries are read without scanning tasks.
+
+    Like `TaskTombstone`, the owner is a plain id: the counters are updated
+    while the owner's tasks are deleted by CASCADE. `repair_task_counters`
+    recomputes them from the tasks.
+    """
+    
+    owner_id = models.BigIntegerField(_("Owner"), primary_key=True)
+    total = models.IntegerField(_("Total"), default=0)
+    done = models.IntegerField(_("Done"), default=0)
+    
+    class Meta:
+        verbose_name = _('Task counter')
+        verbose_name_plural = _('Task counters')
+        
+    @property
+    def open(self):
+        return self.total - self.done
+        
+    def __repr__(self):
+        return f'<{self.__class__}: {self.owner_id}>'
@@ -0,0 +1,38 @@
+from rest_framework.pagination import LimitOffsetPagination
+
+from backend_drf.pagination import KeysetPagination
+
+
+class TaskKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination for tasks on `(created, id)`.
+    """
+
+    ordering = ('created', 'id')
+
+
+class TaskPagination(LimitOffsetPagination):
+    """
+    Pagination for the task list.
+
+    Uses limit/offset by default. Passing the `cursor` query parameter (empty
+    for the first page) switches to keyset pagination on `(created, id)`, whose
+    cost does not grow with the page depth.
+    """
+
+    max_limit = 1000
+    keyset_class = TaskKeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.keyset_class.cursor_query_param in request.query_params:
+            self.keyset = self.keyset_class()
+            return self.keyset.paginate_queryset(queryset, request, view)
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+
+        return super().get_paginated_response(data)
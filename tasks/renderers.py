@@ -0,0 +1,75 @@
+import csv
+import io
+from itertools import islice
+
+from rest_framework.renderers import BaseRenderer
+
+from . import fast
+
+
+class TaskExportRenderer(BaseRenderer):
+    """
+    Base class for the formats of the streamed task export.
+
+    `stream` encodes rows from `fast.task_rows` in chunks as they are read
+    from the database; `render` is only used for regular response data
+    such as errors.
+    """
+
+    charset = 'utf-8'
+
+    def stream(self, rows, chunk_size):
+        rows = iter(rows)
+        while chunk := list(islice(rows, chunk_size)):
+            yield self.encode_rows(chunk)
+
+    def encode_rows(self, rows):
+        raise NotImplementedError
+
+
+class NDJSONRenderer(TaskExportRenderer):
+    """
+    Newline delimited JSON, one serialized task per line.
+    """
+
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return fast.dumps(data) + b'\n'
+
+    def encode_rows(self, rows):
+        return b''.join(fast.dumps(task) + b'\n' for task in fast.task_dicts(rows))
+
+
+class CSVRenderer(TaskExportRenderer):
+    """
+    CSV with a header row of the serialized task fields.
+    """
+
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        if isinstance(data, dict):
+            data = [data]
+
+        header = list(data[0]) if data else []
+        return self.write([header] + [[item.get(key) for key in header] for item in data])
+
+    def stream(self, rows, chunk_size):
+        # The header goes out before the query runs.
+        yield self.write([fast.TASK_FIELDS])
+        yield from super().stream(rows, chunk_size)
+
+    def encode_rows(self, rows):
+        return self.write([task.values() for task in fast.task_dicts(rows)])
+
+    def write(self, rows):
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(rows)
+        return buffer.getvalue().encode(self.charset)
@@ -0,0 +1,239 @@
+import re
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Task
+
+
+FTS_TABLE = 'tasks_task_fts'
+POSTGRES_INDEX = 'tasks_task_search_idx'
+
+# Title matches weigh ten times as much as description matches.
+TITLE_WEIGHT = 10.0
+DESCRIPTION_WEIGHT = 1.0
+
+# The expression of the Postgres GIN index; queries must repeat it verbatim
+# for the planner to use the index.
+POSTGRES_DOCUMENT = (
+    "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('simple', coalesce(description, '')), 'D')"
+)
+
+# Text indexed in the `scope` column: `o<owner>`, `o<owner>d<done>` and
+# `d<done>` tokens, so the list filters are one lookup in the full-text index
+# (a `done` token alone would match half of all tasks).
+SQLITE_SCOPE = "'o' || {row}.owner_id || ' o' || {row}.owner_id || 'd' || {row}.done || ' d' || {row}.done"
+
+SQLITE_INSTALL = [
+    # Contentless table: the text lives in `tasks_task` only, the index keeps
+    # the tokens. Rows are removed with the `delete` command, which needs the
+    # values that were indexed, so the triggers pass the old row.
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        title, description, scope,
+        content='', tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, description, scope)
+        VALUES (new.id, new.title, new.description, {SQLITE_SCOPE.format(row='new')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, scope)
+        VALUES ('delete', old.id, old.title, old.description, {SQLITE_SCOPE.format(row='old')});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au
+    AFTER UPDATE OF title, description, owner_id, done ON tasks_task BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, description, scope)
+        VALUES ('delete', old.id, old.title, old.description, {SQLITE_SCOPE.format(row='old')});
+        INSERT INTO {FTS_TABLE}(rowid, title, description, scope)
+        VALUES (new.id, new.title, new.description, {SQLITE_SCOPE.format(row='new')});
+    END
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE}({FTS_TABLE}, rank)
+    VALUES ('rank', 'bm25({TITLE_WEIGHT}, {DESCRIPTION_WEIGHT}, 0.0)')
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')",
+    f"""
+    INSERT INTO {FTS_TABLE}(rowid, title, description, scope)
+    SELECT id, title, description, {SQLITE_SCOPE.format(row='tasks_task')} FROM tasks_task
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+]
+
+POSTGRES_INSTALL = [
+    f'CREATE INDEX IF NOT EXISTS {POSTGRES_INDEX} ON tasks_task USING GIN (({POSTGRES_DOCUMENT}))',
+]
+
+POSTGRES_UNINSTALL = [
+    f'DROP INDEX IF EXISTS {POSTGRES_INDEX}',
+]
+
+
+def install_search_index(connection):
+    """
+    Create the full-text index of tasks on `connection` and fill it.
+
+    Idempotent. Other databases than SQLite and PostgreSQL have no index and
+    fall back to an unranked `icontains` search.
+    """
+    statements = {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRES_INSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def uninstall_search_index(connection):
+    statements = {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRES_UNINSTALL}.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def search_index_is_installed(connection):
+    """
+    Return whether the SQLite index and all its triggers exist.
+
+    Django rebuilds SQLite tables on most schema changes, which drops their
+    triggers; see the `post_migrate` receiver in `tasks.signals`.
+    """
+    if connection.vendor != 'sqlite':
+        return True
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE name IN (%s, %s, %s, %s)",
+            [FTS_TABLE, f'{FTS_TABLE}_ai', f'{FTS_TABLE}_ad', f'{FTS_TABLE}_au'],
+        )
+        return cursor.fetchone()[0] == 4
+
+
+def search_terms(query):
+    """
+    Split a user query into words. Operators and quotes are not supported,
+    so any input is a valid search.
+    """
+    return re.findall(r'\w+', query)
+
+
+def fts_match_expression(terms, owner_id=None, done=None):
+    """
+    Build an FTS5 MATCH expression requiring every term in the title or
+    description.
+
+    Terms are matched as whole words: prefix queries expand to every indexed
+    word sharing the prefix, which is far too slow for short prefixes on
+    large tables.
+    """
+    expression = '{title description} : (%s)' % ' '.join(
+        '"%s"' % term.replace('"', '""') for term in terms
+    )
+
+    scope = ''
+    if owner_id is not None:
+        scope = f'o{int(owner_id)}'
+    if done is not None:
+        scope += f'd{int(done)}'
+    if scope:
+        expression = f'scope : {scope} AND {expression}'
+
+    return expression
+
+
+class SQLiteSearchResults:
+    """
+    Ranked FTS5 matches, sliceable and countable like a queryset so the
+    list pagination can page through them.
+
+    The page of ids is read from the index ordered by `bm25`; the tasks are
+    then loaded from `queryset` (model instances or `tasks.fast` rows) and
+    returned in rank order.
+    """
+
+    def __init__(self, queryset, expression):
+        self.queryset = queryset
+        self.expression = expression
+
+    @property
+    def connection(self):
+        return connections[self.queryset.db]
+
+    def count(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'SELECT count(*) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+                           [self.expression])
+            return cursor.fetchone()[0]
+
+    def __len__(self):
+        return self.count()
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice) or index.step is not None:
+            raise TypeError('Search results only support slicing without a step.')
+
+        offset = index.start or 0
+        limit = -1 if index.stop is None else max(0, index.stop - offset)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+                f'ORDER BY rank LIMIT %s OFFSET %s',
+                [self.expression, limit, offset],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+
+        if not ids:
+            return []
+
+        tasks = {task.id: task for task in self.queryset.filter(id__in=ids)}
+        return [tasks[pk] for pk in ids if pk in tasks]
+
+
+def search_tasks(queryset, query, owner_id=None, done=None):
+    """
+    Return the tasks of `queryset` matching `query`, best matches first.
+
+    `owner_id` and `done` restrict the results like the list filters. The
+    result supports `count()` and slicing, which is all the pagination
+    needs.
+    """
+    terms = search_terms(query)
+    if done is not None:
+        done = Task._meta.get_field('done').to_python(done)
+
+    vendor = connections[queryset.db].vendor
+    if vendor == 'sqlite':
+        if not terms:
+            return queryset.none()
+        return SQLiteSearchResults(queryset, fts_match_expression(terms, owner_id, done))
+
+    filters = {key: value for key, value in (('owner_id', owner_id), ('done', done)) if value is not None}
+    queryset = queryset.filter(**filters)
+    if not terms:
+        return queryset.none()
+
+    if vendor == 'postgresql':
+        params = [' '.join(terms)]
+        match = RawSQL(f"({POSTGRES_DOCUMENT}) @@ plainto_tsquery('simple', %s)", params,
+                       output_field=BooleanField())
+        rank = RawSQL(f"ts_rank({POSTGRES_DOCUMENT}, plainto_tsquery('simple', %s))", params,
+                      output_field=FloatField())
+        return queryset.filter(match).order_by(rank.desc(), '-id')
+
+    condition = Q()
+    for term in terms:
+        condition &= Q(title__icontains=term) | Q(description__icontains=term)
+    return queryset.filter(condition).order_by('-id')
@@ -1,9 +1,83 @@
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
-from .models import Task
+from .models import Task, TaskCounter
+from backend_drf.metrics import MeasuredSerializerMixin
+from .signals import send_bulk_post_save
 
 
-class TaskSerializer(serializers.ModelSerializer):
+class TaskListSerializer(serializers.ListSerializer):
+    """
+    List serializer writing tasks with a single bulk query.
+
+    For updates, `instance` is a dict of the tasks to change keyed by id (as
+    returned by `QuerySet.in_bulk`) and every item of the data must carry the
+    `id` of its task.
+    """
+    
+    default_error_messages = {
+        'missing_id': _('This field is required.'),
+        'not_found': _('Not found.'),
+        'not_owner': _('You do not have permission to perform this action.'),
+    }
+    
+    @staticmethod
+    def get_item_pk(item):
+        try:
+            return int(item['id'])
+        except (TypeError, KeyError, ValueError):
+            return None
+    
+    
+    def run_child_validation(self, data):
+        if self.instance is None:
+            return super().run_child_validation(data)
+        
+        task = self.instance.get(self.get_item_pk(data))
+        if task is None:
+            code = 'not_found' if isinstance(data, dict) and data.get('id') is not None else 'missing_id'
+            raise serializers.ValidationError({'id': [self.error_messages[code]]}, code=code)
+        
+        if task.owner_id != self.context['request'].user.pk:
+            raise serializers.ValidationError({'id': [self.error_messages['not_owner']]},
+                                              code='not_owner')
+        
+        self.child.instance = task
+        self.child.initial_data = data
+        return super().run_child_validation(data)
+    
+    
+    def create(self, validated_data):
+        request = self.context.get('request')
+        tasks = Task.objects.bulk_create(
+            Task(owner_id=request.user.pk, **attrs) for attrs in validated_data
+        )
+        send_bulk_post_save(tasks, created=True)
+        
+        return tasks
+    
+    
+    def update(self, instance, validated_data):
+        now = timezone.now()
+        fields = {'updated'}
+        tasks = []
+        
+        for item, attrs in zip(self.initial_data, validated_data):
+            task = instance[self.get_item_pk(item)]
+            for field, value in attrs.items():
+                setattr(task, field, value)
+            task.updated = now
+            fields.update(attrs)
+            tasks.append(task)
+        
+        Task.objects.bulk_update(tasks, sorted(fields))
+        send_bulk_post_save(tasks, created=False, update_fields=fields)
+        
+        return tasks
+
+
+class TaskSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for the Task model.
     """
@@ -12,11 +86,25 @@ class TaskSerializer(serializers.ModelSerializer):
         model = Task
         fields = ('id', 'owner', 'title', 'description', 'done', 'created')
         read_only_fields = ['owner', 'created']
+        list_serializer_class = TaskListSerializer
     
     
     def create(self, validated_data):
         request = self.context.get('request')
-        validated_data['owner'] = request.user
+        validated_data['owner_id'] = request.user.pk
         task = Task.objects.create(**validated_data)
         
         return task
+
+
+class TaskCounterSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
+    """
+    Serializer for the per-owner task counts of the summary endpoint.
+    """
+    
+    owner = serializers.IntegerField(source='owner_id')
+    open = serializers.IntegerField()
+    
+    class Meta:
+        model = TaskCounter
+        fields = ('owner', 'total', 'done', 'open')
@@ -0,0 +1,119 @@
+from django.contrib.auth import get_user_model
+from django.db import connections, transaction
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from .cache import get_task_list_cache
+from . import counters, events, fast
+from .models import Task, TaskCounter, TaskTombstone
+from .search import install_search_index, search_index_is_installed
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Task)
+@receiver(post_delete, sender=Task)
+def invalidate_task_list_cache(sender, instance, **kwargs):
+    """
+    Bump the owner's task list cache version once the write is committed.
+    """
+    owner_id = instance.owner_id
+    transaction.on_commit(lambda: get_task_list_cache().bump(owner_id))
+
+
+@receiver(post_save, sender=Task)
+def publish_saved_task(sender, instance, created, **kwargs):
+    """
+    Push the saved task to the owner's event streams once committed.
+    
+    The event carries a snapshot of the task's columns, encoded like
+    `TaskSerializer` only when the event is sent to a stream, so that saves
+    nobody listens to (bulk writes, seeding, ...) do not pay for it.
+    """
+    owner_id = instance.owner_id
+    event_type = events.CREATED if created else events.UPDATED
+    
+    def publish():
+        # Deleted later in the same transaction: the delete event follows.
+        if instance.pk is not None:
+            row = fast.task_row(instance)
+            events.get_task_event_broker().publish(owner_id, event_type, lambda: fast.task_dicts([row])[0])
+    
+    transaction.on_commit(publish)
+
+
+@receiver(post_delete, sender=Task)
+def publish_deleted_task(sender, instance, **kwargs):
+    owner_id, data = instance.owner_id, {'id': instance.pk}
+    transaction.on_commit(lambda: events.get_task_event_broker().publish(owner_id, events.DELETED, data))
+
+
+@receiver(post_save, sender=Task)
+def count_saved_task(sender, instance, created, using, **kwargs):
+    """
+    Keep the owner's `TaskCounter` in step, in the transaction of the write.
+    """
+    counters.task_saved(instance, created, using)
+
+
+@receiver(post_delete, sender=Task)
+def count_deleted_task(sender, instance, using, **kwargs):
+    counters.task_deleted(instance, using)
+
+
+@receiver(post_delete, sender=User)
+def delete_task_counter(sender, instance, using, **kwargs):
+    """
+    Drop the counters of a deleted owner, after its tasks were deleted.
+    """
+    TaskCounter.objects.using(using).filter(owner_id=instance.pk).delete()
+
+
+@receiver(post_delete, sender=Task)
+def create_task_tombstone(sender, instance, **kwargs):
+    """
+    Remember deleted tasks, including owner CASCADE deletes, for delta sync.
+    """
+    TaskTombstone.objects.create(task_id=instance.pk, owner_id=instance.owner_id)
+
+
+def send_bulk_post_save(tasks, created, update_fields=None):
+    """
+    Send `post_save` for tasks written with `bulk_create`/`bulk_update`.
+
+    Bulk queries bypass `Model.save`, so the receivers keeping derived state
+    in sync are notified explicitly, once per task.
+    """
+    if update_fields is not None:
+        update_fields = frozenset(update_fields)
+    
+    with counters.deferred():
+        for task in tasks:
+            post_save.send(sender=Task, instance=task, created=created,
+                           update_fields=update_fields, raw=False, using=task._state.db)
+
+
+SEARCH_INDEX_MIGRATION = ('tasks', '0007_task_search_index')
+
+
+@receiver(post_migrate)
+def ensure_search_index(sender, app_config, using, **kwargs):
+    """
+    Reinstall the SQLite full-text index when a migration dropped it.
+
+    Django applies most SQLite schema changes by rebuilding the table, which
+    silently drops the triggers keeping the index in sync. Nothing is done
+    while `SEARCH_INDEX_MIGRATION` is not applied, so migrating back before
+    it keeps the index removed.
+    """
+    if app_config.label != 'tasks':
+        return
+    
+    connection = connections[using]
+    recorder = MigrationRecorder(connection)
+    if (recorder.has_table()
+            and SEARCH_INDEX_MIGRATION in recorder.applied_migrations()
+            and not search_index_is_installed(connection)):
+        install_search_index(connection)
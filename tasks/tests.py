@@ -1,9 +1,51 @@
+import csv
+import gzip
+import json
+import sqlite3
+import tempfile
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest import skipUnless
+from unittest.mock import patch
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import OperationalError, connection, connections
+from django.db.migrations.recorder import MigrationRecorder
+from django.db.utils import load_backend
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import LiveServerTestCase, RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from django.utils.http import http_date
 from rest_framework.test import APITestCase
 from rest_framework import status
 from rest_framework_simplejwt.tokens import RefreshToken
 
-from .models import Task
+from .models import Task, TaskCounter, TaskTombstone
+from backend_drf.compression import CompressionMiddleware, choose_encoding
+from backend_drf.loadtest import compare
+from backend_drf.metrics import Histogram, RequestMetricsMiddleware, registry
+from backend_drf.query_budget import QueryBudgetTestMixin
+from backend_drf.throttling import BucketState, LocalBucketStore, get_bucket_store
+from backend_drf.renderers import msgpack
+from backend_drf.replicas import (
+    ReplicaRouter, current_read_alias, read_from, replica_is_healthy, reset_replica_health,
+)
+from . import fast
+from .serializers import TaskSerializer
+from .signals import ensure_search_index
+from .views import TaskModelViewSet
+from .cache import get_task_list_cache
+from .events import EventStream, get_task_event_broker
+from .sync import Watermark
+from users.tokens import StreamTicket
+from .management.commands.check_task_queries import Command as CheckTaskQueriesCommand
 
 
 User = get_user_model()
@@ -11,6 +53,7 @@ User = get_user_model()
 
 class TaskApiTests(APITestCase):
     def setUp(self):
+        get_task_list_cache().clear()
         self.user_1 = User.objects.create_user(
             email='user_1@example.com',
             first_name='F_name',
@@ -73,8 +116,9 @@ class TaskApiTests(APITestCase):
         response = self.client.get('/api/tasks/')
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data[0]['title'], task_1.title)
-        self.assertEqual(response.data[1]['title'], task_2.title)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(response.json()['results'][0]['title'], task_1.title)
+        self.assertEqual(response.json()['results'][1]['title'], task_2.title)
     
     def test_user_task_list_false(self):
         self.create_tasks(self.task_data_1_user_1, self.task_data_2_user_1)
@@ -82,7 +126,96 @@ class TaskApiTests(APITestCase):
         response = self.client.get('/api/tasks/')
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
-        self.assertEqual(response.data, [])
+        self.assertEqual(response.json()['count'], 0)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_user_task_list_limit_offset(self):
+        _, task_2 = self.create_tasks(self.task_data_1_user_1, self.task_data_2_user_1)
+        self.api_authentication(self.user_1)
+        response = self.client.get('/api/tasks/', {'limit': 1, 'offset': 1})
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(len(response.json()['results']), 1)
+        self.assertEqual(response.json()['results'][0]['title'], task_2.title)
+        self.assertIsNone(response.json()['next'])
+
+    def test_user_task_list_cursor(self):
+        tasks = [
+            Task.objects.create(owner=self.user_1, title=f'task {i}')
+            for i in range(5)
+        ]
+        self.api_authentication(self.user_1)
+        response = self.client.get('/api/tasks/', {'cursor': '', 'limit': 2})
+        titles = [task['title'] for task in response.json()['results']]
+        
+        while response.json()['next']:
+            response = self.client.get(response.json()['next'])
+            titles += [task['title'] for task in response.json()['results']]
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn('count', response.json())
+        self.assertEqual(titles, [task.title for task in tasks])
+    
+    def test_user_task_list_invalid_cursor(self):
+        self.api_authentication(self.user_1)
+        response = self.client.get('/api/tasks/', {'cursor': 'not-a-cursor'})
+        
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_conditional_get(self):
+        task = self.create_tasks(self.task_data_1_user_1)
+        self.api_authentication(self.user_1)
+        response = self.client.get('/api/tasks/')
+        etag = response['ETag']
+        
+        self.assertNotIn('Last-Modified', response)
+        
+        cached = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        get_task_list_cache().clear()
+        uncached = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        
+        for response in (cached, uncached):
+            self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+            self.assertEqual(response['ETag'], etag)
+            self.assertEqual(response.content, b'')
+        
+        Task.objects.filter(pk=task.pk).update(title='changed', updated=timezone.now())
+        get_task_list_cache().clear()
+        response = self.client.get('/api/tasks/', HTTP_IF_NONE_MATCH=etag)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+    
+    def test_list_ignores_if_modified_since_after_delete(self):
+        kept = self.create_tasks(self.task_data_1_user_1)
+        removed = self.create_tasks({**self.task_data_1_user_1, 'title': 'removed'})
+        self.api_authentication(self.user_1)
+        since = http_date(timezone.now().timestamp() + 60)
+        self.client.delete(f'/api/tasks/{removed.id}/')
+        
+        response = self.client.get('/api/tasks/', HTTP_IF_MODIFIED_SINCE=since)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([task['id'] for task in response.json()['results']], [kept.id])
+    
+    def test_retrieve_conditional_get(self):
+        task = self.create_tasks(self.task_data_1_user_1)
+        self.api_authentication(self.user_1)
+        response = self.client.get(f'/api/tasks/{task.id}/')
+        
+        not_modified = self.client.get(f'/api/tasks/{task.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        since = self.client.get(f'/api/tasks/{task.id}/',
+                                HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(since.status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.client.patch(f'/api/tasks/{task.id}/', {'done': True})
+        response = self.client.get(f'/api/tasks/{task.id}/', HTTP_IF_NONE_MATCH=response['ETag'])
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['done'], True)
 
     def test_create_task(self):
         data = self.task_data_1_user_1
@@ -166,3 +299,1413 @@ class TaskApiTests(APITestCase):
         response = self.client.get(f'/api/tasks/')
         
         self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class TaskBulkApiTests(APITestCase):
+    def setUp(self):
+        get_task_list_cache().clear()
+        self.user_1 = User.objects.create_user(
+            email='user_1@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.user_2 = User.objects.create_user(
+            email='user_2@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        token = str(RefreshToken.for_user(self.user_1).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    
+    def test_bulk_create(self):
+        data = [{'title': f'task {i}', 'done': i % 2 == 0} for i in range(50)]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post('/api/tasks/bulk/', data, format='json')
+        inserts = [query for query in queries if query['sql'].startswith('INSERT INTO "tasks_task"')]
+        counter_writes = [query for query in queries if 'tasks_taskcounter' in query['sql']]
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(response.data), 50)
+        self.assertEqual(len(inserts), 1)
+        self.assertLessEqual(len(counter_writes), 3)
+        self.assertEqual(response.data[0]['owner'], self.user_1.pk)
+        self.assertIsNotNone(response.data[0]['id'])
+        self.assertEqual(Task.objects.filter(owner=self.user_1).count(), 50)
+    
+    def test_bulk_create_invalid_item(self):
+        data = [{'title': 'ok'}, {'title': ''}]
+        response = self.client.post('/api/tasks/bulk/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('title', response.data[1])
+        self.assertFalse(Task.objects.exists())
+    
+    def test_bulk_update(self):
+        tasks = [Task.objects.create(owner=self.user_1, title=f'task {i}') for i in range(3)]
+        data = [{'id': task.id, 'done': True} for task in tasks]
+        data[0]['title'] = 'renamed'
+        response = self.client.patch('/api/tasks/bulk/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([item['id'] for item in response.data], [task.id for task in tasks])
+        self.assertEqual(Task.objects.filter(done=True).count(), 3)
+        self.assertEqual(Task.objects.get(pk=tasks[0].pk).title, 'renamed')
+        self.assertEqual(Task.objects.get(pk=tasks[1].pk).title, 'task 1')
+    
+    def test_bulk_update_checks_ownership(self):
+        own = Task.objects.create(owner=self.user_1, title='own')
+        other = Task.objects.create(owner=self.user_2, title='other')
+        data = [{'id': own.id, 'done': True}, {'id': other.id, 'done': True}, {'id': 0}, {}]
+        response = self.client.patch('/api/tasks/bulk/', data, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertEqual(response.data[1]['id'][0].code, 'not_owner')
+        self.assertEqual(response.data[2]['id'][0].code, 'not_found')
+        self.assertEqual(response.data[3]['id'][0].code, 'missing_id')
+        self.assertFalse(Task.objects.filter(done=True).exists())
+    
+    def test_bulk_delete(self):
+        tasks = [Task.objects.create(owner=self.user_1, title=f'task {i}') for i in range(3)]
+        response = self.client.delete('/api/tasks/bulk/', [task.id for task in tasks], format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'id': task.id, 'deleted': True} for task in tasks])
+        self.assertFalse(Task.objects.exists())
+    
+    def test_bulk_delete_rejects_foreign_and_duplicate_ids(self):
+        own = Task.objects.create(owner=self.user_1, title='own')
+        other = Task.objects.create(owner=self.user_2, title='other')
+        response = self.client.delete('/api/tasks/bulk/', [own.id, other.id, own.id], format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data[0], {})
+        self.assertIn('id', response.data[1])
+        self.assertIn('id', response.data[2])
+        self.assertEqual(Task.objects.count(), 2)
+    
+    def test_bulk_write_invalidates_list_cache(self):
+        self.client.get('/api/tasks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/bulk/', [{'title': 'task'}], format='json')
+        response = self.client.get('/api/tasks/')
+        
+        self.assertEqual(response.json()['count'], 1)
+
+
+class TaskChangesApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    
+    def sync(self, since=None, **params):
+        if since is not None:
+            params['since'] = since
+        response = self.client.get('/api/tasks/changes/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        return response.data
+    
+    def test_first_sync_reports_all_tasks_as_created(self):
+        task = Task.objects.create(owner=self.user, title='task')
+        Task.objects.create(owner=self.user, title='deleted').delete()
+        data = self.sync()
+        
+        self.assertEqual([item['id'] for item in data['created']], [task.id])
+        self.assertEqual(data['updated'], [])
+        self.assertEqual(data['deleted'], [])
+        self.assertFalse(data['has_more'])
+    
+    def test_delta_sync(self):
+        kept = Task.objects.create(owner=self.user, title='kept')
+        changed = Task.objects.create(owner=self.user, title='changed')
+        removed = Task.objects.create(owner=self.user, title='removed')
+        token = self.sync()['next']
+        
+        self.assertEqual(self.sync(token)['created'], [])
+        
+        self.client.patch(f'/api/tasks/{changed.id}/', {'done': True})
+        self.client.delete(f'/api/tasks/{removed.id}/')
+        added = Task.objects.create(owner=self.user, title='added')
+        data = self.sync(token)
+        
+        self.assertEqual([item['id'] for item in data['created']], [added.id])
+        self.assertEqual([item['id'] for item in data['updated']], [changed.id])
+        self.assertEqual(data['deleted'], [removed.id])
+        self.assertNotIn(kept.id, [item['id'] for item in data['updated']])
+        
+        data = self.sync(data['next'])
+        
+        self.assertEqual((data['created'], data['updated'], data['deleted']), ([], [], []))
+    
+    def test_owner_cascade_delete_is_visible_to_admin(self):
+        owner = User.objects.create_user(
+            email='owner@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        task = Task.objects.create(owner=owner, title='task')
+        admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        token = str(RefreshToken.for_user(admin).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        owner_id = owner.pk
+        since = self.sync(owner=owner_id)['next']
+        
+        owner.delete()
+        
+        self.assertEqual(self.sync(since, owner=owner_id)['deleted'], [task.id])
+        self.assertEqual(self.sync(since, owner=f'0{owner_id}')['deleted'], [task.id])
+        
+        response = self.client.get('/api/tasks/changes/', {'owner': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'detail': 'Invalid owner.'})
+    
+    def test_sync_pages_with_limit(self):
+        tasks = [Task.objects.create(owner=self.user, title=f'task {i}') for i in range(5)]
+        data = self.sync(limit=2)
+        seen = [item['id'] for item in data['created']]
+        
+        while data['has_more']:
+            data = self.sync(data['next'], limit=2)
+            seen += [item['id'] for item in data['created'] + data['updated']]
+        
+        self.assertEqual(seen, [task.id for task in tasks])
+    
+    def test_token_of_syncing_client_does_not_expire(self):
+        task = Task.objects.create(owner=self.user, title='task')
+        TaskTombstone.objects.create(task_id=0, owner_id=self.user.pk,
+                                     deleted=timezone.now() - timedelta(days=60))
+        token = self.sync()['next']
+        start = timezone.now()
+        
+        for days in (10, 20, 31, 45):
+            with patch('django.utils.timezone.now', return_value=start + timedelta(days=days)):
+                token = self.sync(token)['next']
+        
+        pk = task.pk
+        task.delete()
+        TaskTombstone.objects.filter(task_id=pk).update(deleted=start + timedelta(days=46))
+        with patch('django.utils.timezone.now', return_value=start + timedelta(days=46, seconds=1)):
+            data = self.sync(token)
+        
+        self.assertEqual(data['deleted'], [pk])
+    
+    def test_invalid_and_expired_tokens(self):
+        response = self.client.get('/api/tasks/changes/', {'since': 'garbage'})
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        
+        old = timezone.now() - timedelta(days=365)
+        token = Watermark(task=(old, 1), tombstone=(old, 1)).encode()
+        response = self.client.get('/api/tasks/changes/', {'since': token})
+        
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+class TaskExportApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.tasks = [
+            Task.objects.create(owner=self.user, title=f'task, "{i}"', done=bool(i % 2))
+            for i in range(5)
+        ]
+        Task.objects.create(owner=self.other, title='foreign')
+    
+    def export(self, user, **params):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        response = self.client.get('/api/tasks/export/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        
+        return response, b''.join(response.streaming_content).decode()
+    
+    def test_export_ndjson(self):
+        response, body = self.export(self.user, done='false')
+        tasks = [json.loads(line) for line in body.splitlines()]
+        
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        self.assertEqual([task['id'] for task in tasks], [task.id for task in self.tasks if not task.done])
+        self.assertEqual(set(tasks[0]), {'id', 'owner', 'title', 'description', 'done', 'created'})
+    
+    def test_export_csv(self):
+        response, body = self.export(self.user, format='csv')
+        rows = list(csv.reader(body.splitlines()))
+        
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="tasks.csv"')
+        self.assertEqual(rows[0], ['id', 'owner', 'title', 'description', 'done', 'created'])
+        self.assertEqual([row[2] for row in rows[1:]], [task.title for task in self.tasks])
+    
+    def test_export_in_chunks(self):
+        with patch.object(TaskModelViewSet, 'export_chunk_size', 2):
+            response, body = self.export(self.user, format='csv')
+        
+        self.assertEqual(len(body.splitlines()), 6)
+    
+    def test_admin_exports_all_tasks(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        _, body = self.export(admin)
+        
+        self.assertEqual(len(body.splitlines()), 6)
+        
+        _, body = self.export(admin, owner=self.other.pk)
+        
+        self.assertEqual([json.loads(line)['title'] for line in body.splitlines()], ['foreign'])
+
+
+class AsyncTaskApiTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.authorization = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+    
+    def test_list_matches_sync_list(self):
+        for i in range(3):
+            Task.objects.create(owner=self.user, title=f'task {i}', done=bool(i % 2))
+        Task.objects.create(owner=self.other, title='foreign')
+        
+        for params in ({}, {'limit': 1, 'offset': 1}, {'done': 'false'}):
+            with self.subTest(params=params):
+                response = self.client.get('/api/async/tasks/', params)
+                expected = self.client.get('/api/tasks/', params).json()
+                
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json()['results'], expected['results'])
+                self.assertEqual(response.json()['count'], expected['count'])
+    
+    def test_create_update_delete(self):
+        response = self.client.post('/api/async/tasks/', {'title': 'task'}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.json()['owner'], self.user.pk)
+        
+        url = f'/api/async/tasks/{response.json()["id"]}/'
+        response = self.client.patch(url, {'done': True}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['done'], True)
+        self.assertEqual(response.json(), self.client.get(url).json())
+        
+        response = self.client.delete(url)
+        
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Task.objects.exists())
+    
+    def test_invalid_data(self):
+        response = self.client.post('/api/async/tasks/', {'title': ''}, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('title', response.json())
+    
+    def test_permissions(self):
+        task = Task.objects.create(owner=self.other, title='foreign')
+        
+        self.assertEqual(self.client.get(f'/api/async/tasks/{task.pk}/').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        self.assertEqual(self.client.get('/api/async/tasks/0/').status_code,
+                         status.HTTP_404_NOT_FOUND)
+        
+        self.client.credentials()
+        response = self.client.get('/api/async/tasks/')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn('Bearer', response['WWW-Authenticate'])
+    
+    async def test_async_client(self):
+        task = await Task.objects.acreate(owner=self.user, title='task')
+        response = await self.async_client.get(f'/api/async/tasks/{task.pk}/',
+                                               AUTHORIZATION=self.authorization)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['title'], 'task')
+
+
+@override_settings(TASK_EVENTS={'OPTIONS': {'buffer_size': 3}, 'KEEPALIVE': 0.05})
+class TaskEventStreamTests(APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.authorization = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        get_task_event_broker.cache_clear()
+        self.broker = get_task_event_broker()
+    
+    async def read_events(self, stream, count):
+        chunks = []
+        while len(chunks) < count:
+            chunk = await anext(stream)
+            if not chunk.startswith(b':'):
+                chunks.append(chunk.decode())
+        return chunks
+    
+    def test_changes_are_published_on_commit(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            task = Task.objects.create(owner=self.user, title='task')
+        with self.captureOnCommitCallbacks(execute=True):
+            task.done = True
+            task.save()
+        pk = task.pk
+        with self.captureOnCommitCallbacks() as callbacks:
+            task.delete()
+        
+        self.assertEqual([(event.type, event.data['id']) for event in self.broker._buffer],
+                         [('created', pk), ('updated', pk)])
+        self.assertTrue(self.broker._buffer[1].data['done'])
+        
+        callbacks[-1]()
+        self.assertEqual((self.broker._buffer[-1].type, self.broker._buffer[-1].data), ('deleted', {'id': pk}))
+    
+    def test_tasks_are_serialized_when_sent(self):
+        with patch('tasks.fast.task_dicts', wraps=fast.task_dicts) as task_dicts:
+            with self.captureOnCommitCallbacks(execute=True):
+                task = Task.objects.create(owner=self.user, title='task')
+            expected = TaskSerializer(task).data
+            task.title = 'changed after the commit'
+            
+            task_dicts.assert_not_called()
+            self.assertEqual(self.broker._buffer[0].data, expected)
+            self.assertEqual(self.broker._buffer[0].data, expected)
+            task_dicts.assert_called_once()
+    
+    async def test_stream_delivers_and_resumes(self):
+        response = await self.async_client.get('/api/tasks/stream/', AUTHORIZATION=self.authorization)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b': connected\n\n')
+        first = self.broker.publish(self.user.pk, 'created', {'id': 1})
+        self.broker.publish(self.user.pk + 1, 'created', {'id': 2})
+        self.broker.publish(self.user.pk, 'updated', {'id': 1})
+        
+        chunks = await self.read_events(stream, 2)
+        self.assertEqual(chunks[0], f'id: {first.id}\nevent: created\ndata: {{"id":1}}\n\n')
+        self.assertIn('event: updated', chunks[1])
+        self.assertEqual(await anext(stream), b': keepalive\n\n')
+        response.close()
+        self.assertEqual(self.broker.subscriber_count(), 0)
+        
+        response = await self.async_client.get('/api/tasks/stream/', AUTHORIZATION=self.authorization,
+                                               LAST_EVENT_ID=first.id)
+        stream = aiter(response.streaming_content)
+        chunks = await self.read_events(stream, 1)
+        self.assertIn('event: updated', chunks[0])
+        response.close()
+    
+    async def test_stream_resumes_events_published_while_disconnected(self):
+        response = await self.async_client.get('/api/tasks/stream/', AUTHORIZATION=self.authorization)
+        stream = aiter(response.streaming_content)
+        await anext(stream)
+        first = self.broker.publish(self.user.pk, 'created', {'id': 1})
+        await self.read_events(stream, 1)
+        response.close()
+        self.assertEqual(self.broker.subscriber_count(), 0)
+        
+        missed = self.broker.publish(self.user.pk, 'updated', lambda: {'id': 1, 'done': True})
+        
+        response = await self.async_client.get('/api/tasks/stream/', AUTHORIZATION=self.authorization,
+                                               LAST_EVENT_ID=first.id)
+        stream = aiter(response.streaming_content)
+        
+        self.assertEqual(await self.read_events(stream, 1),
+                         [f'id: {missed.id}\nevent: updated\ndata: {{"id":1,"done":true}}\n\n'])
+        response.close()
+    
+    async def test_stream_resets_unknown_positions(self):
+        old = self.broker.publish(self.user.pk, 'created', {'id': 1})
+        for i in range(4):
+            self.broker.publish(self.user.pk, 'updated', {'id': 1})
+        
+        for last_event_id in (old.id, 'other-process-5', 'garbage'):
+            response = await self.async_client.get('/api/tasks/stream/', {'last_event_id': last_event_id},
+                                                   AUTHORIZATION=self.authorization)
+            stream = aiter(response.streaming_content)
+            
+            self.assertEqual(await self.read_events(stream, 1), ['event: reset\ndata: {}\n\n'])
+            response.close()
+    
+    async def test_stream_ticket(self):
+        response = await self.async_client.post('/api/tasks/stream/ticket/', AUTHORIZATION=self.authorization)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ticket = response.json()['ticket']
+        
+        response = await self.async_client.get('/api/tasks/stream/', {'ticket': ticket})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response.close()
+        
+        self.assertEqual((await self.async_client.get('/api/tasks/', AUTHORIZATION=f'Bearer {ticket}')).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual((await self.async_client.get('/api/tasks/stream/', {'ticket': 'garbage'})).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+        with patch('users.tokens.StreamTicket.lifetime', timedelta(seconds=-1)):
+            expired = str(StreamTicket.for_user(self.user))
+        self.assertEqual((await self.async_client.get('/api/tasks/stream/', {'ticket': expired})).status_code,
+                         status.HTTP_401_UNAUTHORIZED)
+    
+    def test_stream_requires_asgi_and_authentication(self):
+        self.assertEqual(self.client.get('/api/tasks/stream/').status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        response = self.client.get('/api/tasks/stream/', HTTP_AUTHORIZATION=self.authorization)
+        self.assertEqual(response.status_code, status.HTTP_501_NOT_IMPLEMENTED)
+    
+    async def test_stream_ends_after_max_duration(self):
+        subscription = self.broker.subscribe(self.user.pk)
+        chunks = [chunk async for chunk in EventStream(subscription, keepalive=0.02, max_duration=0.05)]
+        
+        self.assertEqual(chunks[0], b': connected\n\n')
+        self.assertTrue(subscription.closed)
+        self.assertEqual(self.broker.subscriber_count(), 0)
+
+
+class TaskListCacheTests(APITestCase):
+    def setUp(self):
+        get_task_list_cache().clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    
+    def test_repeat_list_is_served_from_cache(self):
+        Task.objects.create(owner=self.user, title='task')
+        first = self.client.get('/api/tasks/', {'done': 'false'})
+        
+        with self.assertNumQueries(1):
+            second = self.client.get('/api/tasks/', {'done': 'false'})
+        
+        self.assertEqual(first['X-Cache'], 'MISS')
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        self.assertEqual(get_task_list_cache().stats()['hits'], 1)
+    
+    def test_create_through_api_invalidates_cache(self):
+        self.client.get('/api/tasks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post('/api/tasks/', {'title': 'new task'})
+        response = self.client.get('/api/tasks/')
+        
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 1)
+    
+    def test_model_save_and_delete_invalidate_cache(self):
+        task = Task.objects.create(owner=self.user, title='task')
+        self.client.get('/api/tasks/')
+        with self.captureOnCommitCallbacks(execute=True):
+            task.title = 'renamed'
+            task.save()
+        response = self.client.get('/api/tasks/')
+        
+        self.assertEqual(response.json()['results'][0]['title'], 'renamed')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            task.delete()
+        response = self.client.get('/api/tasks/')
+        
+        self.assertEqual(response.json()['count'], 0)
+    
+    @override_settings(TASK_LIST_CACHE={'BACKEND': 'tasks.cache.DjangoCacheBackend'})
+    def test_django_cache_backend(self):
+        get_task_list_cache().clear()
+        self.client.get('/api/tasks/')
+        response = self.client.get('/api/tasks/')
+        
+        self.assertEqual(response['X-Cache'], 'HIT')
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(owner=self.user, title='task')
+        response = self.client.get('/api/tasks/')
+        
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(get_task_list_cache().stats(), {'hits': 1, 'misses': 2})
+    
+    def test_admin_owner_filter_is_invalidated_whatever_its_spelling(self):
+        admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin).access_token}')
+        padded = f'0{self.user.pk}'
+        self.client.get('/api/tasks/', {'owner': padded})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            Task.objects.create(owner=self.user, title='task')
+        response = self.client.get('/api/tasks/', {'owner': padded})
+        
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(response.json()['count'], 1)
+        
+        response = self.client.get('/api/tasks/', {'owner': 'abc'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'detail': 'Invalid owner.'})
+
+
+class TaskFastListTests(APITestCase):
+    def setUp(self):
+        get_task_list_cache().clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        titles = ['plain', 'quote " and \\ backslash', 'line\u2028separator\u2029',
+                  'control \x00\x1f\t\n', 'юнікод ✓ 😀', '</script>']
+        for i, title in enumerate(titles):
+            Task.objects.create(owner=self.user, title=title,
+                                description=None if i % 2 else title * 3, done=bool(i % 3))
+    
+    def get_both(self, params=None, path='/api/tasks/'):
+        fast = self.client.get(path, params)
+        with override_settings(TASK_LIST_FAST_SERIALIZER=False):
+            get_task_list_cache().clear()
+            slow = self.client.get(path, params)
+        
+        return fast, slow
+    
+    def test_fast_list_matches_serializer_output(self):
+        for params in ({}, {'limit': 2, 'offset': 1}, {'done': 'true'}, {'cursor': '', 'limit': 4}):
+            with self.subTest(params=params):
+                fast, slow = self.get_both(params)
+                
+                self.assertEqual(fast.status_code, status.HTTP_200_OK)
+                self.assertFalse(hasattr(fast, 'data'))
+                self.assertTrue(hasattr(slow, 'data'))
+                self.assertEqual(fast.content, slow.content)
+                self.assertEqual(fast['Content-Type'], slow['Content-Type'])
+                self.assertEqual(fast['ETag'], slow['ETag'])
+    
+    def test_fast_list_second_cursor_page(self):
+        first = self.client.get('/api/tasks/', {'cursor': '', 'limit': 4})
+        fast, slow = self.get_both(path=first.json()['next'])
+        
+        self.assertEqual(fast.content, slow.content)
+        self.assertEqual(len(fast.json()['results']), 2)
+    
+    def test_browsable_api_uses_serializer(self):
+        response = self.client.get('/api/tasks/', HTTP_ACCEPT='text/html')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(hasattr(response, 'data'))
+
+
+class ResponseEncodingTests(APITestCase):
+    def setUp(self):
+        get_task_list_cache().clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        token = str(RefreshToken.for_user(self.user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        for i in range(30):
+            Task.objects.create(owner=self.user, title=f'task {i}', description='description ' * 5)
+    
+    def test_gzip_list(self):
+        plain = self.client.get('/api/tasks/', {'limit': 30})
+        response = self.client.get('/api/tasks/', {'limit': 30}, HTTP_ACCEPT_ENCODING='br;q=0, gzip, deflate')
+        
+        self.assertNotIn('Content-Encoding', plain)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertLess(int(response['Content-Length']), len(plain.content) // 2)
+        self.assertEqual(response['ETag'], 'W/' + plain['ETag'])
+        
+        not_modified = self.client.get('/api/tasks/', {'limit': 30}, HTTP_ACCEPT_ENCODING='gzip',
+                                       HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+    
+    def test_small_and_refused_responses_are_not_compressed(self):
+        small = self.client.get('/api/tasks/', {'limit': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        refused = self.client.get('/api/tasks/', {'limit': 30}, HTTP_ACCEPT_ENCODING='gzip;q=0, identity')
+        
+        self.assertNotIn('Content-Encoding', small)
+        self.assertNotIn('Content-Encoding', refused)
+        
+        with override_settings(COMPRESSION={'MIN_SIZE': 10}):
+            small = self.client.get('/api/tasks/', {'limit': 1}, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(small['Content-Encoding'], 'gzip')
+    
+    def test_streams(self):
+        response = self.client.get('/api/tasks/export/', HTTP_ACCEPT_ENCODING='gzip')
+        
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        lines = gzip.decompress(b''.join(response.streaming_content)).decode().splitlines()
+        self.assertEqual(len(lines), 30)
+        
+        middleware = CompressionMiddleware(lambda request: StreamingHttpResponse(
+            iter([b'data: x\n\n'] * 200), content_type='text/event-stream'))
+        request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', middleware(request))
+    
+    def test_choose_encoding(self):
+        self.assertEqual(choose_encoding('gzip, br', ('br', 'gzip')), 'br')
+        self.assertEqual(choose_encoding('gzip, br;q=0.5', ('br', 'gzip')), 'gzip')
+        self.assertEqual(choose_encoding('*', ('br', 'gzip')), 'br')
+        self.assertEqual(choose_encoding('*;q=0, gzip;q=0.1', ('br', 'gzip')), 'gzip')
+        self.assertIsNone(choose_encoding('identity, deflate', ('br', 'gzip')))
+        self.assertIsNone(choose_encoding('', ('br', 'gzip')))
+    
+    @skipUnless(msgpack, 'msgpack is not installed')
+    def test_msgpack(self):
+        json_response = self.client.get('/api/tasks/', {'limit': 30})
+        response = self.client.get('/api/tasks/', {'limit': 30}, HTTP_ACCEPT='application/msgpack')
+        
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json_response.json())
+        self.assertNotEqual(response['ETag'], json_response['ETag'])
+        
+        with override_settings(TASK_LIST_FAST_SERIALIZER=False):
+            get_task_list_cache().clear()
+            slow = self.client.get('/api/tasks/', {'limit': 30}, HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(slow.content, response.content)
+        
+        created = self.client.post('/api/tasks/', msgpack.packb({'title': 'packed'}),
+                                   content_type='application/msgpack', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(created.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(msgpack.unpackb(created.content)['title'], 'packed')
+        
+        invalid = self.client.post('/api/tasks/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class TaskSearchApiTests(APITestCase):
+    def setUp(self):
+        get_task_list_cache().clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.milk = Task.objects.create(owner=self.user, title='Buy milk', description='Two bottles')
+        self.shop = Task.objects.create(owner=self.user, title='Groceries',
+                                        description='Milk, bread and café', done=True)
+        self.call = Task.objects.create(owner=self.user, title='Call mom')
+        self.foreign = Task.objects.create(owner=self.other, title='Milk the cow')
+    
+    def search(self, user, q, **params):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return self.client.get('/api/tasks/', {'q': q, **params})
+    
+    def ids(self, response):
+        return [task['id'] for task in response.json()['results']]
+    
+    def test_search_is_ranked_and_scoped_to_owner(self):
+        response = self.search(self.user, 'milk')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['count'], 2)
+        # Title matches rank above description matches.
+        self.assertEqual(self.ids(response), [self.milk.id, self.shop.id])
+    
+    def test_search_words_accents_and_filters(self):
+        self.assertEqual(self.ids(self.search(self.user, 'groceries')), [self.shop.id])
+        self.assertEqual(self.ids(self.search(self.user, 'cafe')), [self.shop.id])
+        self.assertEqual(self.ids(self.search(self.user, 'milk', done='false')), [self.milk.id])
+        self.assertEqual(self.ids(self.search(self.user, 'milk bottles')), [self.milk.id])
+        self.assertEqual(self.ids(self.search(self.user, 'milk" (*')), [self.milk.id, self.shop.id])
+        self.assertEqual(self.ids(self.search(self.user, 'mil')), [])
+        self.assertEqual(self.ids(self.search(self.user, '***')), [])
+    
+    def test_admin_search(self):
+        self.assertEqual(self.search(self.admin, 'milk').json()['count'], 3)
+        self.assertEqual(self.ids(self.search(self.admin, 'milk', owner=self.other.id)), [self.foreign.id])
+    
+    def test_admin_search_with_invalid_owner(self):
+        response = self.search(self.admin, 'milk', owner='abc')
+        
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.json(), {'detail': 'Invalid owner.'})
+    
+    def test_search_pagination(self):
+        response = self.search(self.user, 'milk', limit=1, offset=1)
+        
+        self.assertEqual(response.json()['count'], 2)
+        self.assertEqual(self.ids(response), [self.shop.id])
+        self.assertEqual(self.search(self.user, 'milk', cursor='').status_code,
+                         status.HTTP_400_BAD_REQUEST)
+    
+    def test_index_follows_writes(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.call.title = 'Buy more milk'
+            self.call.save()
+            self.milk.delete()
+        
+        self.assertEqual(self.ids(self.search(self.user, 'milk')), [self.call.id, self.shop.id])
+        self.assertEqual(self.ids(self.search(self.user, 'mom')), [])
+    
+    def test_fast_list_matches_serializer_output(self):
+        fast = self.search(self.user, 'milk')
+        with override_settings(TASK_LIST_FAST_SERIALIZER=False):
+            get_task_list_cache().clear()
+            slow = self.client.get('/api/tasks/', {'q': 'milk'})
+        
+        self.assertEqual(fast.content, slow.content)
+    
+    def test_post_migrate_keeps_index_removed_when_migrated_back(self):
+        app_config = apps.get_app_config('tasks')
+        with patch('tasks.signals.search_index_is_installed', return_value=False), \
+                patch('tasks.signals.install_search_index') as install:
+            with patch.object(MigrationRecorder, 'applied_migrations', return_value={}):
+                ensure_search_index(sender=app_config, app_config=app_config, using='default')
+            install.assert_not_called()
+            
+            ensure_search_index(sender=app_config, app_config=app_config, using='default')
+            install.assert_called_once_with(connections['default'])
+
+
+class TaskSummaryApiTests(APITestCase):
+    def setUp(self):
+        get_task_list_cache().clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.tasks = [Task.objects.create(owner=self.user, title=f'task {i}', done=i < 2) for i in range(5)]
+        Task.objects.create(owner=self.other, title='other task')
+    
+    def api_authentication(self, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    
+    def counts(self, user):
+        counter = TaskCounter.objects.filter(owner_id=user.pk).first()
+        return (counter.total, counter.done) if counter is not None else (0, 0)
+    
+    def test_user_summary(self):
+        self.api_authentication(self.user)
+        # The authenticated user and the counter, whatever the number of tasks.
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/tasks/summary/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {'owner': self.user.id, 'total': 5, 'done': 2, 'open': 3})
+    
+    def test_admin_summary(self):
+        self.api_authentication(self.admin)
+        response = self.client.get('/api/tasks/summary/')
+        
+        self.assertEqual(response.data['count'], 3)
+        self.assertEqual([(item['owner'], item['total']) for item in response.data['results']],
+                         [(self.user.id, 5), (self.other.id, 1), (self.admin.id, 0)])
+        
+        response = self.client.get('/api/tasks/summary/', {'owner': self.other.id})
+        self.assertEqual(response.data, {'owner': self.other.id, 'total': 1, 'done': 0, 'open': 1})
+        self.assertEqual(self.client.get('/api/tasks/summary/', {'owner': 'x'}).status_code,
+                         status.HTTP_400_BAD_REQUEST)
+    
+    def test_counters_follow_api_writes(self):
+        self.api_authentication(self.user)
+        self.client.post('/api/tasks/', {'title': 'new', 'done': True})
+        self.assertEqual(self.counts(self.user), (6, 3))
+        
+        self.client.patch(f'/api/tasks/{self.tasks[0].id}/', {'done': False})
+        self.client.patch(f'/api/tasks/{self.tasks[1].id}/', {'title': 'renamed'})
+        self.assertEqual(self.counts(self.user), (6, 2))
+        
+        self.client.delete(f'/api/tasks/{self.tasks[1].id}/')
+        self.assertEqual(self.counts(self.user), (5, 1))
+        
+        self.client.post('/api/tasks/bulk/', [{'title': 'a', 'done': True}, {'title': 'b'}], format='json')
+        self.client.patch('/api/tasks/bulk/', [{'id': self.tasks[2].id, 'done': True}], format='json')
+        self.client.delete('/api/tasks/bulk/', [self.tasks[3].id], format='json')
+        self.assertEqual(self.counts(self.user), (6, 3))
+    
+    def test_counters_follow_model_writes(self):
+        task = Task.objects.get(pk=self.tasks[4].pk)
+        task.owner = self.other
+        task.done = True
+        task.save()
+        self.assertEqual(self.counts(self.user), (4, 2))
+        self.assertEqual(self.counts(self.other), (2, 1))
+        
+        # Without the loaded state the owner is recounted.
+        task = Task.objects.only('id').get(pk=task.pk)
+        task.done = False
+        task.save()
+        self.assertEqual(self.counts(self.other), (2, 0))
+        
+        self.other.delete()
+        self.assertEqual(self.counts(self.other), (0, 0))
+        self.assertFalse(TaskCounter.objects.filter(owner_id=self.other.pk).exists())
+    
+    def test_repair_task_counters(self):
+        TaskCounter.objects.filter(owner_id=self.user.pk).update(total=50)
+        TaskCounter.objects.filter(owner_id=self.other.pk).delete()
+        
+        out = StringIO()
+        call_command('repair_task_counters', '--dry-run', stdout=out)
+        self.assertIn('Found 2 drifted counters.', out.getvalue())
+        self.assertEqual(self.counts(self.user), (50, 2))
+        
+        out = StringIO()
+        call_command('repair_task_counters', stdout=out)
+        self.assertIn(f'Owner {self.user.pk}: total 50 -> 5, done 2 -> 2', out.getvalue())
+        self.assertEqual(self.counts(self.user), (5, 2))
+        self.assertEqual(self.counts(self.other), (1, 0))
+
+
+class RequestMetricsTests(APITestCase):
+    def setUp(self):
+        get_task_list_cache().clear()
+        registry.clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        Task.objects.bulk_create(Task(owner=self.user, title=f'task {i}') for i in range(3))
+    
+        self.authorization = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+    
+    def api_authentication(self, user):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    
+    def test_histogram(self):
+        histogram = Histogram()
+        for value in range(1, 10001):
+            histogram.record(value)
+        
+        self.assertEqual(histogram.count, 10000)
+        self.assertEqual(histogram.percentile(0), 1)
+        self.assertAlmostEqual(histogram.percentile(0.5), 5000, delta=5000 * 0.04)
+        self.assertAlmostEqual(histogram.percentile(0.99), 9900, delta=9900 * 0.04)
+        self.assertEqual(histogram.percentile(1), 10000)
+        self.assertEqual(histogram.cumulative_counts([0, 10, 63, 20000]), [0, 10, 63, 10000])
+        for index in (0, 63, 64, 95, 500):
+            low, high = Histogram.bounds(index)
+            self.assertEqual(Histogram.index(low), index)
+            self.assertEqual(Histogram.index(high), index)
+    
+    def test_requests_are_recorded_per_view_and_action(self):
+        self.api_authentication(self.user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/tasks/')
+        query_count = len(queries)
+        self.client.get('/api/tasks/')
+        
+        labels = ('task-list', 'list', 'GET')
+        self.assertEqual(registry.get_histogram(labels, 'latency').count, 2)
+        self.assertEqual(registry.get_histogram(labels, 'db_queries').max, query_count)
+        self.assertEqual(registry.get_histogram(labels, 'response_size').max, len(response.content))
+        self.assertGreater(registry.get_histogram(labels, 'serializer_time').max, 0)
+        
+        self.client.patch(f'/api/users/{self.user.pk}/change-password/', {})
+        labels = ('users.views.UserChangePasswordApiView', 'patch', 'PATCH')
+        self.assertEqual(registry.get_histogram(labels, 'latency').count, 1)
+    
+    def test_metrics_endpoint(self):
+        self.api_authentication(self.user)
+        self.client.get('/api/tasks/')
+        self.assertEqual(self.client.get('/api/_metrics').status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.api_authentication(self.admin)
+        response = self.client.get('/api/_metrics')
+        body = response.content.decode()
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertIn('http_requests_total{view="task-list",action="list",method="GET",status="200"} 1', body)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn('http_request_db_queries_bucket{view="task-list",action="list",method="GET",le="+Inf"} 1',
+                      body)
+    
+    async def test_queries_of_async_views_are_recorded(self):
+        response = await self.async_client.get('/api/async/tasks/', AUTHORIZATION=self.authorization)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        labels = ('tasks.async_views.AsyncTaskListView', 'get', 'GET')
+        self.assertGreater(registry.get_histogram(labels, 'db_queries').max, 0)
+        
+        # Under an ASGI server the ORM runs in other threads than the
+        # middleware, each with its own connections.
+        def query():
+            try:
+                with connection.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            finally:
+                connection.close()
+        
+        async def view(request):
+            await sync_to_async(query, thread_sensitive=False)()
+            return HttpResponse()
+        
+        with patch.object(RequestMetricsMiddleware, 'record') as record:
+            await RequestMetricsMiddleware(view)(RequestFactory().get('/'))
+        
+        sample = record.call_args.args[1]
+        self.assertEqual(sample.db_queries, 1)
+        self.assertGreater(sample.db_time, 0)
+    
+    @override_settings(REQUEST_METRICS={'QUERY_BUDGET': 1, 'LATENCY_BUDGET': None})
+    def test_requests_over_budget_are_logged(self):
+        self.api_authentication(self.user)
+        with self.assertLogs('backend_drf.metrics', 'WARNING') as logs:
+            self.client.post('/api/tasks/', {'title': 'new'})
+            # Held to the budget declared on the view instead.
+            self.client.get('/api/tasks/')
+        
+        self.assertEqual(len(logs.output), 1)
+        self.assertIn('POST /api/tasks/ (task-list create)', logs.output[0])
+        
+        with override_settings(REQUEST_METRICS={'ENABLED': False}):
+            registry.clear()
+            self.client.get('/api/tasks/')
+            self.assertIsNone(registry.get_histogram(('task-list', 'list', 'GET'), 'latency'))
+
+
+@override_settings(THROTTLING={'SCOPES': {'list': {'RATE': '1/m', 'BURST': 2}, 'write': {'RATE': '1/m'}}})
+class ThrottlingTests(APITestCase):
+    def setUp(self):
+        get_bucket_store().clear()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.other = User.objects.create_user(
+            email='other@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.authorization = f'Bearer {RefreshToken.for_user(self.user).access_token}'
+        self.client.credentials(HTTP_AUTHORIZATION=self.authorization)
+    
+    def test_buckets_per_scope_and_user(self):
+        responses = [self.client.get('/api/tasks/') for _ in range(3)]
+        
+        self.assertEqual([response.status_code for response in responses], [200, 200, 429])
+        self.assertEqual([response['RateLimit-Remaining'] for response in responses], ['1', '0', '0'])
+        self.assertEqual(responses[0]['RateLimit-Limit'], '2')
+        self.assertEqual(responses[2]['Retry-After'], '60')
+        
+        self.assertEqual(self.client.post('/api/tasks/', {'title': 'task'}).status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.client.post('/api/tasks/', {'title': 'task'}).status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+        
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.other).access_token}')
+        self.assertEqual(self.client.get('/api/tasks/').status_code, status.HTTP_200_OK)
+    
+    def test_anonymous_requests_are_limited_per_ip(self):
+        self.client.credentials()
+        data = {'email': 'new@example.com', 'first_name': 'F_name', 'last_name': 'L_name',
+                'password': 'Str0ng-passw0rd', 're_password': 'Str0ng-passw0rd'}
+        
+        with override_settings(PASSWORD_HASHING={'WORKERS': 0}):
+            self.assertEqual(self.client.post('/api/users/', data, REMOTE_ADDR='10.0.0.1').status_code,
+                             status.HTTP_201_CREATED)
+            data['email'] = 'new_2@example.com'
+            self.assertEqual(self.client.post('/api/users/', data, REMOTE_ADDR='10.0.0.1').status_code,
+                             status.HTTP_429_TOO_MANY_REQUESTS)
+            self.assertEqual(self.client.post('/api/users/', data, REMOTE_ADDR='10.0.0.2').status_code,
+                             status.HTTP_201_CREATED)
+    
+    def test_async_views_share_the_buckets(self):
+        self.client.get('/api/tasks/')
+        self.client.get('/api/async/tasks/')
+        response = self.client.get('/api/async/tasks/')
+        
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(response['RateLimit-Remaining'], '0')
+    
+    @override_settings(THROTTLING={'ENABLED': False})
+    def test_disabled(self):
+        for _ in range(3):
+            response = self.client.get('/api/tasks/')
+            
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn('RateLimit-Limit', response)
+    
+    def test_local_store_refill_and_eviction(self):
+        store = LocalBucketStore(max_keys=2)
+        
+        with patch('backend_drf.throttling.time.monotonic', return_value=100.0):
+            self.assertEqual(store.consume('a', rate=2, capacity=2), BucketState(True, 1, 0.0, 0.5))
+            store.consume('a', rate=2, capacity=2)
+            state = store.consume('a', rate=2, capacity=2)
+            self.assertEqual((state.allowed, state.retry_after), (False, 0.5))
+        
+        with patch('backend_drf.throttling.time.monotonic', return_value=100.75):
+            self.assertEqual(store.consume('a', rate=2, capacity=2), BucketState(True, 0, 0.0, 0.75))
+            store.consume('b', rate=2, capacity=2)
+            store.consume('c', rate=2, capacity=2)
+        
+        self.assertEqual(list(store._buckets), ['b', 'c'])
+
+
+class TaskQueryBudgetTests(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.admin = User.objects.create_superuser(
+            email='admin@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+    
+    def seed(self, n):
+        """
+        Bring the user to `n` tasks, half of them done.
+        """
+        count = Task.objects.filter(owner=self.user).count()
+        Task.objects.bulk_create(
+            Task(owner=self.user, title=f'task {i}', description=f'description {i}', done=i % 2 == 0)
+            for i in range(count, n)
+        )
+        get_task_list_cache().clear()
+    
+    def get(self, user, path, **params):
+        token = str(RefreshToken.for_user(user).access_token)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        return lambda: self.client.get(path, params)
+    
+    def test_list(self):
+        for params in ({}, {'done': 'true'}, {'cursor': ''}, {'q': 'task'}, {'limit': 1000}):
+            with self.subTest(params=params):
+                Task.objects.all().delete()
+                self.assertQueryBudget(TaskModelViewSet, 'list', self.get(self.user, '/api/tasks/', **params),
+                                       self.seed)
+        
+        Task.objects.all().delete()
+        self.assertQueryBudget(TaskModelViewSet, 'list', self.get(self.admin, '/api/tasks/'), self.seed)
+    
+    def test_retrieve(self):
+        self.seed(1)
+        task = Task.objects.first()
+        self.assertQueryBudget(TaskModelViewSet, 'retrieve', self.get(self.user, f'/api/tasks/{task.pk}/'),
+                               self.seed)
+    
+    def test_changes_export_and_summary(self):
+        for action, path in (('changes', '/api/tasks/changes/'), ('export', '/api/tasks/export/'),
+                             ('summary', '/api/tasks/summary/')):
+            with self.subTest(action=action):
+                Task.objects.all().delete()
+                self.assertQueryBudget(TaskModelViewSet, action, self.get(self.user, path), self.seed)
+        
+        self.assertQueryBudget(TaskModelViewSet, 'summary', self.get(self.admin, '/api/tasks/summary/'),
+                               self.seed)
+    
+    def test_budget_catches_n_plus_one(self):
+        def to_representation(serializer, task):
+            # A nested owner lookup: one query per row.
+            return {'id': task.id, 'owner': task.owner.email}
+        
+        with patch.object(TaskSerializer, 'to_representation', to_representation), \
+                override_settings(TASK_LIST_FAST_SERIALIZER=False):
+            with self.assertRaisesMessage(AssertionError, 'made'), \
+                    self.assertLogs('backend_drf.metrics', 'WARNING'):
+                self.assertQueryBudget(TaskModelViewSet, 'list', self.get(self.user, '/api/tasks/'),
+                                       self.seed, sizes=(1, 10))
+
+
+@override_settings(REPLICA_DATABASE='default')
+class ReplicaRoutingTests(APITestCase):
+    def setUp(self):
+        cache.clear()
+        get_task_list_cache().clear()
+        reset_replica_health()
+        self.user = User.objects.create_user(
+            email='user@example.com',
+            first_name='F_name',
+            last_name='L_name',
+            password='testpassword'
+        )
+        self.client.force_authenticate(self.user)
+        self.task = Task.objects.create(owner=self.user, title='task')
+    
+    def get_read_aliases(self, *requests):
+        aliases = []
+        get_object = TaskModelViewSet.get_object
+        
+        def record(view):
+            aliases.append(current_read_alias())
+            return get_object(view)
+        
+        with patch.object(TaskModelViewSet, 'get_object', record):
+            for method, url, data in requests:
+                getattr(self.client, method)(url, data, format='json')
+        
+        return aliases
+    
+    def test_router(self):
+        router = ReplicaRouter()
+        
+        self.assertIsNone(router.db_for_read(Task))
+        with read_from('replica'):
+            self.assertEqual(router.db_for_read(Task), 'replica')
+            self.assertEqual(router.db_for_write(Task), 'default')
+        self.assertIsNone(router.db_for_read(Task))
+    
+    def test_safe_requests_read_from_replica(self):
+        aliases = self.get_read_aliases(('get', f'/api/tasks/{self.task.pk}/', None))
+        
+        self.assertEqual(aliases, ['default'])
+        self.assertIsNone(current_read_alias())
+    
+    def test_reads_stick_to_primary_after_write(self):
+        aliases = self.get_read_aliases(
+            ('patch', f'/api/tasks/{self.task.pk}/', {'done': True}),
+            ('get', f'/api/tasks/{self.task.pk}/', None),
+        )
+        
+        self.assertEqual(aliases, [None, None])
+        
+        cache.clear()
+        aliases = self.get_read_aliases(('get', f'/api/tasks/{self.task.pk}/', None))
+        
+        self.assertEqual(aliases, ['default'])
+    
+    def test_unhealthy_or_missing_replica_falls_back_to_primary(self):
+        with patch('backend_drf.replicas.replica_is_healthy', return_value=False):
+            aliases = self.get_read_aliases(('get', f'/api/tasks/{self.task.pk}/', None))
+        
+        self.assertEqual(aliases, [None])
+        
+        with override_settings(REPLICA_DATABASE='missing'):
+            aliases = self.get_read_aliases(('get', f'/api/tasks/{self.task.pk}/', None))
+        
+        self.assertEqual(aliases, [None])
+    
+    def test_failed_replica_query_falls_back_to_primary(self):
+        aliases = []
+        get_object = TaskModelViewSet.get_object
+        
+        def fail_on_replica(view):
+            aliases.append(current_read_alias())
+            if current_read_alias() is not None:
+                raise OperationalError('disk I/O error')
+            return get_object(view)
+        
+        with patch.object(TaskModelViewSet, 'get_object', fail_on_replica):
+            response = self.client.get(f'/api/tasks/{self.task.pk}/')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(response.data['title'], 'task')
+            
+            self.client.get(f'/api/tasks/{self.task.pk}/')
+        
+        # The replica is skipped until its next health check.
+        self.assertEqual(aliases, ['default', None, None])
+        self.assertIsNone(current_read_alias())
+    
+    def test_missing_sqlite_replica_is_unhealthy(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'replica.sqlite3'
+            settings_dict = connections.configure_settings({'default': {
+                'ENGINE': 'django.db.backends.sqlite3',
+                'NAME': path,
+            }})['default']
+            replica = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'replica')
+            
+            with patch('backend_drf.replicas.connections', {'replica': replica}):
+                self.assertFalse(replica_is_healthy('replica'))
+                self.assertFalse(path.exists())
+                
+                sqlite3.connect(path).close()
+                reset_replica_health()
+                self.assertTrue(replica_is_healthy('replica'))
+            replica.close()
+
+
+class TunedSQLiteBackendTests(SimpleTestCase):
+    def test_production_profile_connection(self):
+        with tempfile.TemporaryDirectory() as directory:
+            settings_dict = connections.configure_settings({'default': {
+                **settings.DATABASE_PROFILES['production'],
+                'NAME': Path(directory) / 'db.sqlite3',
+            }})['default']
+            wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, 'tuned')
+            statements = []
+            
+            def record(execute, sql, params, many, context):
+                statements.append(sql)
+                return execute(sql, params, many, context)
+            
+            try:
+                with wrapper.cursor() as cursor:
+                    pragmas = {}
+                    for name in ('journal_mode', 'synchronous', 'busy_timeout'):
+                        cursor.execute(f'PRAGMA {name}')
+                        pragmas[name] = cursor.fetchone()[0]
+                
+                with wrapper.execute_wrapper(record):
+                    wrapper._start_transaction_under_autocommit()
+                wrapper.rollback()
+            finally:
+                wrapper.close()
+        
+        self.assertEqual(pragmas, {'journal_mode': 'wal', 'synchronous': 1, 'busy_timeout': 5000})
+        self.assertEqual(statements, ['BEGIN IMMEDIATE'])
+
+
+class TaskQueryPlanTests(TestCase):
+    def test_task_list_queries_use_indexes(self):
+        out = StringIO()
+        call_command('check_task_queries', stdout=out)
+        
+        self.assertIn('All task list queries use an index.', out.getvalue())
+        self.assertFalse(Task.objects.exists())
+    
+    def test_full_scan_detection(self):
+        command = CheckTaskQueriesCommand()
+        
+        self.assertEqual(command.find_full_scans('sqlite', ['2 0 0 SCAN tasks_task']), ['tasks_task'])
+        self.assertEqual(command.find_full_scans('sqlite', ['SCAN tasks_task USING INDEX idx']), [])
+        self.assertEqual(command.find_full_scans('postgresql', ['Seq Scan on tasks_task']), ['tasks_task'])
+
+
+class TaskBenchmarkTests(TestCase):
+    def test_seed_bench(self):
+        call_command('seed_bench', '--users', '3', '--tasks', '20', '--batch-size', '7', stdout=StringIO())
+        call_command('seed_bench', '--users', '3', '--tasks', '25', stdout=StringIO())
+        
+        users = User.objects.filter(email__startswith='bench-')
+        self.assertEqual(users.count(), 3)
+        self.assertEqual(Task.objects.filter(owner__in=users).count(), 25)
+        for user in users:
+            counter = TaskCounter.objects.get(owner_id=user.pk)
+            self.assertEqual(counter.total, user.tasks.count())
+            self.assertEqual(counter.done, user.tasks.filter(done=True).count())
+        
+        call_command('seed_bench', '--users', '2', '--tasks', '0', '--reset', stdout=StringIO())
+        
+        self.assertEqual(users.all().count(), 2)
+        self.assertFalse(Task.objects.exists())
+    
+    def test_compare_results(self):
+        baseline = {
+            'total': {'rps': 100.0, 'p95_ms': 10.0},
+            'endpoints': {'list': {'rps': 50.0, 'p95_ms': 8.0}, 'token': {'rps': 5.0, 'p95_ms': 90.0}},
+        }
+        current = {
+            'total': {'rps': 95.0, 'p95_ms': 10.5},
+            'endpoints': {'list': {'rps': 40.0, 'p95_ms': 12.0}, 'token': {'rps': 5.0, 'p95_ms': 91.0},
+                          'user': {'rps': 10.0, 'p95_ms': 3.0}},
+        }
+        
+        self.assertEqual(compare(baseline, current), [('list', 8.0, 12.0), ('list rps', 50.0, 40.0)])
+        self.assertEqual(compare(baseline, current, tolerance=0.5), [])
+    
+    def test_bench_encoding(self):
+        with tempfile.TemporaryDirectory() as directory:
+            output = Path(directory) / 'encoding.json'
+            call_command('bench_encoding', '--sizes', '10', '50', '--repeat', '1', '--gzip-level', '1',
+                         '--output', str(output), stdout=StringIO())
+            results = json.loads(output.read_text())['results']
+        
+        identity = [result for result in results if result['coding'] == 'identity' and result['format'] == 'json']
+        self.assertEqual([result['tasks'] for result in identity], [10, 50])
+        compressed = [result for result in results if result['coding'] == 'gzip-1' and result['tasks'] == 50]
+        self.assertLess(compressed[0]['bytes'], identity[1]['bytes'])
+
+
+class BenchApiTests(LiveServerTestCase):
+    def setUp(self):
+        get_bucket_store().clear()
+    
+    def test_bench_api_logs_in_more_users_than_the_login_limit(self):
+        users = settings.THROTTLING['SCOPES']['login']['BURST'] + 20
+        call_command('seed_bench', '--users', str(users), '--tasks', str(users), stdout=StringIO())
+        out = StringIO()
+        call_command('bench_api', '--url', self.live_server_url, '--users', str(users), '--concurrency', '4',
+                     '--warmup', '0', '--requests', '10', '--mix', 'list=1', stdout=out)
+        
+        self.assertRegex(out.getvalue(), r'list\s+10\s+0\s')
@@ -1,9 +1,19 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
+from .async_views import AsyncTaskDetailView, AsyncTaskListView, TaskEventStreamView, TaskEventTicketView
 from .views import TaskModelViewSet
 
 
 router = DefaultRouter()
 router.register(r'tasks', TaskModelViewSet)
 
-urlpatterns = router.urls
+urlpatterns = [
+    # Before the router, whose detail route would match `stream`.
+    path('tasks/stream/', TaskEventStreamView.as_view()),
+    path('tasks/stream/ticket/', TaskEventTicketView.as_view()),
+    path('async/tasks/', AsyncTaskListView.as_view()),
+    path('async/tasks/<int:pk>/', AsyncTaskDetailView.as_view()),
+]
+
+urlpatterns += router.urls
@@ -1,17 +1,80 @@
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from rest_framework import status
+from django.db import transaction
+from django.db.models import Count, Max
+from django.db.models.deletion import Collector
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from rest_framework import permissions, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ParseError
+from rest_framework.pagination import LimitOffsetPagination
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.response import Response
 
-from .serializers import TaskSerializer
+from . import counters, fast
+from .serializers import TaskCounterSerializer, TaskSerializer, TaskListSerializer
+from .pagination import TaskPagination
+from .renderers import CSVRenderer, NDJSONRenderer
+from .search import search_tasks
+from .cache import ALL_OWNERS, get_task_list_cache, make_list_cache_key
 from .models import Task
+from .sync import InvalidWatermark, Watermark, get_changes
 from users.permissions import IsOwner, IsOwnerOrAdmin
+from backend_drf.conditional import ConditionalGetMixin, make_etag
+from backend_drf.metrics import measure
+from backend_drf.query_budget import query_budget
+from backend_drf.replicas import ReplicaReadMixin
 
 
 User = get_user_model()
 
 
-class TaskModelViewSet(ModelViewSet):
+def parse_owner(value):
+    """
+    Return the `owner` query parameter `value` as a user id.
+    
+    Raises `ParseError` (400) when it is not an integer.
+    """
+    try:
+        return int(value)
+    except ValueError:
+        raise ParseError(_('Invalid owner.'))
+
+
+def get_list_filters(user, params):
+    """
+    Return the field lookups of the `owner`/`done` list filters of `params`.
+    
+    Superusers see every task and may filter by `owner`; other users only
+    see their own tasks.
+    """
+    filters = {}
+    done_param = params.get('done', None)
+    owner_param = params.get('owner', None)
+    
+    if user.is_superuser:
+        if owner_param is not None:
+            filters['owner_id'] = parse_owner(owner_param)
+        
+    else:
+        filters['owner_id'] = user.pk
+    
+    if done_param is not None:
+        filters['done'] = str(done_param.capitalize())
+    
+    return filters
+
+
+def filter_task_list(queryset, user, params):
+    """
+    Apply the `owner`/`done` list filters of `params` to `queryset`.
+    """
+    return queryset.filter(**get_list_filters(user, params)).order_by('created', 'id')
+
+
+class TaskModelViewSet(ReplicaReadMixin, ConditionalGetMixin, ModelViewSet):
     """
     A ViewSet for managing Task model operations.
 
@@ -22,32 +85,336 @@ class TaskModelViewSet(ModelViewSet):
     This view allows listing tasks based on the query parameters provided:
     - `done`: Filters tasks by their completion status (e.g., done=true/false).
     - `owner`: Filters tasks by owner (if the requesting user is a superuser).
+    - `q`: Full-text search in title and description; results are ranked
+      by relevance instead of ordered by creation (see `tasks.search`).
+    
+    The list is paginated with `limit`/`offset`; passing `cursor` switches to
+    keyset pagination on `(created, id)` (see `TaskPagination`). List responses
+    are cached per user and query string until one of the listed owners' tasks
+    change (see `tasks.cache`).
+    
+    `list` (`ETag` only) and `retrieve` (`ETag`/`Last-Modified`) send
+    validators and answer conditional requests with `304 Not Modified`.
+    Plain JSON list responses are encoded straight from database rows by
+    `tasks.fast`.
+    
+    `list` and `retrieve` read from the replica database when one is
+    configured (see `backend_drf.replicas`).
+    
+    `bulk` (`/tasks/bulk/`) creates, updates or deletes many tasks at once,
+    `changes` (`/tasks/changes/`) returns what changed since a sync token,
+    `export` (`/tasks/export/`) streams the filtered list as NDJSON or CSV and
+    `summary` (`/tasks/summary/`) returns the task counts per owner.
     """
     
     queryset = Task.objects.all()
     serializer_class = TaskSerializer
     permission_classes = [IsOwner]
+    pagination_class = TaskPagination
+    
+    bulk_max_items = 500
+    export_chunk_size = 2000
     
     def get_permissions(self):
-        if self.action == 'list':
+        if self.action in ('list', 'changes', 'export', 'summary'):
             return [IsOwnerOrAdmin()]
+        elif self.action == 'bulk':
+            return [permissions.IsAuthenticated()]
         return super().get_permissions()
     
+    def get_list_queryset(self):
+        """
+        Return the queryset of tasks visible in the list for the current request.
+        """
+        return filter_task_list(self.queryset, self.request.user, self.request.query_params)
+    
+    def get_search_query(self):
+        return self.request.query_params.get('q', '').strip()
+    
+    def search_list(self, queryset):
+        """
+        Return the tasks of `queryset` matching the `q` parameter, ranked.
+        """
+        filters = get_list_filters(self.request.user, self.request.query_params)
+        return search_tasks(queryset, self.get_search_query(), **filters)
+    
+    def get_list_cache_scope(self):
+        """
+        Return the cache version scope the current list depends on.
+        """
+        filters = get_list_filters(self.request.user, self.request.query_params)
+        return filters.get('owner_id', ALL_OWNERS)
+    
+    def get_list_validators(self, queryset):
+        """
+        Return the ETag and last modification time (always None) of the
+        list `queryset`.
+        
+        The ETag is derived from a single aggregate over the filtered tasks,
+        so a conditional request is answered without serializing anything.
+        Lists send no `Last-Modified`: the latest `updated` stays the same
+        when a task is deleted, so only the ETag, which also covers the
+        count, notices it.
+        """
+        aggregates = queryset.order_by().aggregate(last_modified=Max('updated'), count=Count('id'))
+        etag = make_etag(self.request.build_absolute_uri(), aggregates['last_modified'], aggregates['count'])
+        
+        return etag, None
+    
+    def use_fast_list(self):
+        """
+        Return True when the list can be encoded by `tasks.fast`, which
+        reads plain rows and produces the same bytes as `TaskSerializer`
+        rendered by `JSONRenderer` or `MessagePackRenderer`.
+        """
+        return (getattr(settings, 'TASK_LIST_FAST_SERIALIZER', True)
+                and self.serializer_class is TaskSerializer
+                and fast.can_encode(self.request))
+    
+    def make_list_response(self, content):
+        if isinstance(content, bytes):
+            return HttpResponse(content, content_type=self.request.accepted_renderer.media_type)
+        return Response(content)
+    
+    @query_budget(5)
     def list(self, request, *args, **kwargs):
-        done_param = request.query_params.get('done', None)
-        owner_param = request.query_params.get('owner', None)
-                
-        if request.user.is_superuser:
-            queryset = self.queryset
-            if owner_param is not None:
-                queryset = queryset.filter(owner=owner_param)
-            
+        query = self.get_search_query()
+        if query and TaskPagination.keyset_class.cursor_query_param in request.query_params:
+            return Response({'detail': _('Search results cannot be paginated with a cursor.')},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        use_fast = self.use_fast_list()
+        cache = get_task_list_cache()
+        scope = self.get_list_cache_scope()
+        key = make_list_cache_key(request, scope, cache.get_version(scope),
+                                  variant=request.accepted_renderer.format if use_fast else 'data')
+        
+        cached = cache.get(key)
+        if cached is not None:
+            etag, last_modified, content = cached
+            response = (self.get_not_modified_response(request, etag, last_modified)
+                        or self.set_validators(self.make_list_response(content), etag, last_modified))
+            response['X-Cache'] = 'HIT'
+            return response
+        
+        queryset = self.get_list_queryset()
+        etag, last_modified = self.get_list_validators(queryset)
+        
+        not_modified = self.get_not_modified_response(request, etag, last_modified)
+        if not_modified is not None:
+            return not_modified
+        
+        if query:
+            source = self.search_list(fast.task_rows(self.queryset) if use_fast else self.queryset)
+        else:
+            source = fast.task_rows(queryset) if use_fast else queryset
+        
+        page = self.paginate_queryset(source)
+        if use_fast:
+            encode = fast.pack_page if request.accepted_renderer.format == 'msgpack' else fast.encode_page
+            with measure('serializer_time'):
+                content = encode(self.paginator.get_paginated_response([]).data, page)
         else:
-            queryset = self.queryset.filter(owner=request.user)
+            serializer = self.get_serializer(page, many=True)
+            content = self.get_paginated_response(serializer.data).data
+        
+        cache.set(key, (etag, last_modified, content))
+        response = self.make_list_response(content)
+        response['X-Cache'] = 'MISS'
+        return self.set_validators(response, etag, last_modified)
+    
+    @query_budget(2)
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag('task', instance.pk, instance.updated.isoformat())
+        
+        not_modified = self.get_not_modified_response(request, etag, instance.updated)
+        if not_modified is not None:
+            return not_modified
+        
+        serializer = self.get_serializer(instance)
+        return self.set_validators(Response(serializer.data), etag, instance.updated)
+    
+    @query_budget(4)
+    @action(detail=False, methods=['get'])
+    def changes(self, request, *args, **kwargs):
+        """
+        Return the tasks created, updated and deleted since a watermark.
+        
+        Query parameters:
+        - `since`: The `next` token of a previous response; omit it for a
+          first, full sync (every task is then reported as created).
+        - `limit`: Maximum number of changes per stream (default `PAGE_SIZE`).
+        - `owner`: Owner to sync (superusers only, defaults to themselves).
+        
+        When `has_more` is true the client should call again with `next`.
+        Tokens older than `TASK_TOMBSTONE_RETENTION` get `410 Gone`, after
+        which the client has to do a full sync.
+        """
+        owner_id = request.user.pk
+        if request.user.is_superuser and 'owner' in request.query_params:
+            owner_id = parse_owner(request.query_params['owner'])
+        
+        watermark = None
+        token = request.query_params.get('since')
+        if token:
+            try:
+                watermark = Watermark.decode(token)
+            except InvalidWatermark:
+                return Response({'detail': _('Invalid sync token.')},
+                                status=status.HTTP_400_BAD_REQUEST)
+            
+            horizon = timezone.now() - settings.TASK_TOMBSTONE_RETENTION
+            if watermark.tombstone is not None and watermark.tombstone[0] < horizon:
+                return Response({'detail': _('Sync token expired, a full sync is required.')},
+                                status=status.HTTP_410_GONE)
+        
+        limit = TaskPagination().get_limit(request)
+        created, updated, deleted, watermark, has_more = get_changes(owner_id, watermark, limit)
+        
+        return Response({
+            'created': self.get_serializer(created, many=True).data,
+            'updated': self.get_serializer(updated, many=True).data,
+            'deleted': deleted,
+            'next': watermark.encode(),
+            'has_more': has_more,
+        })
+    
+    @query_budget(4)
+    @action(detail=False, methods=['get'])
+    def summary(self, request, *args, **kwargs):
+        """
+        Return the total, done and open task counts per owner.
+        
+        Users get their own counts. Superusers get the counts of every user,
+        paginated with `limit`/`offset`, or of a single one with `owner`.
+        Counts are read from `TaskCounter`, so the cost does not depend on
+        the number of tasks.
+        """
+        owner_param = request.query_params.get('owner')
+        if request.user.is_superuser and owner_param is None:
+            paginator = LimitOffsetPagination()
+            owner_ids = paginator.paginate_queryset(
+                User.objects.order_by('pk').values_list('pk', flat=True), request, view=self)
+            serializer = TaskCounterSerializer(counters.get_summaries(owner_ids), many=True)
+            return paginator.get_paginated_response(serializer.data)
+        
+        owner_id = request.user.pk
+        if request.user.is_superuser:
+            owner_id = parse_owner(owner_param)
+        
+        summary, = counters.get_summaries([owner_id])
+        return Response(TaskCounterSerializer(summary).data)
+    
+    @query_budget(2)
+    @action(detail=False, methods=['get'], renderer_classes=[NDJSONRenderer, CSVRenderer])
+    def export(self, request, *args, **kwargs):
+        """
+        Stream every task of the list as NDJSON (default) or CSV.
+        
+        Accepts the `done` and `owner` filters of `list`; the format is picked
+        with `?format=ndjson|csv` or the `Accept` header. Rows are read with a
+        chunked iterator (a server-side cursor where the database supports
+        it) and encoded as they arrive, so memory use does not depend on the
+        number of tasks.
+        """
+        renderer = request.accepted_renderer
+        rows = fast.task_rows(self.get_list_queryset()).iterator(chunk_size=self.export_chunk_size)
+        
+        response = StreamingHttpResponse(
+            renderer.stream(rows, self.export_chunk_size),
+            content_type=f'{renderer.media_type}; charset={renderer.charset}',
+        )
+        response['Content-Disposition'] = f'attachment; filename="tasks.{renderer.format}"'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+    
+    @action(detail=False, methods=['post', 'patch', 'delete'], url_path='bulk')
+    def bulk(self, request, *args, **kwargs):
+        """
+        Create, update or delete up to `bulk_max_items` tasks in one request.
+        
+        - `POST`: a list of tasks to create.
+        - `PATCH`: a list of partial tasks, each with the `id` of the task to change.
+        - `DELETE`: a list of task ids.
+        
+        Ownership of all tasks is checked with one query and the writes run in
+        a single transaction, so either every item is applied or none is. On
+        failure the response is a list of per-item errors (`{}` for valid
+        items) in the order of the request.
+        """
+        data = request.data
+        if not isinstance(data, list):
+            return Response({'detail': _('Expected a list of items.')},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        if len(data) > self.bulk_max_items:
+            return Response({'detail': _('Ensure this list has no more than %(max)d items.')
+                             % {'max': self.bulk_max_items}},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        handler = {
+            'POST': self.bulk_create_tasks,
+            'PATCH': self.bulk_update_tasks,
+            'DELETE': self.bulk_destroy_tasks,
+        }[request.method]
+        
+        with transaction.atomic():
+            return handler(data)
+    
+    def bulk_create_tasks(self, data):
+        serializer = self.get_serializer(data=data, many=True)
+        if not serializer.is_valid():
+            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         
-        if done_param is not None:
-            done_param = str(done_param.capitalize())
-            queryset = queryset.filter(done=done_param)
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
+    
+    def bulk_update_tasks(self, data):
+        ids = [TaskListSerializer.get_item_pk(item) for item in data]
+        tasks = self.queryset.select_for_update().in_bulk([pk for pk in ids if pk is not None])
+        serializer = self.get_serializer(tasks, data=data, many=True, partial=True)
+        
+        valid = serializer.is_valid()
+        errors = serializer.errors if not valid else [{} for _ in data]
+        errors = self.add_duplicate_errors(ids, errors)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        serializer.save()
+        return Response(serializer.data, status=status.HTTP_200_OK)
+    
+    def bulk_destroy_tasks(self, data):
+        ids = [TaskListSerializer.get_item_pk({'id': item}) for item in data]
+        tasks = self.queryset.select_for_update().in_bulk([pk for pk in ids if pk is not None])
+        
+        errors = []
+        for pk in ids:
+            task = tasks.get(pk)
+            if task is None:
+                errors.append({'id': [_('Not found.')]})
+            elif task.owner_id != self.request.user.pk:
+                errors.append({'id': [IsOwner.message]})
+            else:
+                errors.append({})
+        
+        errors = self.add_duplicate_errors(ids, errors)
+        if any(errors):
+            return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+        
+        collector = Collector(using=self.queryset.db)
+        collector.collect(list(tasks.values()))
+        with counters.deferred():
+            collector.delete()
+        
+        return Response([{'id': pk, 'deleted': True} for pk in ids], status=status.HTTP_200_OK)
+    
+    def add_duplicate_errors(self, ids, errors):
+        seen = set()
+        errors = list(errors)
+        for index, pk in enumerate(ids):
+            if pk is not None and pk in seen and not errors[index]:
+                errors[index] = {'id': [_('Duplicate id.')]}
+            seen.add(pk)
         
-        serializer = self.serializer_class(queryset, many=True)
-        return Response(serializer.data, status.HTTP_200_OK)
+        return errors
@@ -0,0 +1,208 @@
+import threading
+import time
+from collections import OrderedDict
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.base_user import AbstractBaseUser
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken, TokenError
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import USER_FLAG_CLAIMS, StreamTicket
+
+
+User = get_user_model()
+
+
+class UserStatusCache:
+    """
+    Short-lived in-process cache of the `(is_active, is_staff, is_superuser)`
+    flags of users, `None` for users that no longer exist.
+
+    Entries are dropped as soon as the user is saved or deleted in this
+    process; other processes pick up the change when the entry expires. The
+    least recently used entries are dropped beyond
+    `JWT_USER_STATUS_CACHE_MAX_ENTRIES`.
+    """
+    
+    def __init__(self):
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    @property
+    def timeout(self):
+        return getattr(settings, 'JWT_USER_STATUS_CACHE_TIMEOUT', 30)
+    
+    @property
+    def max_entries(self):
+        return getattr(settings, 'JWT_USER_STATUS_CACHE_MAX_ENTRIES', 100000)
+    
+    def get(self, pk):
+        found, status = self._lookup(pk)
+        if found:
+            return status
+        
+        return self._store(pk, self._query(pk).first())
+    
+    async def aget(self, pk):
+        found, status = self._lookup(pk)
+        if found:
+            return status
+        
+        return self._store(pk, await self._query(pk).afirst())
+    
+    def _query(self, pk):
+        return User.objects.filter(pk=pk).values_list(*USER_FLAG_CLAIMS)
+    
+    def _lookup(self, pk):
+        with self._lock:
+            entry = self._entries.get(pk)
+            if entry is None or entry[0] <= time.monotonic():
+                return False, None
+            
+            self._entries.move_to_end(pk)
+            return True, entry[1]
+    
+    def _store(self, pk, status):
+        with self._lock:
+            self._entries.pop(pk, None)
+            while self._entries and len(self._entries) >= self.max_entries:
+                self._entries.popitem(last=False)
+            self._entries[pk] = (time.monotonic() + self.timeout, status)
+        
+        return status
+    
+    def discard(self, pk):
+        with self._lock:
+            self._entries.pop(pk, None)
+    
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+user_status_cache = UserStatusCache()
+
+
+class ClaimsUser(TokenUser):
+    """
+    Lightweight user built from the claims of a validated token.
+
+    `pk`, `is_active`, `is_staff` and `is_superuser` come from the token; any
+    other attribute (email, password, ...) loads the full user row once and is
+    read from it. Compares equal to `CustomUserModel` instances with the same pk.
+    """
+    
+    @cached_property
+    def id(self):
+        return User._meta.pk.to_python(self.token[api_settings.USER_ID_CLAIM])
+    
+    @property
+    def is_active(self):
+        return self.token.get('is_active', False)
+    
+    @property
+    def user(self):
+        if '_user' not in self.__dict__:
+            self.__dict__['_user'] = User.objects.get(pk=self.pk)
+        return self.__dict__['_user']
+    
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        return getattr(self.user, attr)
+    
+    def __eq__(self, other):
+        if isinstance(other, (TokenUser, AbstractBaseUser)):
+            return self.pk == other.pk
+        return NotImplemented
+    
+    def __hash__(self):
+        return hash(self.pk)
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that trusts the user flags carried by the token.
+
+    Tokens issued by `ClaimsTokenObtainPairSerializer` authenticate as a
+    `ClaimsUser` without a query on the user table; the flags are only
+    checked against `user_status_cache`, so deactivated, deleted, demoted or
+    promoted users are noticed within `JWT_USER_STATUS_CACHE_TIMEOUT` seconds.
+    Tokens without the claims, or whose flags no longer match, fall back to
+    loading the user like `JWTAuthentication`.
+    """
+    
+    async def aauthenticate(self, request):
+        """
+        Async counterpart of `authenticate` for Django's async views.
+        """
+        header = self.get_header(request)
+        if header is None:
+            return None
+        
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+        
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+    
+    def get_user(self, validated_token):
+        if not all(claim in validated_token for claim in USER_FLAG_CLAIMS):
+            return super().get_user(validated_token)
+        
+        user = ClaimsUser(validated_token)
+        if not self.check_status(user, user_status_cache.get(user.pk)):
+            return super().get_user(validated_token)
+        
+        return user
+    
+    async def aget_user(self, validated_token):
+        if not all(claim in validated_token for claim in USER_FLAG_CLAIMS):
+            return await sync_to_async(super().get_user)(validated_token)
+        
+        user = ClaimsUser(validated_token)
+        if not self.check_status(user, await user_status_cache.aget(user.pk)):
+            return await sync_to_async(super().get_user)(validated_token)
+        
+        return user
+    
+    def check_status(self, user, status):
+        """
+        Return True when the cached `status` matches the claims of `user`,
+        False when the user has to be loaded from the database.
+        """
+        if status is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        
+        is_active, is_staff, is_superuser = status
+        if not is_active:
+            raise AuthenticationFailed(_('User is inactive'), code='user_inactive')
+        
+        return (is_staff, is_superuser) == (user.is_staff, user.is_superuser)
+
+
+class StreamTicketAuthentication(StatelessJWTAuthentication):
+    """
+    Authentication of the task event stream: a `StreamTicket` in the
+    `ticket` query parameter, else an access token in the Authorization
+    header.
+    """
+    
+    async def aauthenticate(self, request):
+        ticket = request.GET.get('ticket')
+        if ticket is None:
+            return await super().aauthenticate(request)
+        
+        try:
+            validated_token = StreamTicket(ticket)
+        except TokenError as e:
+            raise InvalidToken({'detail': _('Invalid stream ticket.'), 'messages': [str(e)]})
+        
+        return await self.aget_user(validated_token), validated_token
@@ -0,0 +1,32 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.backends import ModelBackend
+
+from .hashing import check_user_password, make_password
+
+
+User = get_user_model()
+
+
+class PooledModelBackend(ModelBackend):
+    """
+    `ModelBackend` that verifies passwords in the `users.hashing` worker pool
+    and upgrades outdated hashes on successful logins.
+    """
+    
+    def authenticate(self, request, username=None, password=None, **kwargs):
+        if username is None:
+            username = kwargs.get(User.USERNAME_FIELD)
+        if username is None or password is None:
+            return None
+        
+        try:
+            user = User._default_manager.get_by_natural_key(username)
+        except User.DoesNotExist:
+            # Hash anyway to reduce the timing difference between existing
+            # and nonexistent users.
+            make_password(password)
+            return None
+        
+        if check_user_password(user, password) and self.user_can_authenticate(user):
+            return user
+        return None
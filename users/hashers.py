@@ -0,0 +1,66 @@
+import base64
+import hashlib
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+
+class TunableHasherMixin:
+    """
+    Takes the cost parameters of a hasher from
+    `settings.PASSWORD_HASHER_PROFILES[algorithm]['OPTIONS']`.
+
+    The algorithm names are those of Django's hashers, so stored hashes stay
+    interchangeable with them. `must_update` compares a stored hash with the
+    configured parameters, so changing them (or the profile) rehashes
+    passwords on the next successful login.
+    """
+
+    def __init__(self, **options):
+        profile = getattr(settings, 'PASSWORD_HASHER_PROFILES', {}).get(self.algorithm, {})
+        for name, value in {**profile.get('OPTIONS', {}), **options}.items():
+            if not hasattr(type(self), name):
+                raise ImproperlyConfigured(f'{type(self).__name__} has no "{name}" parameter.')
+            setattr(self, name, value)
+
+
+class PBKDF2PasswordHasher(TunableHasherMixin, hashers.PBKDF2PasswordHasher):
+    """
+    PBKDF2-SHA256 with a configurable `iterations` count.
+    """
+
+
+class ScryptPasswordHasher(TunableHasherMixin, hashers.ScryptPasswordHasher):
+    """
+    Scrypt with configurable `work_factor` (N), `block_size` (r) and
+    `parallelism` (p). Needs 128 * N * r bytes per hash.
+    """
+
+    def encode(self, password, salt, n=None, r=None, p=None):
+        self._check_encode_args(password, salt)
+        n = n or self.work_factor
+        r = r or self.block_size
+        p = p or self.parallelism
+        # hashlib refuses anything over 32 MiB unless maxmem is raised.
+        maxmem = self.maxmem or 128 * r * (n + p + 2) + 1024 * 1024
+        hash_ = hashlib.scrypt(password.encode(), salt=salt.encode(), n=n, r=r, p=p,
+                               maxmem=maxmem, dklen=64)
+        hash_ = base64.b64encode(hash_).decode('ascii').strip()
+        return '%s$%d$%s$%d$%d$%s' % (self.algorithm, n, salt, r, p, hash_)
+
+
+class Argon2PasswordHasher(TunableHasherMixin, hashers.Argon2PasswordHasher):
+    """
+    Argon2id with configurable `time_cost`, `memory_cost` (KiB) and
+    `parallelism`. Requires the `argon2-cffi` package.
+    """
+
+
+@receiver(setting_changed)
+def reset_hashers(*, setting, **kwargs):
+    if setting == 'PASSWORD_HASHER_PROFILES':
+        hashers.get_hashers.cache_clear()
+        hashers.get_hashers_by_algorithm.cache_clear()
@@ -0,0 +1,260 @@
+import functools
+import multiprocessing
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.translation import gettext_lazy as _
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+
+DEFAULTS = {
+    'WORKERS': 2,
+    'QUEUE_LIMIT': 32,
+    'TIMEOUT': 30,
+    'RETRY_AFTER': 1,
+}
+
+
+class PasswordHashingBusy(APIException):
+    """
+    Raised when the hashing pool has `WORKERS + QUEUE_LIMIT` jobs in flight.
+
+    DRF turns `wait` into a `Retry-After` header.
+    """
+
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = _('The server is busy, please try again later.')
+    default_code = 'password_hashing_busy'
+
+    def __init__(self, wait, detail=None, code=None):
+        super().__init__(detail, code)
+        self.wait = wait
+
+
+def _init_worker():
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend_drf.settings')
+    import django
+    django.setup()
+
+
+def _run(func, *args):
+    started = time.perf_counter()
+    return func(*args), time.perf_counter() - started
+
+
+class PasswordHashingPool:
+    """
+    Runs password hashing and verification in a pool of worker processes.
+
+    PBKDF2 holds a CPU for hundreds of milliseconds; in a process pool it
+    neither blocks the GIL of the request workers nor competes with them for
+    threads. At most `workers + queue_limit` jobs are accepted, further ones
+    raise `PasswordHashingBusy` at once instead of queueing without bound.
+    With `workers=0` hashing runs on the calling thread.
+
+    Workers are started with the spawn method (forking a threaded server is
+    unsafe) on the first job. Statistics are kept per process.
+    """
+
+    def __init__(self, workers=2, queue_limit=32, timeout=30, retry_after=1):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.retry_after = retry_after
+        self._executor = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._latencies = deque(maxlen=1000)
+        self._counters = {'completed': 0, 'rejected': 0, 'failed': 0}
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+            return self._executor
+
+    def make_password(self, password):
+        if password is None:
+            return hashers.make_password(None)
+        return self.submit(hashers.make_password, password)
+
+    def check_password(self, password, encoded):
+        return self.submit(hashers.check_password, password, encoded)
+
+    def make_passwords(self, passwords, chunksize=16):
+        """
+        Hash many passwords across all workers, for batch jobs.
+
+        Not subject to the queue limit, so it is meant for dedicated pools
+        (management commands), not for the one serving requests.
+        """
+        if self.workers <= 0:
+            return [hashers.make_password(password) for password in passwords]
+        return list(self.executor.map(hashers.make_password, passwords, chunksize=chunksize))
+
+    def submit(self, func, *args):
+        if self.workers <= 0:
+            return func(*args)
+
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_limit:
+                self._counters['rejected'] += 1
+                raise PasswordHashingBusy(wait=self.retry_after)
+            self._in_flight += 1
+
+        started = time.perf_counter()
+        future = None
+        try:
+            future = self.executor.submit(_run, func, *args)
+            # The slot is freed when the job ends, not when the caller stops
+            # waiting: a timed out job still occupies its worker.
+            future.add_done_callback(self._release)
+            result, run_time = future.result(self.timeout)
+        except TimeoutError:
+            future.cancel()
+            self._count('failed')
+            raise PasswordHashingBusy(wait=self.retry_after)
+        except BrokenProcessPool:
+            # A worker died; start a new pool for the next job.
+            self._count('failed')
+            self.shutdown()
+            result, run_time = _run(func, *args)
+        finally:
+            if future is None:
+                self._release()
+
+        with self._lock:
+            self._counters['completed'] += 1
+            self._latencies.append((time.perf_counter() - started, run_time))
+
+        return result
+
+    def _release(self, future=None):
+        with self._lock:
+            self._in_flight -= 1
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self):
+        """
+        Return counters, the current queue depth and latency percentiles
+        (in milliseconds) of the last 1000 jobs. `latency` is measured from
+        submission, `run` inside the worker; the difference is queueing and
+        IPC time.
+        """
+        with self._lock:
+            in_flight = self._in_flight
+            latencies = list(self._latencies)
+            counters = dict(self._counters)
+
+        return {
+            'workers': self.workers,
+            'queue_limit': self.queue_limit,
+            'in_flight': in_flight,
+            'queue_depth': max(0, in_flight - self.workers),
+            **counters,
+            'latency_ms': _percentiles([total for total, _ in latencies]),
+            'run_ms': _percentiles([run for _, run in latencies]),
+        }
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+
+    values = sorted(values)
+
+    def pick(q):
+        return round(values[min(len(values) - 1, int(q * len(values)))] * 1000, 2)
+
+    return {'p50': pick(0.5), 'p95': pick(0.95), 'p99': pick(0.99), 'max': pick(1)}
+
+
+@functools.lru_cache
+def get_hashing_pool():
+    """
+    Return the pool configured by `settings.PASSWORD_HASHING`.
+    """
+    config = {**DEFAULTS, **getattr(settings, 'PASSWORD_HASHING', {})}
+    return PasswordHashingPool(
+        workers=config['WORKERS'],
+        queue_limit=config['QUEUE_LIMIT'],
+        timeout=config['TIMEOUT'],
+        retry_after=config['RETRY_AFTER'],
+    )
+
+
+@receiver(setting_changed)
+def reset_hashing_pool(*, setting, **kwargs):
+    if setting == 'PASSWORD_HASHING':
+        get_hashing_pool().shutdown()
+        get_hashing_pool.cache_clear()
+
+
+def make_password(password):
+    return get_hashing_pool().make_password(password)
+
+
+def check_password(password, encoded):
+    return get_hashing_pool().check_password(password, encoded)
+
+
+def must_rehash(encoded):
+    """
+    Return True when `encoded` was not made by the preferred hasher with its
+    current parameters (`PASSWORD_HASHER_PROFILE`).
+    """
+    try:
+        hasher = hashers.identify_hasher(encoded)
+    except ValueError:
+        return False
+
+    preferred = hashers.get_hasher('default')
+    return hasher.algorithm != preferred.algorithm or preferred.must_update(encoded)
+
+
+def check_user_password(user, raw_password):
+    """
+    Pool-backed equivalent of `AbstractBaseUser.check_password`.
+
+    Like Django, a correct password whose hash is outdated is hashed again
+    with the current profile and saved.
+    """
+    if not check_password(raw_password, user.password):
+        return False
+
+    if must_rehash(user.password):
+        user.password = make_password(raw_password)
+        user.save(update_fields=['password'])
+
+    return True
+
+
+def set_password(user, raw_password):
+    """
+    Pool-backed equivalent of `AbstractBaseUser.set_password`.
+    """
+    user.password = make_password(raw_password)
+    user._password = raw_password
@@ -0,0 +1,45 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+
+from jobs.queue import get_jobs_config, register, report_progress
+from tasks import counters
+from tasks.models import Task
+
+
+User = get_user_model()
+
+DELETE_USER = 'users.delete'
+
+
+@register(DELETE_USER)
+def delete_user(job):
+    """
+    Delete the user `params['user_id']` and everything it owns.
+    
+    The tasks are deleted first, `JOBS['CHUNK_SIZE']` per transaction and
+    with their usual signals (counters, tombstones, cache and events), so
+    no lock is held for long; the user row goes last. A re-run continues
+    where the previous attempt stopped.
+    """
+    user_id = job.params['user_id']
+    chunk_size = get_jobs_config()['CHUNK_SIZE']
+    tasks = Task.objects.filter(owner_id=user_id)
+    
+    done = job.progress_done
+    report_progress(job, done, done + tasks.count())
+    
+    while True:
+        with transaction.atomic():
+            ids = list(tasks.order_by('id').values_list('id', flat=True)[:chunk_size])
+            if not ids:
+                break
+            with counters.deferred():
+                Task.objects.filter(pk__in=ids).delete()
+        
+        done += len(ids)
+        report_progress(job, done)
+    
+    with transaction.atomic():
+        deleted, _ = User.objects.filter(pk=user_id).delete()
+    
+    return {'tasks_deleted': done, 'user_deleted': bool(deleted)}
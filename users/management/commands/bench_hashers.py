@@ -0,0 +1,97 @@
+import json
+import os
+import statistics
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.module_loading import import_string
+
+
+class Command(BaseCommand):
+    """
+    Measure the login throughput of the password hasher profiles.
+
+    A login verifies the stored hash once, so the logins per second a core
+    can serve is the inverse of the mean `verify` time on one thread. The
+    `per host` column multiplies it by the number of CPUs, an upper bound
+    with the hashing pool sized to all of them. Cost parameters can be
+    overridden with `--option scrypt.work_factor=32768` to try values
+    before changing `PASSWORD_HASHER_PROFILES`.
+    """
+
+    help = 'Report logins per second per core for each password hasher profile.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--profile', action='append', dest='profiles',
+                            help='Profile to measure (repeatable, default all).')
+        parser.add_argument('--option', action='append', dest='overrides', default=[],
+                            help='Cost parameter override as profile.name=value (repeatable).')
+        parser.add_argument('--rounds', type=int, default=5,
+                            help='Verifications per profile (default 5).')
+        parser.add_argument('--json', action='store_true',
+                            help='Print the results as JSON.')
+
+    def handle(self, *args, **options):
+        profiles = settings.PASSWORD_HASHER_PROFILES
+        names = options['profiles'] or list(profiles)
+        unknown = set(names) - set(profiles)
+        if unknown:
+            raise CommandError(f'Unknown profiles: {", ".join(sorted(unknown))}.')
+
+        overrides = self.parse_overrides(options['overrides'])
+        results = [self.measure(name, profiles[name], overrides.get(name, {}), options['rounds'])
+                   for name in names]
+
+        if options['json']:
+            self.stdout.write(json.dumps(results, indent=2))
+            return
+
+        self.stdout.write(f'{"profile":<14} {"verify ms":>10} {"per core":>9} {"per host":>9}  parameters')
+        for result in results:
+            if result.get('error'):
+                self.stdout.write(f'{result["profile"]:<14} skipped: {result["error"]}')
+                continue
+            params = ', '.join(f'{key}={value}' for key, value in result['parameters'].items())
+            self.stdout.write(
+                f'{result["profile"]:<14} {result["verify_ms"]:>10.1f} '
+                f'{result["logins_per_core"]:>9.1f} {result["logins_per_host"]:>9.1f}  {params}'
+            )
+
+    def parse_overrides(self, values):
+        overrides = {}
+        for value in values:
+            try:
+                key, number = value.split('=', 1)
+                profile, name = key.rsplit('.', 1)
+                overrides.setdefault(profile, {})[name] = int(number)
+            except ValueError:
+                raise CommandError(f'Invalid option "{value}", expected profile.name=integer.')
+        return overrides
+
+    def measure(self, name, profile, overrides, rounds):
+        hasher_class = import_string(profile['HASHER'])
+        hasher = hasher_class(**overrides)
+        parameters = {key: getattr(hasher, key) for key in {**profile.get('OPTIONS', {}), **overrides}}
+        password = 'correct horse battery staple'
+
+        try:
+            encoded = hasher.encode(password, hasher.salt())
+        except ValueError as e:
+            # Raised by hashers whose library is not installed.
+            return {'profile': name, 'parameters': parameters, 'error': str(e)}
+
+        timings = []
+        for _ in range(rounds):
+            started = time.perf_counter()
+            hasher.verify(password, encoded)
+            timings.append(time.perf_counter() - started)
+
+        mean = statistics.mean(timings)
+        return {
+            'profile': name,
+            'parameters': parameters,
+            'verify_ms': mean * 1000,
+            'logins_per_core': 1 / mean,
+            'logins_per_host': (os.cpu_count() or 1) / mean,
+        }
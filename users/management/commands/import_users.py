@@ -0,0 +1,217 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+from pathlib import Path
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth import password_validation
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+
+from users.hashing import PasswordHashingPool
+
+
+User = get_user_model()
+
+FIELDS = ('email', 'first_name', 'last_name', 'password')
+
+
+class Command(BaseCommand):
+    """
+    Create users in bulk from a CSV or NDJSON file.
+
+    Rows carry `email`, `first_name`, `last_name` and an optional `password`
+    (users without one get an unusable password). The file is read as a
+    stream and handled in batches: every row is validated with the rules of
+    `CustomUserManager` and the password validators, the passwords of the
+    batch are hashed in parallel by a dedicated process pool and the users
+    are inserted with one `bulk_create`. Rejected rows are written, with an
+    `error` field and without the password, to the error file in the input
+    format; a batch colliding with users created concurrently is rejected
+    as a whole.
+    """
+
+    help = 'Import users from a CSV or NDJSON file.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='CSV or NDJSON file to import.')
+        parser.add_argument('--format', choices=['csv', 'ndjson'],
+                            help='Input format (default: from the file extension).')
+        parser.add_argument('--batch-size', type=int, default=500,
+                            help='Users hashed and inserted together (default 500).')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                            help='Hashing processes (default: one per CPU).')
+        parser.add_argument('--errors', help='Rejected rows file (default: <name>.errors.<ext>).')
+        parser.add_argument('--skip-password-validation', action='store_true',
+                            help='Do not run AUTH_PASSWORD_VALIDATORS.')
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.is_file():
+            raise CommandError(f'{path} does not exist.')
+
+        fmt = options['format'] or ('csv' if path.suffix.lower() == '.csv' else 'ndjson')
+        error_path = Path(options['errors'] or path.with_name(f'{path.stem}.errors{path.suffix}'))
+        self.validate_passwords = not options['skip_password_validation']
+        pool = PasswordHashingPool(workers=options['workers'])
+
+        imported = rejected = 0
+        seen = set()
+        started = time.perf_counter()
+        try:
+            with path.open(newline='', encoding='utf-8') as source, ErrorWriter(error_path, fmt) as errors:
+                rows = self.read(source, fmt)
+                while batch := list(islice(rows, options['batch_size'])):
+                    users = []
+                    for row, error in batch:
+                        error = error or self.clean(row, seen)
+                        if error:
+                            errors.write(row, error)
+                            rejected += 1
+                        else:
+                            users.append(row)
+
+                    created = self.insert(users, pool, errors)
+                    imported += created
+                    rejected += len(users) - created
+                    if options['verbosity'] > 0:
+                        self.report(imported, rejected, started)
+        finally:
+            pool.shutdown()
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {imported} users, rejected {rejected} rows in {elapsed:.1f}s '
+            f'({(imported + rejected) / elapsed if elapsed else 0:.0f} rows/s).'
+        ))
+        if rejected:
+            self.stdout.write(f'Rejected rows were written to {error_path}.')
+
+    def read(self, source, fmt):
+        """
+        Yield `(row, error)` pairs, `error` being set for unreadable rows.
+        """
+        if fmt == 'csv':
+            reader = csv.DictReader(source)
+            missing = {'email', 'first_name', 'last_name'} - set(reader.fieldnames or ())
+            if missing:
+                raise CommandError(f'Missing CSV columns: {", ".join(sorted(missing))}.')
+            for row in reader:
+                yield row, None
+            return
+
+        for line in source:
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                yield {'line': line.rstrip('\n')}, 'Invalid JSON.'
+                continue
+            if not isinstance(row, dict):
+                yield {'line': line.rstrip('\n')}, 'Expected a JSON object.'
+                continue
+            yield row, None
+
+    def clean(self, row, seen):
+        """
+        Validate `row` in place and return an error message or None.
+        """
+        for field in FIELDS:
+            if row.get(field) is not None and not isinstance(row[field], str):
+                return f'The {field} must be a string.'
+
+        try:
+            row['email'] = User.objects.clean_user_fields(
+                row.get('first_name'), row.get('last_name'), row.get('email'))
+        except ValueError as e:
+            return str(e)
+        except ValidationError as e:
+            return ' '.join(e.messages)
+
+        if row['email'] in seen:
+            return 'Duplicate email in the file.'
+        seen.add(row['email'])
+
+        password = row.get('password') or None
+        row['password'] = password
+        if password is not None and self.validate_passwords:
+            user = User(email=row['email'], first_name=row['first_name'], last_name=row['last_name'])
+            try:
+                password_validation.validate_password(password, user)
+            except ValidationError as e:
+                return ' '.join(e.messages)
+
+        return None
+
+    def insert(self, rows, pool, errors):
+        """
+        Hash the passwords of `rows` and insert the users; return the number
+        of users created.
+        """
+        existing = set(
+            User.objects.filter(email__in=[row['email'] for row in rows]).values_list('email', flat=True)
+        )
+        for row in rows:
+            if row['email'] in existing:
+                errors.write(row, 'A user with this email already exists.')
+        rows = [row for row in rows if row['email'] not in existing]
+
+        passwords = pool.make_passwords([row['password'] for row in rows])
+        users = [
+            User(email=row['email'], first_name=row['first_name'], last_name=row['last_name'],
+                 password=password)
+            for row, password in zip(rows, passwords)
+        ]
+        try:
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+        except IntegrityError:
+            # An email of the batch was inserted by another process meanwhile.
+            for row in rows:
+                errors.write(row, 'The batch was rejected: one of its emails was created concurrently.')
+            return 0
+
+        return len(users)
+
+    def report(self, imported, rejected, started):
+        elapsed = time.perf_counter() - started
+        self.stdout.write(f'{imported} imported, {rejected} rejected, '
+                          f'{(imported + rejected) / elapsed:.0f} rows/s')
+
+
+class ErrorWriter:
+    """
+    Writes rejected rows with an `error` field, opening the file on the first one.
+    """
+
+    def __init__(self, path, fmt):
+        self.path = path
+        self.fmt = fmt
+        self.file = None
+        self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.file is not None:
+            self.file.close()
+
+    def write(self, row, error):
+        row = {key: value for key, value in row.items() if key != 'password'}
+        row['error'] = error
+        if self.file is None:
+            self.file = self.path.open('w', newline='', encoding='utf-8')
+            if self.fmt == 'csv':
+                self.writer = csv.DictWriter(self.file, fieldnames=[*FIELDS[:-1], 'error'],
+                                             extrasaction='ignore')
+                self.writer.writeheader()
+
+        if self.fmt == 'csv':
+            self.writer.writerow(row)
+        else:
+            self.file.write(json.dumps(row, ensure_ascii=False) + '\n')
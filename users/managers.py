@@ -2,37 +2,41 @@ from django.contrib.auth.base_user import BaseUserManager
 from django.core.validators import validate_email
 from django.utils.translation import gettext_lazy as _
 
+from .hashing import set_password
+
 
 class CustomUserManager(BaseUserManager):
     """
     Custom manager for the CustomUserModel.
 
     Methods:
+        clean_user_fields: Validates the required fields and normalizes the email.
         create_user: Creates a basic user with required fields and default permissions.
         create_superuser: Creates a superuser with additional staff and superuser permissions.
         update_user: Updates the user's attributes and password.
 
+    Passwords are hashed in the worker pool of `users.hashing`.
+
     Notes:
         This manager provides methods for creating, updating, and managing users.
         It handles field validations and necessary checks while creating or updating users.
     """
            
-    def create_user(self, first_name, last_name, email, password, **extra_fields):
+    def clean_user_fields(self, first_name, last_name, email):
         """
-        Create a basic user.
+        Validate the required user fields.
 
         Args:
             first_name (str): The user's first name.
             last_name (str): The user's last name.
             email (str): The user's email address.
-            password (str): The user's password.
-            **extra_fields: Additional fields for user creation.
 
         Returns:
-            User: The created user object.
+            str: The normalized email address.
 
         Raises:
             ValueError: If required fields are missing.
+            ValidationError: If the email address is invalid.
         """
         
         if email:
@@ -46,6 +50,29 @@ class CustomUserManager(BaseUserManager):
         
         if not last_name:
             raise ValueError(_('Users must submit a last name'))
+        
+        return email
+    
+    
+    def create_user(self, first_name, last_name, email, password, **extra_fields):
+        """
+        Create a basic user.
+
+        Args:
+            first_name (str): The user's first name.
+            last_name (str): The user's last name.
+            email (str): The user's email address.
+            password (str): The user's password.
+            **extra_fields: Additional fields for user creation.
+
+        Returns:
+            User: The created user object.
+
+        Raises:
+            ValueError: If required fields are missing.
+        """
+        
+        email = self.clean_user_fields(first_name, last_name, email)
                 
         extra_fields.setdefault('is_staff', False)
         extra_fields.setdefault('is_superuser', False)
@@ -58,7 +85,7 @@ class CustomUserManager(BaseUserManager):
             **extra_fields
         )
         
-        user.set_password(password)
+        set_password(user, password)
         
         user.save()
         return user
@@ -120,7 +147,7 @@ class CustomUserManager(BaseUserManager):
         """
         
         if password is not None:
-            user.set_password(password)
+            set_password(user, password)
 
         for field, value in extra_fields.items():
             setattr(user, field, value)
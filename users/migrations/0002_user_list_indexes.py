@@ -0,0 +1,38 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:18
+
+from django.db import migrations, models
+import django.db.models.functions.text
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='customusermodel',
+            index=models.Index(fields=['date_joined', 'id'], name='users_joined_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customusermodel',
+            index=models.Index(fields=['is_active', 'date_joined', 'id'], name='users_active_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customusermodel',
+            index=models.Index(fields=['is_staff', 'date_joined', 'id'], name='users_staff_joined_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customusermodel',
+            index=models.Index(django.db.models.functions.text.Lower('email'), name='users_email_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customusermodel',
+            index=models.Index(django.db.models.functions.text.Lower('first_name'), name='users_first_name_lower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='customusermodel',
+            index=models.Index(django.db.models.functions.text.Lower('last_name'), name='users_last_name_lower_idx'),
+        ),
+    ]
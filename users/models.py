@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import AbstractBaseUser, PermissionsMixin
 from django.utils.translation import gettext_lazy as _
 
@@ -48,6 +49,14 @@ class CustomUserModel(AbstractBaseUser, PermissionsMixin):
     class Meta:
         verbose_name = _('User')
         verbose_name_plural = _('Users')
+        indexes = [
+            models.Index(fields=['date_joined', 'id'], name='users_joined_id_idx'),
+            models.Index(fields=['is_active', 'date_joined', 'id'], name='users_active_joined_idx'),
+            models.Index(fields=['is_staff', 'date_joined', 'id'], name='users_staff_joined_idx'),
+            models.Index(Lower('email'), name='users_email_lower_idx'),
+            models.Index(Lower('first_name'), name='users_first_name_lower_idx'),
+            models.Index(Lower('last_name'), name='users_last_name_lower_idx'),
+        ]
     
     
     def __str__(self):
@@ -0,0 +1,9 @@
+from backend_drf.pagination import KeysetPagination
+
+
+class UserKeysetPagination(KeysetPagination):
+    """
+    Keyset pagination for users on `(date_joined, id)`.
+    """
+
+    ordering = ('date_joined', 'id')
@@ -1,7 +1,23 @@
 from rest_framework.permissions import BasePermission
 
 
-class IsOwner(BasePermission):
+class AsyncPermissionMixin:
+    """
+    Adds awaitable `ahas_permission`/`ahas_object_permission` checks for the
+    async views.
+
+    The checks only read the request user and the object, so they run
+    inline instead of taking a `sync_to_async` hop.
+    """
+    
+    async def ahas_permission(self, request, view):
+        return self.has_permission(request, view)
+    
+    async def ahas_object_permission(self, request, view, obj):
+        return self.has_object_permission(request, view, obj)
+
+
+class IsOwner(AsyncPermissionMixin, BasePermission):
     """
     Custom permission to only allow access to the owner of the object.
     """
@@ -10,13 +26,13 @@ class IsOwner(BasePermission):
     
     def has_object_permission(self, request, view, obj):
         
-        if hasattr(obj, 'owner'):
-            return request.user == obj.owner
+        if hasattr(obj, 'owner_id'):
+            return request.user.pk == obj.owner_id
         
         return request.user == obj
 
 
-class IsOwnerOrAdmin(BasePermission):
+class IsOwnerOrAdmin(AsyncPermissionMixin, BasePermission):
     """
     Custom permission to allow access to the owner of the object or an admin user.
     """
@@ -24,7 +40,7 @@ class IsOwnerOrAdmin(BasePermission):
     message = 'You do not have permission to perform this action.'
     
     def has_object_permission(self, request, view, obj):
-        if hasattr(obj, 'owner'):
-            return (request.user == obj.owner or request.user.is_superuser)
+        if hasattr(obj, 'owner_id'):
+            return (request.user.pk == obj.owner_id or request.user.is_superuser)
         
         return (request.user == obj or request.user.is_superuser)
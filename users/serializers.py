@@ -1,14 +1,16 @@
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 from django.contrib.auth.password_validation import validate_password
-from django.contrib.auth.hashers import check_password
 from rest_framework import serializers
 
+from .hashing import check_password, set_password
+from backend_drf.metrics import MeasuredSerializerMixin
+
 
 User = get_user_model()
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for User model.
     """
@@ -55,7 +57,19 @@ class UserSerializer(serializers.ModelSerializer):
         return user
 
 
-class UserChangePassworSerializer(serializers.ModelSerializer):
+class UserTaskCountsSerializer(UserSerializer):
+    """
+    User serializer adding the total and open task counts of the user,
+    annotated by `tasks.counters.annotate_users`.
+    """
+    tasks_total = serializers.IntegerField(read_only=True)
+    tasks_open = serializers.IntegerField(read_only=True)
+    
+    class Meta(UserSerializer.Meta):
+        fields = UserSerializer.Meta.fields + ('tasks_total', 'tasks_open')
+
+
+class UserChangePassworSerializer(MeasuredSerializerMixin, serializers.ModelSerializer):
     """
     Serializer for changing a user's password.
     """
@@ -86,7 +100,7 @@ class UserChangePassworSerializer(serializers.ModelSerializer):
 
 
     def update(self, instance, validated_data):
-        instance.set_password(validated_data['new_password'])
+        set_password(instance, validated_data['new_password'])
         instance.save()
         
         return instance
@@ -0,0 +1,14 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .authentication import user_status_cache
+
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def discard_user_status(sender, instance, **kwargs):
+    user_status_cache.discard(instance.pk)
@@ -1,11 +1,33 @@
-from django.test import TestCase
+import csv
+import json
+import tempfile
+import time
+from datetime import timedelta
+from io import StringIO
+from pathlib import Path
+from unittest.mock import patch
+
+from django.conf import settings
+from django.core.management import call_command
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
-from rest_framework.test import APIRequestFactory
+from django.contrib.auth.hashers import check_password as django_check_password
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, APITestCase
 from rest_framework import status
 from rest_framework.test import force_authenticate
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .views import UserApiViewSet, UserChangePasswordApiView
+from backend_drf.query_budget import QueryBudgetTestMixin
+from backend_drf.throttling import get_bucket_store
+from jobs.models import Job
+from jobs.queue import run_pending
+from tasks import counters
+from tasks.models import Task
+from .authentication import ClaimsUser, user_status_cache
+from .hashing import PasswordHashingBusy, PasswordHashingPool, check_password, get_hashing_pool, make_password
+from .views import UserApiViewSet, UserChangePasswordApiView, filter_user_list
 
 
 User = get_user_model()
@@ -132,6 +154,28 @@ class UserApiViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data['email'], user.email)
     
+    def test_retrieve_user_not_modified(self):
+        user, _ = self.user_token_resp(self.user_1)
+        
+        request = self.factory.get('/users/1/')
+        force_authenticate(request, user=user)
+        response = self.view(request, pk=user.pk)
+        
+        request = self.factory.get('/users/1/', HTTP_IF_NONE_MATCH=response['ETag'])
+        force_authenticate(request, user=user)
+        not_modified = self.view(request, pk=user.pk)
+        
+        self.assertEqual(not_modified.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(not_modified['ETag'], response['ETag'])
+        
+        User.objects.filter(pk=user.pk).update(first_name='Changed')
+        request = self.factory.get('/users/1/', HTTP_IF_NONE_MATCH=response['ETag'])
+        force_authenticate(request, user=user)
+        changed = self.view(request, pk=user.pk)
+        
+        self.assertEqual(changed.status_code, status.HTTP_200_OK)
+        self.assertEqual(changed.data['first_name'], 'Changed')
+    
     def test_false_retrieve_user(self):
         self.user_create(self.user_1)
         user_2, response_token = self.user_token_resp(self.user_2)
@@ -202,7 +246,10 @@ class UserApiViewSetTestCase(TestCase):
         force_authenticate(request, user=user, token=token)
         response = self.view(request, pk=1)
         
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertFalse(User.objects.get(pk=1).is_active)
+        
+        run_pending()
         check_user = User.objects.filter(pk=1).exists()
         self.assertEqual(check_user, False)
     
@@ -215,7 +262,11 @@ class UserApiViewSetTestCase(TestCase):
         force_authenticate(request, user=admin, token=token)
         response = self.view(request, pk=1)
         
-        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(response.data['status'], Job.QUEUED)
+        self.assertTrue(response['Location'].endswith(f'/api/jobs/{response.data["id"]}/'))
+        
+        run_pending()
         check_user = User.objects.filter(pk=1).exists()
         self.assertEqual(check_user, False)
     
@@ -231,3 +282,429 @@ class UserApiViewSetTestCase(TestCase):
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
         check_user = User.objects.filter(pk=1).exists()
         self.assertEqual(check_user, True)
+
+
+class StatelessJWTAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        user_status_cache.clear()
+        self.password = 'testpassword'
+        self.user = User.objects.create_user('F_name', 'L_name', 'user@example.com', self.password)
+    
+    def obtain_access_token(self):
+        response = self.client.post('/api/token/', {'email': self.user.email,
+                                                    'password': self.password})
+        return response.data['access']
+    
+    def test_token_carries_user_flags(self):
+        token = AccessToken(self.obtain_access_token())
+        
+        self.assertEqual(token['is_active'], True)
+        self.assertEqual(token['is_staff'], False)
+        self.assertEqual(token['is_superuser'], False)
+    
+    def test_authentication_skips_user_lookup(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.obtain_access_token()}')
+        self.client.get(f'/api/users/{self.user.pk}/')
+        
+        with self.assertNumQueries(1):
+            response = self.client.get(f'/api/users/{self.user.pk}/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['email'], self.user.email)
+    
+    def test_claims_user_loads_full_row_lazily(self):
+        token = AccessToken(self.obtain_access_token())
+        user = ClaimsUser(token)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(user, self.user)
+            self.assertFalse(user.is_superuser)
+        
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, self.user.email)
+            self.assertEqual(user.first_name, self.user.first_name)
+    
+    def test_deactivated_user_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.obtain_access_token()}')
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(f'/api/users/{self.user.pk}/')
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_changed_flags_fall_back_to_database(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {self.obtain_access_token()}')
+        User.objects.filter(pk=self.user.pk).update(is_staff=True)
+        user_status_cache.clear()
+        response = self.client.get('/api/users/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+    
+    @override_settings(JWT_USER_STATUS_CACHE_MAX_ENTRIES=2)
+    def test_status_cache_drops_least_recently_used_users(self):
+        other = User.objects.create_user('F_name', 'L_name', 'other@example.com', self.password)
+        third = User.objects.create_user('F_name', 'L_name', 'third@example.com', self.password)
+        user_status_cache.clear()
+        user_status_cache.get(self.user.pk)
+        user_status_cache.get(other.pk)
+        user_status_cache.get(self.user.pk)
+        user_status_cache.get(third.pk)
+        
+        with self.assertNumQueries(0):
+            self.assertEqual(user_status_cache.get(self.user.pk), (True, False, False))
+            self.assertEqual(user_status_cache.get(third.pk), (True, False, False))
+        
+        with self.assertNumQueries(1):
+            user_status_cache.get(other.pk)
+
+
+@override_settings(PASSWORD_HASHING={'WORKERS': 1, 'QUEUE_LIMIT': 1})
+class PasswordHashingPoolTestCase(APITestCase):
+    def setUp(self):
+        self.pool = get_hashing_pool()
+    
+    def test_hashes_in_worker_processes(self):
+        completed = self.pool.stats()['completed']
+        encoded = make_password('testpassword')
+        
+        self.assertTrue(django_check_password('testpassword', encoded))
+        self.assertTrue(check_password('testpassword', encoded))
+        self.assertFalse(check_password('wrongpassword', encoded))
+        self.assertEqual(self.pool.stats()['completed'], completed + 3)
+        self.assertIsNotNone(self.pool.stats()['latency_ms']['p50'])
+    
+    def test_saturated_pool_rejects_signup(self):
+        self.pool._in_flight = self.pool.workers + self.pool.queue_limit
+        try:
+            response = self.client.post('/api/users/', {
+                'email': 'user@example.com',
+                'first_name': 'F_name',
+                'last_name': 'L_name',
+                'password': 'testpassword',
+                're_password': 'testpassword',
+            })
+        finally:
+            self.pool._in_flight = 0
+        
+        self.assertEqual(response.status_code, status.HTTP_503_SERVICE_UNAVAILABLE)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertFalse(User.objects.exists())
+        self.assertGreaterEqual(self.pool.stats()['rejected'], 1)
+    
+    def test_timed_out_job_holds_its_slot_until_done(self):
+        pool = PasswordHashingPool(workers=1, queue_limit=0, timeout=0.01)
+        self.addCleanup(pool.shutdown)
+        
+        with self.assertRaises(PasswordHashingBusy):
+            pool.submit(time.sleep, 0.5)
+        self.assertEqual(pool.stats()['in_flight'], 1)
+        with self.assertRaises(PasswordHashingBusy):
+            pool.submit(time.sleep, 0)
+        
+        deadline = time.monotonic() + 30
+        while pool.stats()['in_flight'] and time.monotonic() < deadline:
+            time.sleep(0.05)
+        self.assertEqual(pool.stats()['in_flight'], 0)
+    
+    def test_stats_are_admin_only(self):
+        user = User.objects.create_user('F_name', 'L_name', 'user@example.com', 'testpassword')
+        admin = User.objects.create_superuser('F_name', 'L_name', 'admin@example.com', 'testpassword')
+        
+        self.client.force_authenticate(user)
+        self.assertEqual(self.client.get('/api/users/password-hashing/').status_code,
+                         status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(admin)
+        response = self.client.get('/api/users/password-hashing/')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['queue_depth'], 0)
+
+
+@override_settings(PASSWORD_HASHING={'WORKERS': 0})
+class PasswordHashUpgradeTestCase(APITestCase):
+    def setUp(self):
+        fast_profiles = {**settings.PASSWORD_HASHER_PROFILES,
+                         'pbkdf2_sha256': {'HASHER': 'users.hashers.PBKDF2PasswordHasher',
+                                           'OPTIONS': {'iterations': 1000}}}
+        with override_settings(PASSWORD_HASHER_PROFILES=fast_profiles):
+            self.user = User.objects.create_user('F_name', 'L_name', 'user@example.com', 'testpassword')
+    
+    def login(self, password='testpassword'):
+        return self.client.post('/api/token/', {'email': self.user.email, 'password': password})
+    
+    def test_outdated_parameters_are_upgraded_on_login(self):
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$1000$'))
+        
+        response = self.login()
+        self.user.refresh_from_db()
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(self.user.password.startswith('pbkdf2_sha256$600000$'))
+    
+    def test_profile_switch_rehashes_on_login(self):
+        with override_settings(PASSWORD_HASHERS=['users.hashers.ScryptPasswordHasher',
+                                                 'users.hashers.PBKDF2PasswordHasher']):
+            response = self.login()
+            self.user.refresh_from_db()
+            
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertTrue(self.user.password.startswith('scrypt$16384$'))
+            self.assertEqual(self.login().status_code, status.HTTP_200_OK)
+    
+    def test_failed_login_keeps_hash(self):
+        password = self.user.password
+        response = self.login('wrongpassword')
+        self.user.refresh_from_db()
+        
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.user.password, password)
+
+
+@override_settings(PASSWORD_HASHING={'WORKERS': 0})
+@override_settings(PASSWORD_HASHING={'WORKERS': 0}, THROTTLING={'SCOPES': {
+    'login': {'RATE': '3/m'}, 'login_account': {'RATE': '2/m'}, 'password': {'RATE': '1/m'}}})
+class ThrottlingTestCase(APITestCase):
+    def setUp(self):
+        get_bucket_store().clear()
+        self.user = User.objects.create_user('F_name', 'L_name', 'user@example.com', 'testpassword')
+    
+    def login(self, email, address='10.0.0.1'):
+        return self.client.post('/api/token/', {'email': email, 'password': 'wrongpassword'},
+                                REMOTE_ADDR=address)
+    
+    def test_login_is_limited_per_account(self):
+        statuses = [self.login('User@example.com', f'10.0.0.{i}').status_code for i in range(3)]
+        
+        self.assertEqual(statuses, [401, 401, 429])
+        self.assertEqual(self.login('other@example.com', '10.0.0.9').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_only_failed_logins_charge_the_account(self):
+        for i in range(3):
+            response = self.client.post('/api/token/', {'email': 'user@example.com', 'password': 'testpassword'},
+                                        REMOTE_ADDR=f'10.0.1.{i}')
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(self.login('user@example.com', '10.0.2.1').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('user@example.com', '10.0.2.2').status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertEqual(self.login('user@example.com', '10.0.2.3').status_code,
+                         status.HTTP_429_TOO_MANY_REQUESTS)
+    
+    def test_login_is_limited_per_address(self):
+        statuses = [self.login(f'user_{i}@example.com').status_code for i in range(4)]
+        response = self.login('user@example.com')
+        
+        self.assertEqual(statuses, [401, 401, 401, 429])
+        self.assertTrue(0 < int(response['Retry-After']) <= 20)
+        self.assertEqual(self.login('user@example.com', '10.0.0.2').status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_change_password_has_its_own_scope(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.user).access_token}')
+        url = f'/api/users/{self.user.pk}/change-password/'
+        data = {'current_password': 'wrongpassword', 'new_password': 'newpassword1',
+                're_new_password': 'newpassword1'}
+        
+        self.assertEqual(self.client.patch(url, data).status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(self.client.patch(url, data).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(self.client.patch(f'/api/users/{self.user.pk}/', {'first_name': 'New'}).status_code,
+                         status.HTTP_200_OK)
+
+
+class UserListApiTestCase(APITestCase):
+    def setUp(self):
+        self.admin = User.objects.create_superuser('Admin', 'Root', 'admin@example.com', 'testpassword')
+        self.alice = User.objects.create_user('Alice', 'Smith', 'alice@example.com', None)
+        self.bob = User.objects.create_user('Bob', 'Stone', 'bob@example.com', None, is_active=False)
+        self.carol = User.objects.create_user('Carol', 'Brown', 'carol@work.example.com', None, is_staff=True)
+        User.objects.filter(pk=self.alice.pk).update(date_joined=timezone.now() - timedelta(days=30))
+        
+        Task.objects.bulk_create([Task(owner=self.bob, title='task', done=i < 2) for i in range(5)])
+        counters.repair()
+        
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.admin).access_token}')
+    
+    def get_emails(self, params):
+        response = self.client.get('/api/users/', params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [user['email'] for user in response.data['results']]
+    
+    def test_filters(self):
+        self.assertEqual(self.get_emails({'is_active': 'false'}), ['bob@example.com'])
+        self.assertEqual(self.get_emails({'is_staff': 'true'}), ['admin@example.com', 'carol@work.example.com'])
+        
+        since = (timezone.now() - timedelta(days=1)).date().isoformat()
+        self.assertNotIn('alice@example.com', self.get_emails({'joined_after': since}))
+        self.assertEqual(self.get_emails({'joined_before': since}), ['alice@example.com'])
+    
+    def test_search_by_prefix(self):
+        self.assertEqual(self.get_emails({'q': 'CAR'}), ['carol@work.example.com'])
+        self.assertEqual(self.get_emails({'q': 'st'}), ['bob@example.com'])
+        self.assertEqual(self.get_emails({'q': 'alice smi'}), ['alice@example.com'])
+        self.assertEqual(self.get_emails({'q': 'example'}), [])
+    
+    def test_invalid_filters(self):
+        for params in ({'is_active': 'maybe'}, {'joined_after': 'yesterday'}, {'task_counts': 'yes please'}):
+            response = self.client.get('/api/users/', params)
+            
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+    
+    def test_task_counts(self):
+        response = self.client.get('/api/users/', {'task_counts': 'true'})
+        counts = {user['email']: (user['tasks_total'], user['tasks_open']) for user in response.data['results']}
+        
+        self.assertEqual(counts['bob@example.com'], (5, 3))
+        self.assertEqual(counts['alice@example.com'], (0, 0))
+        self.assertNotIn('tasks_total', self.client.get('/api/users/').data['results'][0])
+    
+    def test_keyset_pagination(self):
+        response = self.client.get('/api/users/', {'limit': 2})
+        emails = [user['email'] for user in response.data['results']]
+        
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            emails += [user['email'] for user in response.data['results']]
+        
+        self.assertEqual(emails, list(User.objects.order_by('date_joined', 'id').values_list('email', flat=True)))
+        self.assertEqual(emails[0], 'alice@example.com')
+    
+    def test_list_queries_use_indexes(self):
+        queryset = filter_user_list(User.objects.all(), {'q': 'al', 'is_active': 'true'})
+        plan = queryset.order_by('date_joined', 'id').explain()
+        
+        self.assertNotRegex(plan, r'SCAN users_customusermodel\b(?! USING)')
+    
+    def test_list_is_admin_only(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(self.alice).access_token}')
+        response = self.client.get('/api/users/')
+        
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(PASSWORD_HASHING={'WORKERS': 0})
+class UserQueryBudgetTestCase(QueryBudgetTestMixin, APITestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('F_name', 'L_name', 'user@example.com', 'testpassword')
+        self.admin = User.objects.create_superuser('F_name', 'L_name', 'admin@example.com', 'testpassword')
+    
+    def seed(self, n):
+        """
+        Bring the database to `n` users besides the admin.
+        """
+        count = User.objects.filter(is_superuser=False).count()
+        User.objects.bulk_create(
+            User(email=f'seed_{i}@example.com', first_name='F_name', last_name='L_name')
+            for i in range(count, n)
+        )
+    
+    def authenticate(self, user):
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(user).access_token}')
+    
+    def test_list_and_retrieve(self):
+        self.authenticate(self.admin)
+        self.assertQueryBudget(UserApiViewSet, 'list',
+                               lambda: self.client.get('/api/users/', {'limit': 1000}), self.seed)
+        self.assertQueryBudget(UserApiViewSet, 'list', lambda: self.client.get(
+            '/api/users/', {'limit': 1000, 'task_counts': 'true', 'q': 'seed'}), self.seed)
+        
+        self.authenticate(self.user)
+        self.assertQueryBudget(UserApiViewSet, 'retrieve',
+                               lambda: self.client.get(f'/api/users/{self.user.pk}/'), self.seed)
+    
+    def test_change_password(self):
+        passwords = ['testpassword', 'newpassword1', 'newpassword2', 'newpassword3']
+        
+        def change_password():
+            current, new = passwords.pop(0), passwords[0]
+            return self.client.patch(f'/api/users/{self.user.pk}/change-password/', {
+                'current_password': current, 'new_password': new, 're_new_password': new})
+        
+        self.authenticate(self.user)
+        self.assertQueryBudget(UserChangePasswordApiView, 'patch', change_password, self.seed)
+
+
+class ImportUsersCommandTestCase(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        User.objects.create_user('F_name', 'L_name', 'existing@example.com', None)
+    
+    def write(self, name, content):
+        path = Path(self.directory.name) / name
+        path.write_text(content, encoding='utf-8')
+        return path
+    
+    def test_import_csv(self):
+        path = self.write('users.csv', (
+            'email,first_name,last_name,password\n'
+            'user_1@EXAMPLE.com,F_name,L_name,Str0ng-passw0rd\n'
+            'user_2@example.com,F_name,L_name,\n'
+            'not-an-email,F_name,L_name,Str0ng-passw0rd\n'
+            'user_3@example.com,,L_name,Str0ng-passw0rd\n'
+            'user_4@example.com,F_name,L_name,password\n'
+            'user_1@example.com,F_name,L_name,Str0ng-passw0rd\n'
+            'existing@example.com,F_name,L_name,Str0ng-passw0rd\n'
+        ))
+        out = StringIO()
+        call_command('import_users', str(path), '--workers', '1', '--batch-size', '3', stdout=out)
+        
+        user_1 = User.objects.get(email='user_1@example.com')
+        self.assertTrue(user_1.check_password('Str0ng-passw0rd'))
+        self.assertFalse(User.objects.get(email='user_2@example.com').has_usable_password())
+        self.assertEqual(User.objects.count(), 3)
+        self.assertIn('Imported 2 users, rejected 5 rows', out.getvalue())
+        
+        with open(Path(self.directory.name) / 'users.errors.csv', newline='') as errors:
+            rows = list(csv.DictReader(errors))
+        self.assertEqual([row['email'] for row in rows],
+                         ['not-an-email', 'user_3@example.com', 'user_4@example.com',
+                          'user_1@example.com', 'existing@example.com'])
+        self.assertNotIn('password', rows[0])
+    
+    def test_import_ndjson(self):
+        path = self.write('users.ndjson', (
+            '{"email": "user@example.com", "first_name": "F_name", "last_name": "L_name", "password": "password"}\n'
+            'not json\n'
+        ))
+        call_command('import_users', str(path), '--workers', '0', '--skip-password-validation',
+                     '--errors', str(Path(self.directory.name) / 'rejected.ndjson'), verbosity=0,
+                     stdout=StringIO())
+        
+        self.assertTrue(User.objects.get(email='user@example.com').check_password('password'))
+        with open(Path(self.directory.name) / 'rejected.ndjson') as errors:
+            self.assertEqual(json.loads(errors.read()), {'line': 'not json', 'error': 'Invalid JSON.'})
+    
+    def test_import_rejects_non_string_fields(self):
+        path = self.write('users.ndjson', (
+            '{"email": 123, "first_name": "F_name", "last_name": "L_name"}\n'
+            '{"email": "user@example.com", "first_name": "F_name", "last_name": "L_name", "password": 12345678}\n'
+            '{"email": "other@example.com", "first_name": ["F_name"], "last_name": "L_name"}\n'
+        ))
+        call_command('import_users', str(path), '--workers', '0', verbosity=0, stdout=StringIO())
+        
+        self.assertEqual(User.objects.count(), 1)
+        with open(Path(self.directory.name) / 'users.errors.ndjson') as errors:
+            self.assertEqual([json.loads(line)['error'] for line in errors],
+                             ['The email must be a string.', 'The password must be a string.',
+                              'The first_name must be a string.'])
+    
+    def test_import_rejects_batch_with_concurrent_insert(self):
+        path = self.write('users.ndjson', (
+            '{"email": "user_1@example.com", "first_name": "F_name", "last_name": "L_name"}\n'
+            '{"email": "user_2@example.com", "first_name": "F_name", "last_name": "L_name"}\n'
+            '{"email": "user_3@example.com", "first_name": "F_name", "last_name": "L_name"}\n'
+        ))
+        make_passwords = PasswordHashingPool.make_passwords
+        
+        def make_passwords_racing(pool, passwords):
+            if not User.objects.filter(email='user_2@example.com').exists():
+                User.objects.create_user('F_name', 'L_name', 'user_2@example.com', None)
+            return make_passwords(pool, passwords)
+        
+        out = StringIO()
+        with patch.object(PasswordHashingPool, 'make_passwords', make_passwords_racing):
+            call_command('import_users', str(path), '--workers', '0', '--batch-size', '2',
+                         verbosity=0, stdout=out)
+        
+        self.assertIn('Imported 1 users, rejected 2 rows', out.getvalue())
+        self.assertTrue(User.objects.filter(email='user_3@example.com').exists())
+        self.assertFalse(User.objects.filter(email='user_1@example.com').exists())
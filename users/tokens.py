@@ -0,0 +1,55 @@
+from datetime import timedelta
+
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.tokens import RefreshToken, Token
+
+
+USER_FLAG_CLAIMS = ('is_active', 'is_staff', 'is_superuser')
+
+
+class ClaimsRefreshToken(RefreshToken):
+    """
+    Refresh token carrying the user's `is_active`, `is_staff` and
+    `is_superuser` flags as claims.
+
+    Access tokens derived from it copy the claims, which lets
+    `StatelessJWTAuthentication` authorize requests without loading the user.
+    """
+    
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_FLAG_CLAIMS:
+            token[claim] = getattr(user, claim)
+        
+        return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """
+    Token pair serializer issuing `ClaimsRefreshToken`s.
+    """
+    
+    token_class = ClaimsRefreshToken
+
+
+class StreamTicket(Token):
+    """
+    Short-lived token opening the task event stream, passed as the `ticket`
+    query parameter by clients that cannot send an Authorization header
+    (the browser `EventSource`).
+    
+    Its own token type keeps it from being accepted as an access token, and
+    its lifetime bounds the harm of it being logged with the URL.
+    """
+    
+    token_type = 'stream_ticket'
+    lifetime = timedelta(seconds=60)
+    
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim in USER_FLAG_CLAIMS:
+            token[claim] = getattr(user, claim)
+        
+        return token
@@ -1,36 +1,180 @@
+from datetime import datetime, time
+
+from rest_framework.decorators import action
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.views import APIView
 from rest_framework import permissions, status
+from rest_framework.exceptions import AuthenticationFailed, ValidationError
 from rest_framework.response import Response
+from rest_framework.reverse import reverse
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.db.models.functions import Lower
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
 from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.views import TokenObtainPairView
 
-from .serializers import UserSerializer, UserChangePassworSerializer
+from .hashing import get_hashing_pool
+from .jobs import DELETE_USER
+from .pagination import UserKeysetPagination
+from .serializers import UserSerializer, UserChangePassworSerializer, UserTaskCountsSerializer
 from .permissions import IsOwner, IsOwnerOrAdmin
+from backend_drf.conditional import ConditionalGetMixin, make_etag
+from backend_drf.query_budget import query_budget
+from backend_drf.replicas import ReplicaReadMixin
+from backend_drf.throttling import LoginThrottle
+from jobs.queue import enqueue
+from jobs.serializers import JobSerializer
+from tasks.counters import annotate_users
 
 
 User = get_user_model()
 
+BOOLEAN_VALUES = {'true': True, '1': True, 'false': False, '0': False}
+
+SEARCH_FIELDS = ('email', 'first_name', 'last_name')
+
+
+def parse_boolean(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    
+    try:
+        return BOOLEAN_VALUES[value.lower()]
+    except KeyError:
+        raise ValidationError({name: _('Must be true or false.')})
+
+
+def parse_joined(params, name):
+    value = params.get(name)
+    if value is None:
+        return None
+    
+    try:
+        moment = parse_datetime(value)
+        if moment is None:
+            day = parse_date(value)
+            if day is None:
+                raise ValueError(value)
+            moment = datetime.combine(day, time.min)
+    except ValueError:
+        raise ValidationError({name: _('Must be an ISO 8601 date or datetime.')})
+    
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def prefix_filter(field, prefix):
+    """
+    Match values of `field` starting with `prefix` as a range condition,
+    which (unlike `LIKE`) can be served by a plain B-tree index.
+    """
+    upper = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+    return Q(**{f'{field}__gte': prefix, f'{field}__lt': upper})
+
 
-class UserApiViewSet(ModelViewSet):
+def filter_user_list(queryset, params):
+    """
+    Apply the list filters of `params` to `queryset`.
+    
+    - `is_active`, `is_staff`: true or false.
+    - `joined_after`, `joined_before`: ISO 8601 date or datetime bounds of
+      `date_joined` (inclusive and exclusive).
+    - `q`: case-insensitive prefixes that the email, first or last name must
+      start with, one per word.
+    
+    Every filter is served by one of the `CustomUserModel` indexes.
+    Raises `ValidationError` for invalid values.
+    """
+    for name in ('is_active', 'is_staff'):
+        value = parse_boolean(params, name)
+        if value is not None:
+            queryset = queryset.filter(**{name: value})
+    
+    joined_after = parse_joined(params, 'joined_after')
+    if joined_after is not None:
+        queryset = queryset.filter(date_joined__gte=joined_after)
+    
+    joined_before = parse_joined(params, 'joined_before')
+    if joined_before is not None:
+        queryset = queryset.filter(date_joined__lt=joined_before)
+    
+    terms = params.get('q', '').lower().split()
+    if terms:
+        queryset = queryset.alias(**{f'{field}_lower': Lower(field) for field in SEARCH_FIELDS})
+        for term in terms:
+            match = Q()
+            for field in SEARCH_FIELDS:
+                match |= prefix_filter(f'{field}_lower', term)
+            queryset = queryset.filter(match)
+    
+    return queryset
+
+
+class UserApiViewSet(ReplicaReadMixin, ConditionalGetMixin, ModelViewSet):
     """
     A ViewSet to handle User creation, retrieval, update, and deletion.
 
     Allows different actions based on permissions:
-    - `list`: Allows only admin users to list all Users.
+    - `list`: Allows only admin users to list all Users, filtered by
+      `is_active`, `is_staff`, `joined_after`/`joined_before` and `q`
+      (see `filter_user_list`). `task_counts=true` adds the total and
+      open task counts of each user.
     - `create`: Allows anyone to create a new User.
     - `retrieve`: Allows the owner or an admin user to retrieve a specific User.
     - `destroy`: Allows the owner or an admin user to delete a specific User.
+      The user is deactivated at once and deleted, tasks included, by a
+      background job: the response is `202 Accepted` with the job, whose
+      progress is reported at `/api/jobs/<id>/`.
     - `update`: Allows `PATCH` for partial updates but prohibits `PUT` for full updates.
+    
+    The list is ordered and paginated with keyset pagination on
+    `(date_joined, id)` (`cursor`/`limit`), so deep pages cost the same as
+    the first one.
+    `retrieve` sends an `ETag` and answers `If-None-Match` with `304 Not Modified`.
+    `list` and `retrieve` read from the replica database when one is configured.
+    `password-hashing` (admin only) reports the password hashing pool statistics
+    of the serving process.
     """
     
     queryset = User.objects.all()
     serializer_class = UserSerializer
     permission_classes = [IsOwner]
+    pagination_class = UserKeysetPagination
     
     
-    def get_permissions(self):
+    def get_queryset(self):
+        queryset = super().get_queryset()
         if self.action == 'list':
+            queryset = filter_user_list(queryset, self.request.query_params)
+            if self.with_task_counts():
+                queryset = annotate_users(queryset)
+        
+        return queryset
+    
+    
+    def get_serializer_class(self):
+        if self.action == 'list' and self.with_task_counts():
+            return UserTaskCountsSerializer
+        
+        return super().get_serializer_class()
+    
+    
+    def with_task_counts(self):
+        return bool(parse_boolean(self.request.query_params, 'task_counts'))
+    
+    
+    @query_budget(3)
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+    
+    
+    def get_permissions(self):
+        if self.action in ('list', 'password_hashing'):
             return [permissions.IsAdminUser()]
         elif self.action == 'create':
             return [permissions.AllowAny()]
@@ -40,6 +184,40 @@ class UserApiViewSet(ModelViewSet):
         return super().get_permissions()
     
     
+    @query_budget(2)
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        etag = make_etag('user', instance.pk, instance.email, instance.first_name,
+                         instance.last_name, instance.is_superuser, instance.is_staff,
+                         instance.date_joined.isoformat())
+        
+        not_modified = self.get_not_modified_response(request, etag)
+        if not_modified is not None:
+            return not_modified
+        
+        serializer = self.get_serializer(instance)
+        return self.set_validators(Response(serializer.data), etag)
+    
+    
+    def destroy(self, request, *args, **kwargs):
+        instance = self.get_object()
+        
+        with transaction.atomic():
+            if instance.is_active:
+                instance.is_active = False
+                instance.save(update_fields=['is_active'])
+            job = enqueue(DELETE_USER, {'user_id': instance.pk},
+                          key=f'{DELETE_USER}:{instance.pk}', owner_id=request.user.pk)
+        
+        return Response(JobSerializer(job).data, status=status.HTTP_202_ACCEPTED,
+                        headers={'Location': reverse('job-detail', args=[job.pk], request=request)})
+    
+    
+    @action(detail=False, methods=['get'], url_path='password-hashing')
+    def password_hashing(self, request, *args, **kwargs):
+        return Response(get_hashing_pool().stats())
+    
+    
     def update(self, request, *args, **kwargs):
         method_patch = kwargs.get('partial', False)
         
@@ -50,7 +228,7 @@ class UserApiViewSet(ModelViewSet):
         return super().update(request, *args, **kwargs)
     
 
-class UserChangePasswordApiView(APIView):
+class UserChangePasswordApiView(ReplicaReadMixin, APIView):
     """
     A view to update a User's password.
 
@@ -58,12 +236,14 @@ class UserChangePasswordApiView(APIView):
     """
     
     permission_classes = [IsOwner]
+    throttle_scope = 'password'
 
     
     def get_object(self):
         return User.objects.get(pk=self.kwargs['pk'])
 
 
+    @query_budget(3)
     def patch(self, request, *args, **kwargs):
         instance = self.get_object()
         serializer = UserChangePassworSerializer(instance, 
@@ -75,3 +255,19 @@ class UserChangePasswordApiView(APIView):
                             status=status.HTTP_200_OK)
             
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class TokenObtainPairApiView(TokenObtainPairView):
+    """
+    Token endpoint rate limited by `LoginThrottle`, which only charges the
+    per-account bucket for rejected credentials.
+    """
+    
+    throttle_classes = [LoginThrottle]
+    
+    def post(self, request, *args, **kwargs):
+        try:
+            return super().post(request, *args, **kwargs)
+        except AuthenticationFailed:
+            LoginThrottle().record_failure(request)
+            raise